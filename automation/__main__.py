@@ -0,0 +1,151 @@
+"""
+Command line entry point for cron/headless runs: python -m automation {scrape,process,load,ingest,archive}.
+Each command imports what it uses when it runs, so processing never loads Selenium and only the chosen
+provider SDK is imported.
+"""
+import os
+import sys
+import argparse
+from datetime import date
+from automation.config import DOWNLOADS_PUBLIC, DOWNLOADS_PRIVATE, CHROME_PROFILE_DIR, ARCHIVE_DIR
+
+SOURCES = ("relatorios", "carteiras", "meus-dividendos")
+
+REPORTS_HTML = os.path.join(DOWNLOADS_PUBLIC, "html-relatorios")
+REPORTS_MD = os.path.join(DOWNLOADS_PUBLIC, "resumos-relatorios")
+WALLETS_HTML = os.path.join(DOWNLOADS_PUBLIC, "html-carteiras")
+WALLETS_MD = os.path.join(DOWNLOADS_PUBLIC, "html-carteiras-csv")
+WALLETS_CSV = os.path.join(DOWNLOADS_PUBLIC, "carteiras-csv")
+MEUS_DIVIDENDOS_HTML = os.path.join(DOWNLOADS_PRIVATE, "meus-dividendos")
+MEUS_DIVIDENDOS_CSV = os.path.join(DOWNLOADS_PRIVATE, "meus-dividendos-csv")
+CHANGES_FOLDER = os.path.join(DOWNLOADS_PRIVATE, "mudancas-carteiras")
+
+def scrape(args):
+    from automation.driver import create_driver
+
+    driver = create_driver(headless=args.headless, profile_dir=CHROME_PROFILE_DIR)
+    try:
+        if "relatorios" in args.sources or "carteiras" in args.sources:
+            from automation.suno.auth import login_suno
+            login_suno(driver)
+        if "relatorios" in args.sources:
+            from automation.suno.reports import download_suno_reports
+            download_suno_reports(
+                driver, REPORTS_HTML, workers=args.workers, headless=args.headless, backend=args.backend, use_manifest=args.manifest
+            )
+        if "carteiras" in args.sources:
+            from automation.suno.wallets import download_suno_wallets
+            download_suno_wallets(
+                driver, WALLETS_HTML, workers=args.workers, headless=args.headless, backend=args.backend, use_manifest=args.manifest
+            )
+        if "meus-dividendos" in args.sources:
+            from automation.meus_dividendos.scraper import download_meus_dividendos_wallet
+            download_meus_dividendos_wallet(driver, MEUS_DIVIDENDOS_HTML, use_manifest=args.manifest)
+    finally:
+        driver.quit()
+
+def process(args):
+    from automation.analysis import processors
+
+    if "relatorios" in args.sources:
+        processors.process_reports(
+            REPORTS_HTML, REPORTS_MD, provider=args.provider, max_workers=args.workers, batch=args.batch, use_manifest=args.manifest,
+            route=not args.no_route
+        )
+    if "carteiras" in args.sources:
+        if args.fused:
+            processors.process_suno_wallets_html_to_csv(WALLETS_HTML, WALLETS_CSV, provider=args.provider, use_manifest=args.manifest)
+        else:
+            processors.process_suno_wallets_step1_html_to_md(
+                WALLETS_HTML, WALLETS_MD, provider=args.provider, batch=args.batch, use_manifest=args.manifest
+            )
+            processors.process_suno_wallets_step2_md_to_csv(
+                WALLETS_MD, WALLETS_CSV, provider=args.provider, batch=args.batch, use_manifest=args.manifest
+            )
+    if "meus-dividendos" in args.sources:
+        html_file = os.path.join(MEUS_DIVIDENDOS_HTML, f"carteira-meus-dividendos-{date.today().strftime('%Y-%m-%d')}.htm")
+        processors.process_meus_dividendos_to_csv(html_file, MEUS_DIVIDENDOS_CSV, provider=args.provider, use_manifest=args.manifest)
+
+def load(args):
+    from automation.snapshots import load_wallet_snapshots, diff_wallet_snapshots
+
+    load_wallet_snapshots(WALLETS_CSV, use_manifest=args.manifest)
+    load_wallet_snapshots(MEUS_DIVIDENDOS_CSV, use_manifest=args.manifest)
+    if args.diff:
+        diff_wallet_snapshots(CHANGES_FOLDER)
+
+def ingest(args):
+    from automation.pipeline import run_ingest
+
+    results = run_ingest(
+        provider=args.provider, report_workers=args.report_workers, wallet_workers=args.wallet_workers, headless=args.headless, load=args.load
+    )
+    return 1 if any(stage["errors"] for stage in results.values()) else 0
+
+def archive(args):
+    from automation.archive import archive_folder
+
+    # Separate archives per root, so a public and a private file with the same relative path never collide
+    for name, folder in (("publico", DOWNLOADS_PUBLIC), ("privado", DOWNLOADS_PRIVATE)):
+        archive_folder(folder, os.path.join(args.dest, name), codec=args.codec)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m automation", description="Ingestão de relatórios e carteiras.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def sources_argument(command):
+        # Validated in main: argparse rejects an empty nargs="*" list when choices is set
+        command.add_argument("sources", nargs="*", help=f"Fontes: {', '.join(SOURCES)} (padrão: todas).")
+
+    def provider_argument(command):
+        command.add_argument("--provider", choices=("openai", "claude"), default=os.getenv("LLM_PROVIDER", "openai"))
+
+    command = commands.add_parser("scrape", help="Baixa relatórios e carteiras com o navegador.")
+    sources_argument(command)
+    command.add_argument("--headless", action="store_true")
+    command.add_argument("--workers", type=int, default=1, help="Navegadores em paralelo.")
+    command.add_argument("--backend", choices=("selenium", "http"), default="selenium")
+    command.add_argument("--manifest", action="store_true", help="Enfileira os arquivos salvos no manifest (para process --manifest).")
+    command.set_defaults(run=scrape)
+
+    command = commands.add_parser("process", help="Resume relatórios e converte carteiras com o LLM.")
+    sources_argument(command)
+    provider_argument(command)
+    command.add_argument("--workers", type=int, default=1, help="Relatórios enviados ao LLM em paralelo.")
+    command.add_argument("--batch", action="store_true", help="Usa a Batch API do provider.")
+    command.add_argument("--fused", action="store_true", help="Carteiras HTML -> CSV em uma chamada com streaming.")
+    command.add_argument("--manifest", action="store_true", help="Processa os jobs pendentes do manifest em vez dos arquivos de hoje.")
+    command.add_argument("--no-route", action="store_true", help="Todos os relatórios no modelo grande, sem triagem.")
+    command.set_defaults(run=process)
+
+    command = commands.add_parser("load", help="Carrega os CSVs de carteiras no histórico Parquet.")
+    command.add_argument("--manifest", action="store_true", help="Carrega só os CSVs pendentes no manifest.")
+    command.add_argument("--diff", action="store_true", help="Grava as mudanças de cada carteira desde o snapshot anterior.")
+    command.set_defaults(run=load)
+
+    command = commands.add_parser("ingest", help="Pipeline completo: raspagem e LLM em paralelo.")
+    provider_argument(command)
+    command.add_argument("--headless", action="store_true")
+    command.add_argument("--report-workers", type=int, default=4)
+    command.add_argument("--wallet-workers", type=int, default=2)
+    command.add_argument("--load", action="store_true", help="Também carrega os CSVs no histórico Parquet.")
+    command.set_defaults(run=ingest)
+
+    command = commands.add_parser("archive", help="Acrescenta os downloads novos aos zips mensais.")
+    command.add_argument("--dest", default=ARCHIVE_DIR, help="Pasta dos zips (padrão: ARCHIVE_DIR).")
+    command.add_argument("--codec", choices=("deflate", "bzip2", "lzma", "store"), default="deflate")
+    command.set_defaults(run=archive)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if hasattr(args, "sources"):
+        unknown = [source for source in args.sources if source not in SOURCES]
+        if unknown:
+            parser.error(f"fonte inválida: {', '.join(unknown)} (use {', '.join(SOURCES)})")
+        args.sources = args.sources or SOURCES
+    return args.run(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
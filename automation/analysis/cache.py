@@ -0,0 +1,210 @@
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Bump when the processor prompts change in a way that should invalidate old answers
+PROMPT_VERSION = "1"
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapses whitespace so that indentation changes in the f-string prompts don't bust the cache.
+    """
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def cache_key(method, prompt, model, temperature, version=PROMPT_VERSION, max_tokens=None) -> str:
+    """
+    Builds the content-addressed key for an LLM call. max_tokens is part of it: a larger limit can turn
+    a truncated answer into a complete one.
+    """
+    payload = json.dumps([version, method, model, temperature, max_tokens, normalize_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def complete_csv(text) -> bool:
+    """
+    Whether a streamed CSV answer looks whole: a ";" header and at least one row, every row as wide as the header.
+    A stream cut short (max_tokens, dropped connection) usually ends mid-row.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line and not line.startswith("```")]
+    if len(lines) < 2:
+        return False
+    rows = list(csv.reader(lines, delimiter=";"))
+    return len(rows[0]) > 1 and all(len(row) == len(rows[0]) for row in rows[1:])
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses with size and age based eviction.
+    """
+    def __init__(self, path, max_entries=5000, max_age_days=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or self._expired(row[1]):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """
+        Drops entries older than max_age_days, then the least recently used ones above max_entries.
+        """
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def _expired(self, created_at):
+        return self.max_age_days is not None and created_at < time.time() - self.max_age_days * 86400
+
+class CachedClient:
+    """
+    Wraps AnalysisClient or ClaudeClient, answering repeated calls from the ResponseCache.
+    """
+    def __init__(self, client, cache, version=PROMPT_VERSION):
+        self.client = client
+        self.cache = cache
+        self.version = version
+
+    def analyze_report(self, prompt, model=None, temperature=0.7, **kwargs):
+        return self._cached("analyze_report", prompt, model, temperature, **kwargs)
+
+    def convert_spreadsheet(self, prompt, model=None, temperature=0, **kwargs):
+        return self._cached("convert_spreadsheet", prompt, model, temperature, **kwargs)
+
+    def generate_structured(self, prompt, schema, model=None, temperature=0, **kwargs):
+        return self._cached("generate_structured", prompt, model, temperature, schema=schema, **kwargs)
+
+    def stream_spreadsheet(self, prompt, on_text, model=None, temperature=0, **kwargs):
+        """
+        A streamed answer is a convert_spreadsheet answer; hits are replayed to on_text in one chunk.
+        Only complete CSVs are cached, so an empty or truncated stream is asked again next time.
+        """
+        key = self._key("convert_spreadsheet", prompt, model, temperature, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            on_text(cached)
+            return cached
+
+        call_kwargs = dict(kwargs, temperature=temperature)
+        if model is not None:
+            call_kwargs["model"] = model
+        result = self.client.stream_spreadsheet(prompt, on_text, **call_kwargs)
+        if isinstance(result, str) and complete_csv(result):
+            self.cache.set(key, result)
+        return result
+
+    def analyze_report_batch(self, prompts, model=None, temperature=0.7, **kwargs):
+        return self._cached_batch("analyze_report", prompts, model, temperature, **kwargs)
+
+    def convert_spreadsheet_batch(self, prompts, model=None, temperature=0, **kwargs):
+        return self._cached_batch("convert_spreadsheet", prompts, model, temperature, **kwargs)
+
+    def generate_structured_batch(self, prompts, schema, model=None, temperature=0, **kwargs):
+        return self._cached_batch("generate_structured", prompts, model, temperature, schema=schema, **kwargs)
+
+    def _key(self, method, prompt, model, temperature, kwargs):
+        # Answers to the same prompt under different schemas are different answers
+        if "schema" in kwargs:
+            method = f"{method}:{kwargs['schema']['name']}"
+        return cache_key(method, prompt, model, temperature, self.version, kwargs.get("max_tokens"))
+
+    def _cached_batch(self, method, prompts, model, temperature, **kwargs):
+        """
+        Answers what it can from the cache and only submits the misses as a batch.
+        """
+        results = {}
+        pending = {}
+        keys = {}
+        for item_id, prompt in prompts.items():
+            keys[item_id] = self._key(method, prompt, model, temperature, kwargs)
+            cached = self.cache.get(keys[item_id])
+            if cached is not None:
+                results[item_id] = cached
+            else:
+                pending[item_id] = prompt
+
+        if pending:
+            call_kwargs = dict(kwargs, temperature=temperature)
+            if model is not None:
+                call_kwargs["model"] = model
+            fetched = getattr(self.client, f"{method}_batch")(pending, **call_kwargs)
+            for item_id, result in fetched.items():
+                if self._cacheable(method, result):
+                    self.cache.set(keys[item_id], result)
+                results[item_id] = result
+        return results
+
+    def _cached(self, method, prompt, model, temperature, **kwargs):
+        key = self._key(method, prompt, model, temperature, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        call_kwargs = dict(kwargs, temperature=temperature)
+        if model is not None:
+            call_kwargs["model"] = model
+        result = getattr(self.client, method)(prompt, **call_kwargs)
+
+        if self._cacheable(method, result):
+            self.cache.set(key, result)
+        return result
+
+    def _cacheable(self, method, result):
+        # Unparsed JSON answers are failures; don't pin them in the cache
+        return method == "convert_spreadsheet" or isinstance(result, dict)
+
+_caches = {}
+
+def open_cache(path, **kwargs):
+    """
+    Returns a shared ResponseCache per path, so hit/miss counters accumulate across processors.
+    """
+    if path not in _caches:
+        _caches[path] = ResponseCache(path, **kwargs)
+    return _caches[path]
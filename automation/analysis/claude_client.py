@@ -1,23 +1,209 @@
 from anthropic import Anthropic
 from automation.config import ANTHROPIC_API_KEY
+from automation.telemetry import span
+from automation.analysis.compaction import estimate_tokens
+from automation.analysis.rate_limit import SCHEDULER
+from automation.analysis.schemas import REPORT_VERDICT_SCHEMA
 import json
+import time
+
+# Cache breakpoint after the static prefix of a rendered Prompt: tools, system and instructions are cached together
+CACHE_CONTROL = {"type": "ephemeral"}
 
 class ClaudeClient:
-    def __init__(self):
-        self.client = Anthropic(api_key=ANTHROPIC_API_KEY)
+    def __init__(self, base_url=None):
+        # base_url lets the client point at a local stub server instead of api.anthropic.com
+        # Retries are done by the shared scheduler, which also honors the rate-limit budgets
+        self.client = Anthropic(api_key=ANTHROPIC_API_KEY, base_url=base_url, max_retries=0)
         
     def analyze_report(self, prompt, model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8192):
-        message = self.client.messages.create(
-            max_tokens=max_tokens,
-            temperature=temperature,
-            model=model,
-            system="Você é um especialista em investimentos de longo prazo. Responda apenas em JSON.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+        with span("llm: analyze_report", provider="claude", model=model, prompt=_template(prompt)) as record:
+            message = self._create(self._report_params(prompt, model, temperature, max_tokens))
+            self._record_usage(record, message.usage)
+        return self._tool_input(message)
+
+    def convert_spreadsheet(self, prompt, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192):
+        with span("llm: convert_spreadsheet", provider="claude", model=model, prompt=_template(prompt)) as record:
+            message = self._create(self._spreadsheet_params(prompt, model, temperature, max_tokens))
+            self._record_usage(record, message.usage)
+        return message.content[0].text
+
+    def generate_structured(self, prompt, schema, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192):
+        """
+        Answer constrained to a JSON schema (see automation.analysis.schemas), via a forced tool call.
+        Returns the tool input dict.
+        """
+        with span("llm: generate_structured", provider="claude", model=model, schema=schema["name"], prompt=_template(prompt)) as record:
+            message = self._create(self._structured_params(prompt, schema, model, temperature, max_tokens))
+            self._record_usage(record, message.usage)
+        return self._tool_input(message)
+
+    def stream_spreadsheet(self, prompt, on_text, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192, on_restart=None):
+        """
+        convert_spreadsheet with the answer streamed: on_text(chunk) is called as tokens arrive.
+        When a retry restarts the stream, on_restart() is called first. Returns the full text.
+        """
+        params = dict(self._spreadsheet_params(prompt, model, temperature, max_tokens), stream=True)
+        attempts = []
+
+        def request():
+            if attempts and on_restart:
+                on_restart()
+            attempts.append(1)
+            raw = self.client.messages.with_raw_response.create(**params)
+            parts = []
+            usage = {"input_tokens": 0, "output_tokens": 0}
+            for event in raw.parse():
+                if event.type == "message_start":
+                    self._record_usage(usage, event.message.usage)
+                elif event.type == "message_delta":
+                    usage["output_tokens"] = event.usage.output_tokens
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    parts.append(event.delta.text)
+                    on_text(parts[-1])
+            return raw.headers, ("".join(parts), usage), usage["input_tokens"] + usage["output_tokens"]
+
+        with span("llm: stream_spreadsheet", provider="claude", model=model, prompt=_template(prompt)) as record:
+            text, usage = SCHEDULER.call("claude", model, self._estimate(params), request)
+            record.update(usage)
+        return text
+
+    def _create(self, params):
+        """
+        messages.create through the shared scheduler. The raw response exposes the rate-limit headers.
+        """
+        def request():
+            raw = self.client.messages.with_raw_response.create(**params)
+            message = raw.parse()
+            used = message.usage.input_tokens + message.usage.output_tokens if message.usage else None
+            return raw.headers, message, used
+
+        return SCHEDULER.call("claude", params["model"], self._estimate(params), request)
+
+    def _estimate(self, params):
+        return estimate_tokens(params["system"]) + sum(estimate_tokens(_text(m["content"])) for m in params["messages"]) + params["max_tokens"]
+
+    def analyze_report_batch(self, prompts, model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8192, poll_interval=60):
+        """
+        Batch version of analyze_report. prompts maps an id to a prompt; returns id -> parsed response.
+        """
+        params = {key: self._report_params(prompt, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return self.run_batch(params, poll_interval, extract=self._tool_input)
+
+    def convert_spreadsheet_batch(self, prompts, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192, poll_interval=60):
+        """
+        Batch version of convert_spreadsheet. prompts maps an id to a prompt; returns id -> text.
+        """
+        params = {key: self._spreadsheet_params(prompt, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return self.run_batch(params, poll_interval)
+
+    def generate_structured_batch(self, prompts, schema, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192, poll_interval=60):
+        """
+        Batch version of generate_structured. prompts maps an id to a prompt; returns id -> tool input dict.
+        """
+        params = {key: self._structured_params(prompt, schema, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return self.run_batch(params, poll_interval, extract=self._tool_input)
+
+    def run_batch(self, params, poll_interval=60, extract=None):
+        """
+        Submits message params as one Message Batch and waits for it.
+        Returns id -> message text (or extract(message)) for the requests that succeeded.
+        """
+        if not params:
+            return {}
+
+        with span("llm: batch", provider="claude", requests=len(params)) as record:
+            return self._run_batch(params, poll_interval, record, extract or (lambda message: message.content[0].text))
+
+    def _run_batch(self, params, poll_interval, record, extract):
+        # custom_id only allows [a-zA-Z0-9_-]{1,64}, so map arbitrary keys (file paths) to positions
+        keys = list(params)
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": f"req-{idx}", "params": params[key]} for idx, key in enumerate(keys)]
         )
-        
-        result = message.content[0].text
+
+        while batch.processing_status != "ended":
+            time.sleep(poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        results = {}
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                idx = int(entry.custom_id.split("-", 1)[1])
+                results[keys[idx]] = extract(entry.result.message)
+                usage = {}
+                self._record_usage(usage, entry.result.message.usage)
+                for key, value in usage.items():
+                    record[key] = record.get(key, 0) + value
+        record["succeeded"] = len(results)
+        return results
+
+    def _report_params(self, prompt, model, temperature, max_tokens):
+        params = {
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model,
+            "system": "Você é um especialista em investimentos de longo prazo. Responda apenas em JSON.",
+            "messages": [
+                {"role": "user", "content": self._content(prompt)}
+            ]
+        }
+        return self._with_tool(params, REPORT_VERDICT_SCHEMA)
+
+    def _structured_params(self, prompt, schema, model, temperature, max_tokens):
+        params = self._spreadsheet_params(prompt, model, temperature, max_tokens)
+        return self._with_tool(params, schema)
+
+    def _with_tool(self, params, schema):
+        """
+        Forces the answer into a single tool call whose input follows the schema.
+        """
+        params["tools"] = [{"name": schema["name"], "description": schema["description"], "input_schema": schema["schema"]}]
+        params["tool_choice"] = {"type": "tool", "name": schema["name"]}
+        return params
+
+    def _tool_input(self, message):
+        for block in message.content:
+            if block.type == "tool_use":
+                return block.input
+        # No tool call (e.g. cut by max_tokens): fall back to whatever JSON is in the text
+        text = "".join(block.text for block in message.content if block.type == "text")
+        return self._parse_json(text)
+
+    def _spreadsheet_params(self, prompt, model, temperature, max_tokens):
+        return {
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model": model,
+            "system": "Você é um especialista em planilhas extremamente meticuloso.",
+            "messages": [
+                {"role": "user", "content": self._content(prompt)}
+            ]
+        }
+
+    def _content(self, prompt):
+        """
+        A rendered Prompt goes as two text blocks, the static prefix marked as a cache breakpoint.
+        """
+        prefix = getattr(prompt, "prefix", "")
+        if not prefix:
+            return prompt
+        return [
+            {"type": "text", "text": prefix, "cache_control": CACHE_CONTROL},
+            {"type": "text", "text": prompt[len(prefix):]},
+        ]
+
+    def _record_usage(self, record, usage):
+        if usage is not None:
+            # input_tokens only counts the uncached part; report the whole prompt like OpenAI does
+            cached = getattr(usage, "cache_read_input_tokens", None) or 0
+            written = getattr(usage, "cache_creation_input_tokens", None) or 0
+            record["input_tokens"] = usage.input_tokens + cached + written
+            record["output_tokens"] = usage.output_tokens
+            record["cached_tokens"] = cached
+            record["cache_write_tokens"] = written
+
+    def _parse_json(self, result):
         try:
             return json.loads(result)
         except json.JSONDecodeError:
@@ -31,14 +217,10 @@ class ClaudeClient:
                     pass
             return result
 
-    def convert_spreadsheet(self, prompt, model="claude-sonnet-4-20250514", temperature=0, max_tokens=8192):
-        message = self.client.messages.create(
-            max_tokens=max_tokens,
-            temperature=temperature,
-            model=model,
-            system="Você é um especialista em planilhas extremamente meticuloso.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return message.content[0].text
+def _template(prompt):
+    return getattr(prompt, "template", None)
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(block["text"] for block in content)
@@ -0,0 +1,138 @@
+import re
+from bs4 import BeautifulSoup, NavigableString, Tag
+from automation.utils import clean_html
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "blockquote", "pre", "ul", "ol", "dl", "figure", "figcaption"}
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Repeats shorter than this are content ("- COMPRA", "| Peso | 5% |", a repeated section heading), not boilerplate
+DEDUPE_MIN_CHARS = 80
+# Short page furniture that is dropped when repeated regardless of length
+_BOILERPLATE_RE = re.compile(
+    r"^(compartilh\w*|voltar ao topo|leia (também|mais)|imprimir|salvar|copiar link|whatsapp|twitter|facebook|linkedin)\W*$",
+    re.IGNORECASE
+)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken when installed, otherwise uses the ~4 chars/token rule of thumb.
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def _inline_text(node) -> str:
+    return re.sub(r"\s+", " ", node.get_text(" ")).strip()
+
+def _render_table(table) -> str:
+    lines = []
+    for tr in table.find_all("tr"):
+        cells = [_inline_text(cell).replace("|", "/") for cell in tr.find_all(["th", "td"])]
+        if any(cells):
+            lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+def _render_blocks(node, blocks):
+    """
+    Walks the tree emitting one Markdown block per heading, paragraph, list item or table.
+    """
+    inline = []
+
+    def flush():
+        text = re.sub(r"\s+", " ", "".join(inline)).strip()
+        if text:
+            blocks.append(text)
+        inline.clear()
+
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            inline.append(str(child))
+            continue
+        if not isinstance(child, Tag):
+            continue
+
+        name = child.name
+        if name in HEADING_LEVELS:
+            flush()
+            text = _inline_text(child)
+            if text:
+                blocks.append("#" * HEADING_LEVELS[name] + " " + text)
+        elif name == "table":
+            flush()
+            table = _render_table(child)
+            if table:
+                blocks.append(table)
+        elif name == "li":
+            flush()
+            text = _inline_text(child)
+            if text:
+                blocks.append("- " + text)
+        elif name == "br":
+            flush()
+        elif name in BLOCK_TAGS or child.find(list(BLOCK_TAGS) + list(HEADING_LEVELS) + ["table", "li"]):
+            flush()
+            _render_blocks(child, blocks)
+        else:
+            inline.append(" " + child.get_text(" ") + " ")
+    flush()
+
+def dedupe_blocks(blocks: list, min_chars=DEDUPE_MIN_CHARS) -> list:
+    """
+    Drops repeated blocks (disclaimers, share buttons), keeping the first occurrence.
+    Only blocks of at least min_chars, or known page furniture, are deduplicated.
+    """
+    seen = set()
+    unique = []
+    for block in blocks:
+        key = block.lower()
+        if len(block) >= min_chars or _BOILERPLATE_RE.match(block):
+            if key in seen:
+                continue
+            seen.add(key)
+        unique.append(block)
+    return unique
+
+def compact_html(html_content: str):
+    """
+    Converts HTML into compact Markdown-like text.
+    Returns (text, stats) where stats has the token counts before and after.
+    """
+    soup = BeautifulSoup(clean_html(html_content), "html.parser")
+    blocks = []
+    _render_blocks(soup, blocks)
+    text = "\n\n".join(dedupe_blocks(blocks))
+
+    stats = {
+        "tokens_before": estimate_tokens(html_content),
+        "tokens_after": estimate_tokens(text),
+    }
+    return text, stats
+
+def chunk_text(text: str, max_tokens: int) -> list:
+    """
+    Splits compacted text on block boundaries into chunks of at most ~max_tokens each.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    blocks = []
+    for block in text.split("\n\n"):
+        # Large tables are a single block; fall back to splitting them by row
+        blocks.extend(block.split("\n") if estimate_tokens(block) > max_tokens else [block])
+
+    for block in blocks:
+        block_tokens = estimate_tokens(block)
+        if current and current_tokens + block_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += block_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -1,38 +1,204 @@
 from openai import OpenAI
 from automation.config import OPENAI_API_KEY
+from automation.telemetry import span
+from automation.analysis.compaction import estimate_tokens
+from automation.analysis.rate_limit import SCHEDULER
+from automation.analysis.schemas import REPORT_VERDICT_SCHEMA
 import json
+import time
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
 
 class AnalysisClient:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, base_url=None):
+        # base_url lets the client point at a local stub server instead of api.openai.com
+        # Retries are done by the shared scheduler, which also honors the rate-limit budgets
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=base_url, max_retries=0)
         
     def analyze_report(self, prompt, model="gpt-4.1", temperature=0.7, max_tokens=4096):
-        response = self.client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            response_format={"type": "json_object"},
-            messages=[
+        with span("llm: analyze_report", provider="openai", model=model, prompt=_template(prompt)) as record:
+            response = self._create(self._report_body(prompt, model, temperature, max_tokens))
+            self._record_usage(record, response.usage)
+        return self._parse_json(response.choices[0].message.content)
+
+    def convert_spreadsheet(self, prompt, model="gpt-4.1", temperature=0, max_tokens=10000):
+        # Original code used gpt-4.1 which might be a typo or custom model alias, defaulting to gpt-4.1 or user specific model
+        # Using model passed in argument
+        with span("llm: convert_spreadsheet", provider="openai", model=model, prompt=_template(prompt)) as record:
+            response = self._create(self._spreadsheet_body(prompt, model, temperature, max_tokens))
+            self._record_usage(record, response.usage)
+        return response.choices[0].message.content
+
+    def generate_structured(self, prompt, schema, model="gpt-4.1", temperature=0, max_tokens=10000):
+        """
+        Answer constrained to a JSON schema (see automation.analysis.schemas); returns the parsed dict.
+        """
+        with span("llm: generate_structured", provider="openai", model=model, schema=schema["name"], prompt=_template(prompt)) as record:
+            response = self._create(self._structured_body(prompt, schema, model, temperature, max_tokens))
+            self._record_usage(record, response.usage)
+        return json.loads(response.choices[0].message.content)
+
+    def stream_spreadsheet(self, prompt, on_text, model="gpt-4.1", temperature=0, max_tokens=10000, on_restart=None):
+        """
+        convert_spreadsheet with the answer streamed: on_text(chunk) is called as tokens arrive.
+        When a retry restarts the stream, on_restart() is called first. Returns the full text.
+        """
+        body = dict(self._spreadsheet_body(prompt, model, temperature, max_tokens), stream=True, stream_options={"include_usage": True})
+        attempts = []
+
+        def request():
+            if attempts and on_restart:
+                on_restart()
+            attempts.append(1)
+            raw = self.client.chat.completions.with_raw_response.create(**body)
+            parts = []
+            usage = None
+            for chunk in raw.parse():
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    on_text(parts[-1])
+            return raw.headers, ("".join(parts), usage), usage.total_tokens if usage else None
+
+        with span("llm: stream_spreadsheet", provider="openai", model=model, prompt=_template(prompt)) as record:
+            text, usage = SCHEDULER.call("openai", model, self._estimate(body), request)
+            self._record_usage(record, usage)
+        return text
+
+    def _create(self, body):
+        """
+        Chat completion through the shared scheduler. The raw response exposes the rate-limit headers.
+        """
+        def request():
+            raw = self.client.chat.completions.with_raw_response.create(**body)
+            response = raw.parse()
+            used = response.usage.total_tokens if response.usage else None
+            return raw.headers, response, used
+
+        return SCHEDULER.call("openai", body["model"], self._estimate(body), request)
+
+    def _estimate(self, body):
+        # OpenAI reserves prompt + max_tokens against the TPM budget
+        return sum(estimate_tokens(message["content"]) for message in body["messages"]) + body["max_tokens"]
+
+    def analyze_report_batch(self, prompts, model="gpt-4.1", temperature=0.7, max_tokens=4096, poll_interval=60):
+        """
+        Batch version of analyze_report. prompts maps an id to a prompt; returns id -> parsed response.
+        """
+        bodies = {key: self._report_body(prompt, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return {key: self._parse_json(text) for key, text in self.run_batch(bodies, poll_interval).items()}
+
+    def convert_spreadsheet_batch(self, prompts, model="gpt-4.1", temperature=0, max_tokens=10000, poll_interval=60):
+        """
+        Batch version of convert_spreadsheet. prompts maps an id to a prompt; returns id -> text.
+        """
+        bodies = {key: self._spreadsheet_body(prompt, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return self.run_batch(bodies, poll_interval)
+
+    def generate_structured_batch(self, prompts, schema, model="gpt-4.1", temperature=0, max_tokens=10000, poll_interval=60):
+        """
+        Batch version of generate_structured. prompts maps an id to a prompt; returns id -> parsed dict.
+        """
+        bodies = {key: self._structured_body(prompt, schema, model, temperature, max_tokens) for key, prompt in prompts.items()}
+        return {key: self._parse_json(text) for key, text in self.run_batch(bodies, poll_interval).items()}
+
+    def run_batch(self, bodies, poll_interval=60):
+        """
+        Submits chat completion bodies as one OpenAI Batch job and waits for it.
+        Returns id -> message text for the requests that succeeded.
+        """
+        if not bodies:
+            return {}
+
+        with span("llm: batch", provider="openai", requests=len(bodies)) as record:
+            return self._run_batch(bodies, poll_interval, record)
+
+    def _run_batch(self, bodies, poll_interval, record):
+        # Batch custom_ids are positional so arbitrary keys (file paths) survive the round-trip
+        keys = list(bodies)
+        lines = [
+            json.dumps({"custom_id": f"req-{idx}", "method": "POST", "url": BATCH_ENDPOINT, "body": bodies[key]}, ensure_ascii=False)
+            for idx, key in enumerate(keys)
+        ]
+        batch_file = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h")
+
+        while batch.status not in BATCH_FINAL_STATUSES:
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+
+        # Expired/cancelled batches may still carry partial output
+        if not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} terminou com status {batch.status} sem resultados.")
+
+        results = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                idx = int(item["custom_id"].split("-", 1)[1])
+                results[keys[idx]] = response["body"]["choices"][0]["message"]["content"]
+                usage = response["body"].get("usage") or {}
+                record["input_tokens"] = record.get("input_tokens", 0) + (usage.get("prompt_tokens") or 0)
+                record["output_tokens"] = record.get("output_tokens", 0) + (usage.get("completion_tokens") or 0)
+                cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+                record["cached_tokens"] = record.get("cached_tokens", 0) + cached
+        record["succeeded"] = len(results)
+        return results
+
+    def _report_body(self, prompt, model, temperature, max_tokens):
+        return self._with_cache_key({
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": self._response_format(REPORT_VERDICT_SCHEMA),
+            "messages": [
                 {"role": "system", "content": "Você é um especialista em investimentos de longo prazo."},
                 {"role": "user", "content": prompt}
             ]
-        )
-        result = response.choices[0].message.content
+        }, prompt)
+
+    def _spreadsheet_body(self, prompt, model, temperature, max_tokens):
+        return self._with_cache_key({
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": [
+                {"role": "system", "content": "Você é um especialista em planilhas extremamente meticuloso."},
+                {"role": "user", "content": prompt}
+            ]
+        }, prompt)
+
+    def _with_cache_key(self, body, prompt):
+        # Prefix caching is automatic; the key routes calls of one template to the same cache
+        if _template(prompt):
+            body["prompt_cache_key"] = _template(prompt)
+        return body
+
+    def _structured_body(self, prompt, schema, model, temperature, max_tokens):
+        body = self._spreadsheet_body(prompt, model, temperature, max_tokens)
+        body["response_format"] = self._response_format(schema)
+        return body
+
+    def _response_format(self, schema):
+        return {"type": "json_schema", "json_schema": dict(schema, strict=True)}
+
+    def _record_usage(self, record, usage):
+        if usage is not None:
+            record["input_tokens"] = usage.prompt_tokens
+            record["output_tokens"] = usage.completion_tokens
+            details = getattr(usage, "prompt_tokens_details", None)
+            record["cached_tokens"] = (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+    def _parse_json(self, result):
         try:
             return json.loads(result)
         except json.JSONDecodeError:
             return result
 
-    def convert_spreadsheet(self, prompt, model="gpt-4.1", temperature=0, max_tokens=10000):
-        # Original code used gpt-4.1 which might be a typo or custom model alias, defaulting to gpt-4.1 or user specific model
-        # Using model passed in argument
-        response = self.client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            messages=[
-                {"role": "system", "content": "Você é um especialista em planilhas extremamente meticuloso."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+def _template(prompt):
+    return getattr(prompt, "template", None)
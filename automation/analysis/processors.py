@@ -1,102 +1,411 @@
 import os
+import re
 import glob
+import shutil
 from datetime import datetime, date
-from automation.analysis.openai_client import AnalysisClient
-from automation.analysis.claude_client import ClaudeClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from automation.analysis.compaction import compact_html, chunk_text
+from automation.analysis.tables import wallet_html_to_markdown, spreadsheet_html_to_csv
+from automation.analysis.cache import CachedClient, open_cache
+from automation.analysis.prompts import render_prompt
+from automation.analysis.routing import TIER_LARGE, TIER_SMALL, classify_report, small_model
+from automation.analysis.schemas import REPORT_PREFIXES, REPORT_PART_SCHEMA, WALLET_ROWS_SCHEMA, ReportVerdict, wallet_rows_from_response, wallet_rows_to_csv
+from automation.manifest import (open_manifest, STAGE_SUNO_REPORTS, STAGE_SUNO_WALLETS_HTML, STAGE_SUNO_WALLETS_MD, STAGE_MEUS_DIVIDENDOS,
+                               STAGE_WALLET_CSV)
+from automation.config import LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_AGE_DAYS
+from automation.telemetry import span, annotate
+from automation.utils import wallet_name, content_hash
 
 def get_client(provider="openai"):
+    # Each SDK takes a good part of a second to import, so only the chosen one is loaded
     if provider == "claude":
-        return ClaudeClient()
+        from automation.analysis.claude_client import ClaudeClient
+        client = ClaudeClient()
     else:
-        return AnalysisClient()
+        from automation.analysis.openai_client import AnalysisClient
+        client = AnalysisClient()
 
-def process_reports(html_folder, output_folder, provider="openai"):
+    if LLM_CACHE_PATH:
+        cache = open_cache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_age_days=LLM_CACHE_MAX_AGE_DAYS)
+        client = CachedClient(client, cache)
+    return client
+
+def _default_model(provider):
+    return "gpt-4o" if provider == "openai" else "claude-sonnet-4-20250514"
+
+def _spreadsheet_max_tokens(provider):
+    # Increase token limit for large spreadsheets
+    return 8192 if provider == "claude" else 16384
+
+def _run_manifest(use_manifest):
+    # Processors only read or write the manifest when the caller asked for it
+    return open_manifest() if use_manifest else None
+
+def _input_files(folder, extension, stage, manifest):
+    """
+    Files to process: pending jobs claimed from the run manifest, or files created today in folder.
+    """
+    if manifest:
+        return manifest.claim(stage)
+
+    today = date.today()
+    return [
+        os.path.join(folder, f) 
+        for f in os.listdir(folder)
+        if f.endswith(extension) and _created_on(os.path.join(folder, f), today)
+    ]
+
+def _created_on(path, day):
+    return _file_date(path) == day.isoformat()
+
+def _file_date(path):
+    """
+    The day a scraped file belongs to ("YYYY-MM-DD"), which also dates its outputs: a job claimed from an
+    earlier day keeps that day's name. Dated names win over ctime: every hard link to a shared blob gets the
+    ctime of the newest link.
+    """
+    match = re.search(r"\d{4}-\d{2}-\d{2}", os.path.basename(path))
+    if match:
+        return match.group(0)
+    return datetime.fromtimestamp(os.path.getctime(path)).date().isoformat()
+
+def _settle_jobs(stage, paths, is_done, manifest):
+    """
+    Marks claimed manifest jobs as done or failed depending on whether their output exists.
+    """
+    if not manifest:
+        return
+    for path in paths:
+        if is_done(path):
+            manifest.mark_done(stage, path)
+        else:
+            manifest.mark_failed(stage, path)
+
+def _record_jobs(manifest, stage, paths):
+    # Hands the outputs to the next stage
+    if manifest:
+        for path in paths:
+            manifest.enqueue(stage, path)
+
+def _reuse_unchanged_output(manifest, key, digest, output_file):
+    """
+    When the input hash equals the last one handled for key and that output still exists, copies it to
+    output_file instead of redoing the work. Returns True if the output was reused.
+    """
+    if not manifest:
+        return False
+    last = manifest.last_output(key)
+    if last is None or last[0] != digest or not os.path.exists(last[1]):
+        return False
+    if os.path.abspath(last[1]) != os.path.abspath(output_file):
+        shutil.copyfile(last[1], output_file)
+    return True
+
+def _remember_outputs(manifest, hashes, written):
+    """
+    Records the input hash of each written output (hashes: output file -> (key, hash)).
+    """
+    if not manifest:
+        return
+    for output_file in written:
+        if output_file in hashes:
+            manifest.remember_output(*hashes[output_file], output_file)
+
+def _write_output(path, text):
+    with span("arquivo: saída", path=path, bytes=len(text)):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+# Compacted reports above this size are summarized in chunks (map-reduce)
+MAX_REPORT_PROMPT_TOKENS = 30000
+
+def process_reports(html_folder, output_folder, provider="openai", max_workers=1, client=None, batch=False, poll_interval=60,
+                    compact=False, max_prompt_tokens=MAX_REPORT_PROMPT_TOKENS, use_manifest=False, route=True):
     """
     Processes HTML reports into Markdown summaries using OpenAI or Claude.
+    With max_workers > 1, reports are sent to the LLM concurrently.
+    With batch=True, all pending reports go in a single provider batch job.
+    With compact=True, the HTML is compacted to Markdown before prompting and oversized reports are chunked.
+    With use_manifest=True, pending jobs are taken from the run manifest instead of files created today, and
+    a report whose content was already summarized under another name reuses that summary.
+    With route=True, only reports with recommendation signals go to the large model; the others get a
+    summary from the small one (see automation.analysis.routing).
     """
-    client = get_client(provider)
     os.makedirs(output_folder, exist_ok=True)
-    today = date.today()
+    manifest = _run_manifest(use_manifest)
     
-    # List HTML files created today
-    html_files = [
-        os.path.join(html_folder, f) 
-        for f in os.listdir(html_folder)
-        if f.endswith(".html") and datetime.fromtimestamp(os.path.getctime(os.path.join(html_folder, f))).date() == today
-    ]
+    html_files = _input_files(html_folder, ".html", STAGE_SUNO_REPORTS, manifest)
     
     print(f"Encontrados {len(html_files)} relatórios de hoje para processar.")
-    
-    for file_path in html_files:
-        file_name = os.path.splitext(os.path.basename(file_path))[0]
-        # Check if already processed
-        # Simplified check: looking for any file starting with prefix-filename
-        existing = glob.glob(os.path.join(output_folder, f"*-{file_name}.md"))
-        if existing:
-            print(f"Pulando {file_name} (já processado).")
-            continue
-            
-        print(f"Processando: {file_name}...")
+    if not html_files:
+        return
+    # Created only when there is work, so empty scheduled runs don't import a provider SDK
+    client = client or get_client(provider)
+
+    try:
+        if batch:
+            _process_reports_batch(client, html_files, output_folder, provider, poll_interval, compact, max_prompt_tokens, route, manifest)
+        elif max_workers <= 1:
+            for file_path in html_files:
+                process_report_file(client, file_path, output_folder, provider, compact, max_prompt_tokens, route, manifest)
+        else:
+            # The SDK clients are thread-safe, so a thread pool is enough to overlap the LLM round-trips
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        process_report_file, client, file_path, output_folder, provider, compact, max_prompt_tokens, route, manifest
+                    )
+                    for file_path in html_files
+                ]
+                for future in as_completed(futures):
+                    future.result()
+    finally:
+        _settle_jobs(
+            STAGE_SUNO_REPORTS, html_files,
+            lambda path: _report_already_processed(output_folder, os.path.splitext(os.path.basename(path))[0]),
+            manifest
+        )
+
+def process_report_file(client, file_path, output_folder, provider="openai", compact=False, max_prompt_tokens=MAX_REPORT_PROMPT_TOKENS,
+                        route=True, manifest=None):
+    """
+    Summarizes a single HTML report. Returns the output path, or None if skipped or failed.
+    With a manifest (JobQueue), content already summarized under another name is reused.
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    if _report_already_processed(output_folder, file_name):
+        print(f"Pulando {file_name} (já processado).")
+        return None
         
+    print(f"Processando: {file_name}...")
+    
+    with span("processar: relatório", file=file_name) as record:
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 html_content = f.read()
-                
-            prompt = f"""
-                Você é um especialista em investimentos de longo prazo. Receberá a seguir um relatório em HTML.
-    
-                **TAREFA**:
-                1. Apenas se o relaótio não for o "radar-fii" (que tem uma extensa lista de FIIs e seus índices), verificar se o relatório contém recomendação de COMPRA, VENDA ou AJUSTE DE CARTEIRA de algum ativo.
-                2. Caso contenha, listar (em Markdown):
-                - Nome do ativo
-                - Se é compra, venda ou ajuste
-                - Preço-teto (se houver)
-                - Percentual de alocação (se houver)
-                - Curta justificativa
-                3. Se não houver nenhuma recomendação (ou for o "radar-fii"), apresente apenas um resumo sucinto do conteúdo (em Markdown), enfatizando o que for relevante para investimentos de longo prazo.
-                4. Evite adjetivos em excesso.
-                5. Retorne JSON com keys: "fileNamePrefix" ("com-recomendacao" ou "sem-recomendacao") e "result" (markdown).
-    
-                **RELATÓRIO (HTML)**:
-                {html_content}
-            """
+
+            digest = content_hash(html_content)
+            reused = _reuse_report_output(manifest, digest, file_name, output_folder)
+            if reused:
+                print(f"Conteúdo já processado (mesmo hash), resumo reaproveitado: {reused}")
+                record["status"] = "reused"
+                return reused
             
-            # Select model based on provider logic or defaults
-            model = "gpt-4o" if provider == "openai" else "claude-sonnet-4-20250514"
-            response = client.analyze_report(prompt, model=model)
+            content, content_format = html_content, "HTML"
+            if compact:
+                content, content_format = _compact_report(file_name, html_content), "Markdown"
+            tier = _route_report(file_name, content) if route else TIER_LARGE
+            record["tier"] = tier
+            if compact and _is_oversized(content, max_prompt_tokens):
+                content = _summarize_chunks(client, file_name, content, provider, max_prompt_tokens, _tier_model(tier, provider))
+
+            response = _analyze_routed_report(client, file_name, content, content_format, provider, tier)
+            output_file = _save_report_result(response, file_name, output_folder)
+            if output_file and manifest:
+                manifest.remember_output(f"{STAGE_SUNO_REPORTS}#{digest}", digest, output_file)
+            return output_file
             
-            if isinstance(response, dict):
-                prefix = response.get("fileNamePrefix", "nd")
-                result = response.get("result", "")
-                
-                output_file = os.path.join(output_folder, f"{prefix}-{file_name}.md")
-                with open(output_file, "w", encoding="utf-8") as f:
-                    f.write(result)
-                print(f"Salvo: {output_file}")
-            else:
-                print(f"Erro: Resposta inesperada para {file_name}: {response}")
-                
         except Exception as e:
             print(f"Erro ao processar {file_name}: {e}")
+            record["status"] = "error"
+            record["error"] = str(e)
+    return None
 
-def process_suno_wallets_step1_html_to_md(html_folder, output_md_folder, provider="openai"):
-    """Step 1: Convert Suno HTML wallets to MD (containing CSV data)"""
-    client = get_client(provider)
+def _process_reports_batch(client, html_files, output_folder, provider, poll_interval, compact=False, max_prompt_tokens=MAX_REPORT_PROMPT_TOKENS,
+                           route=True, manifest=None):
+    # tier -> file name -> (content, content format)
+    contents = {TIER_LARGE: {}, TIER_SMALL: {}}
+    # file name -> content hash
+    hashes = {}
+    for file_path in html_files:
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
+        if _report_already_processed(output_folder, file_name):
+            print(f"Pulando {file_name} (já processado).")
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            html_content = f.read()
+
+        hashes[file_name] = content_hash(html_content)
+        reused = _reuse_report_output(manifest, hashes[file_name], file_name, output_folder)
+        if reused:
+            print(f"Conteúdo já processado (mesmo hash), resumo reaproveitado: {reused}")
+            continue
+
+        content, content_format = html_content, "HTML"
+        if compact:
+            content, content_format = _compact_report(file_name, html_content), "Markdown"
+            if _is_oversized(content, max_prompt_tokens):
+                # Map-reduce needs several dependent calls, so these go through the synchronous path
+                process_report_file(client, file_path, output_folder, provider, compact, max_prompt_tokens, route, manifest)
+                continue
+        tier = _route_report(file_name, content) if route else TIER_LARGE
+        contents[tier][file_name] = (content, content_format)
+
+    if not contents[TIER_LARGE] and not contents[TIER_SMALL]:
+        return
+
+    responses = {}
+    for tier, template in ((TIER_LARGE, "relatorio"), (TIER_SMALL, "relatorio-resumo")):
+        prompts = {
+            file_name: render_prompt(template, content=content, content_format=content_format)
+            for file_name, (content, content_format) in contents[tier].items()
+        }
+        if not prompts:
+            continue
+        print(f"Enviando {len(prompts)} relatórios em lote (modelo {tier})...")
+        try:
+            responses.update(client.analyze_report_batch(prompts, model=_tier_model(tier, provider), poll_interval=poll_interval))
+        except Exception as e:
+            print(f"Erro no lote de relatórios: {e}")
+
+    for tier in (TIER_LARGE, TIER_SMALL):
+        for file_name, (content, content_format) in contents[tier].items():
+            if file_name not in responses:
+                print(f"Erro: Sem resposta no lote para {file_name}.")
+                continue
+            response = responses[file_name]
+            if tier == TIER_SMALL and _flagged_by_small_model(response):
+                # Few enough that a second batch round-trip is not worth it
+                print(f"Modelo pequeno encontrou recomendação em {file_name}; usando o modelo grande.")
+                try:
+                    response = client.analyze_report(_build_report_prompt(content, content_format), model=_default_model(provider))
+                except Exception as e:
+                    print(f"Erro ao processar {file_name}: {e}")
+                    continue
+            output_file = _save_report_result(response, file_name, output_folder)
+            if output_file and manifest:
+                manifest.remember_output(f"{STAGE_SUNO_REPORTS}#{hashes[file_name]}", hashes[file_name], output_file)
+
+def _route_report(file_name, content):
+    route = classify_report(content, file_name)
+    if route.tier == TIER_LARGE:
+        print(f"Triagem de {file_name}: sinal de recomendação ({route.signal!r}), modelo grande.")
+    else:
+        print(f"Triagem de {file_name}: sem sinal de recomendação, resumo no modelo pequeno.")
+    return route.tier
+
+def _tier_model(tier, provider):
+    return small_model(provider) if tier == TIER_SMALL else _default_model(provider)
+
+def _flagged_by_small_model(response):
+    verdict = ReportVerdict.from_response(response)
+    return verdict is None or verdict.file_name_prefix != "sem-recomendacao"
+
+def _analyze_routed_report(client, file_name, content, content_format, provider, tier):
+    """
+    Small tier: summary prompt on the small model, escalated to the large model when it still finds a
+    recommendation (or answers badly). Large tier: the full extraction prompt on the large model.
+    """
+    if tier == TIER_SMALL:
+        prompt = render_prompt("relatorio-resumo", content=content, content_format=content_format)
+        response = client.analyze_report(prompt, model=small_model(provider))
+        if not _flagged_by_small_model(response):
+            return response
+        print(f"Modelo pequeno encontrou recomendação em {file_name}; usando o modelo grande.")
+        annotate(tier=TIER_LARGE, escalated=True)
+    return client.analyze_report(_build_report_prompt(content, content_format), model=_default_model(provider))
+
+def _reuse_report_output(manifest, digest, file_name, output_folder):
+    """
+    When a report with the same content hash was already summarized (e.g. saved again under another URL),
+    copies that summary to this file name. Returns the output path, or None.
+    """
+    if not manifest:
+        return None
+    last = manifest.last_output(f"{STAGE_SUNO_REPORTS}#{digest}")
+    if last is None or not os.path.exists(last[1]):
+        return None
+    previous = os.path.basename(last[1])
+    prefix = next((p for p in REPORT_PREFIXES + ("nd",) if previous.startswith(f"{p}-")), "nd")
+    output_file = os.path.join(output_folder, f"{prefix}-{file_name}.md")
+    if os.path.abspath(last[1]) != os.path.abspath(output_file):
+        shutil.copyfile(last[1], output_file)
+    return output_file
+
+def report_summary_exists(file_path, output_folder) -> bool:
+    """
+    Whether the report at file_path already has a summary in output_folder, i.e. process_report_file skips it.
+    """
+    return _report_already_processed(output_folder, os.path.splitext(os.path.basename(file_path))[0])
+
+def _report_already_processed(output_folder, file_name):
+    # Simplified check: looking for any file starting with prefix-filename
+    return bool(glob.glob(os.path.join(output_folder, f"*-{file_name}.md")))
+
+def _compact_report(file_name, html_content):
+    content, stats = compact_html(html_content)
+    print(f"Compactado {file_name}: {stats['tokens_before']} -> {stats['tokens_after']} tokens.")
+    return content
+
+def _is_oversized(content, max_prompt_tokens):
+    return len(chunk_text(content, max_prompt_tokens)) > 1
+
+def _summarize_chunks(client, file_name, content, provider, max_prompt_tokens, model=None):
+    """
+    Map step for oversized reports: summarizes each chunk and returns the joined partial summaries.
+    """
+    chunks = chunk_text(content, max_prompt_tokens)
+    print(f"Relatório {file_name} dividido em {len(chunks)} partes.")
+
+    partials = []
+    for idx, chunk in enumerate(chunks, start=1):
+        prompt = render_prompt("relatorio-parte", index=idx, total=len(chunks), content=chunk)
+        # Not analyze_report: its verdict schema requires a fileNamePrefix the part prompt does not ask for
+        response = client.generate_structured(prompt, REPORT_PART_SCHEMA, model=model or _default_model(provider))
+        if isinstance(response, dict):
+            partials.append(response.get("result", ""))
+        else:
+            print(f"Erro: Resposta inesperada na parte {idx} de {file_name}.")
+
+    return "\n\n".join(partials)
+
+def _build_report_prompt(content, content_format="HTML"):
+    return render_prompt("relatorio", content=content, content_format=content_format)
+
+def _save_report_result(response, file_name, output_folder):
+    verdict = ReportVerdict.from_response(response)
+    if verdict is None:
+        print(f"Erro: Resposta inesperada para {file_name}: {response}")
+        return None
+
+    output_file = os.path.join(output_folder, f"{verdict.file_name_prefix}-{file_name}.md")
+    _write_output(output_file, verdict.result)
+    print(f"Salvo: {output_file}")
+    return output_file
+
+def process_suno_wallets_step1_html_to_md(html_folder, output_md_folder, provider="openai", use_local_parser=True, batch=False, poll_interval=60,
+                                          use_manifest=False, skip_unchanged=True):
+    """
+    Step 1: Convert Suno HTML wallets to MD (containing CSV data).
+    Tables are parsed locally first; the LLM is only called when no wallet table passes the schema check.
+    With batch=True, the LLM fallbacks go in a single provider batch job.
+    With use_manifest=True, pending jobs are taken from the run manifest instead of files created today, and the
+    MD files are queued for step 2. The input hashes live in the manifest too, so skip_unchanged=True (a wallet
+    whose HTML has the same hash as last time reuses the previous MD) only applies then.
+    """
+    # Created on first LLM fallback, so local-only runs don't need API keys
+    client = None
     os.makedirs(output_md_folder, exist_ok=True)
-    today = date.today()
-    today_str = today.strftime("%Y-%m-%d")
+    manifest = _run_manifest(use_manifest)
 
-    html_files = [
-        os.path.join(html_folder, f) 
-        for f in os.listdir(html_folder)
-        if f.endswith(".html") and datetime.fromtimestamp(os.path.getctime(os.path.join(html_folder, f))).date() == today
-    ]
+    html_files = _input_files(html_folder, ".html", STAGE_SUNO_WALLETS_HTML, manifest)
     
     print(f"Encontrados {len(html_files)} carteiras HTML de hoje para processar.")
 
+    def output_for(file_path):
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(output_md_folder, f"{file_name}-{_file_date(file_path)}.md")
+
+    # output file -> prompt, when batching the LLM fallbacks
+    batch_prompts = {}
+    # MD files written in this run, handed to step 2 through the manifest
+    written = []
+    # output file -> (wallet key, input hash)
+    hashes = {}
+
     for file_path in html_files:
         file_name = os.path.splitext(os.path.basename(file_path))[0]
-        output_file = os.path.join(output_md_folder, f"{file_name}-{today_str}.md")
+        output_file = output_for(file_path)
         
         if os.path.exists(output_file):
             print(f"Pulando {file_name} (já convertido para MD).")
@@ -107,88 +416,347 @@ def process_suno_wallets_step1_html_to_md(html_folder, output_md_folder, provide
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                  html_content = f.read()
+
+            hashes[output_file] = (f"{STAGE_SUNO_WALLETS_MD}:{wallet_name(file_path)}", content_hash(html_content))
+            if skip_unchanged and _reuse_unchanged_output(manifest, *hashes[output_file], output_file):
+                print(f"Carteira sem mudanças, MD anterior reaproveitado: {output_file}")
+                written.append(output_file)
+                continue
+
+            if use_local_parser:
+                result_md = wallet_html_to_markdown(html_content)
+                if result_md is not None:
+                    _write_output(output_file, result_md)
+                    print(f"Salvo MD (parser local): {output_file}")
+                    written.append(output_file)
+                    continue
+                print(f"Parser local falhou para {file_name}, usando LLM.")
     
-            prompt = f"""
-            - Você é um especialista em planilhas extremamente meticuloso. Receberá a seguir um relatório em HTML que contém dados tabulares.
-            - Analise o conteúdo e organize as informações relevantes em um ou mais blocos CSV.
-            - Retorne SOMENTE o texto em formato Markdown (.md), contendo as tabelas CSV.
-            - Se precisar de mais de um CSV, separe-os com um título.
-            - Ignore colunas sem dados.
-            - Ignore a coluna "Ativo".
-            
-            Relatório (HTML):
-            {html_content}
-            """
-            
-            model = "gpt-4o" if provider == "openai" else "claude-sonnet-4-20250514"
-            # Increase token limit for large spreadsheets
-            result_md = client.convert_spreadsheet(prompt, model=model, max_tokens=8192 if provider=="claude" else 16384)
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(result_md)
+            prompt = _build_wallet_md_prompt(html_content)
+            if batch:
+                batch_prompts[output_file] = prompt
+                continue
+
+            client = client or get_client(provider)
+            result_md = client.convert_spreadsheet(prompt, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider))
+            _write_output(output_file, result_md)
             print(f"Salvo MD: {output_file}")
+            written.append(output_file)
             
         except Exception as e:
             print(f"Erro ao processar carteira {file_name}: {e}")
 
-def process_suno_wallets_step2_md_to_csv(md_folder, output_csv_folder, provider="openai"):
-    """Step 2: Extract CSV from MD files and normalize columns"""
-    client = get_client(provider)
+    if batch_prompts:
+        print(f"Enviando {len(batch_prompts)} carteiras em lote...")
+        client = client or get_client(provider)
+        written += _write_spreadsheet_batch(client, batch_prompts, provider, poll_interval, "Salvo MD")
+
+    _remember_outputs(manifest, hashes, written)
+    _record_jobs(manifest, STAGE_SUNO_WALLETS_MD, written)
+    _settle_jobs(STAGE_SUNO_WALLETS_HTML, html_files, lambda path: os.path.exists(output_for(path)), manifest)
+
+def _build_wallet_md_prompt(html_content):
+    return render_prompt("carteira-md", content=html_content)
+
+def process_suno_wallets_step2_md_to_csv(md_folder, output_csv_folder, provider="openai", batch=False, poll_interval=60, use_manifest=False,
+                                         structured=True, skip_unchanged=True):
+    """
+    Step 2: Extract CSV from MD files and normalize columns.
+    With structured=True the model returns typed rows (WALLET_ROWS_SCHEMA) and the CSV is written here;
+    structured=False keeps the free-text CSV answer.
+    With batch=True, all files go in a single provider batch job.
+    With use_manifest=True, pending jobs written by step 1 are taken from the run manifest and the CSVs are
+    queued for loading; skip_unchanged=True (a wallet whose MD has the same hash as last time reuses the
+    previous CSV) only applies then.
+    """
     os.makedirs(output_csv_folder, exist_ok=True)
     today_str = date.today().strftime("%Y-%m-%d")
+    manifest = _run_manifest(use_manifest)
     
-    # Filter for relevant files (simplified logic from original)
-    md_files = glob.glob(os.path.join(md_folder, f"*-{today_str}.md"))
+    if manifest:
+        md_files = manifest.claim(STAGE_SUNO_WALLETS_MD)
+    else:
+        # Filter for relevant files (simplified logic from original)
+        md_files = glob.glob(os.path.join(md_folder, f"*-{today_str}.md"))
     
     print(f"Encontrados {len(md_files)} arquivos MD para converter em CSV.")
+    if not md_files:
+        return
+    client = get_client(provider)
+
+    def output_for(file_path):
+        return os.path.join(output_csv_folder, os.path.basename(file_path).replace(".md", ".csv"))
+
+    # output file -> prompt, when batching
+    batch_prompts = {}
+    written = []
+    hashes = {}
     
     for file_path in md_files:
-        file_name_base = os.path.basename(file_path).replace(".md", ".csv")
-        output_file = os.path.join(output_csv_folder, file_name_base)
+        output_file = output_for(file_path)
         
         print(f"Convertendo para CSV: {os.path.basename(file_path)}...")
         
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
+
+            hashes[output_file] = (f"{STAGE_WALLET_CSV}:{wallet_name(file_path)}", content_hash(content))
+            if skip_unchanged and _reuse_unchanged_output(manifest, *hashes[output_file], output_file):
+                print(f"Carteira sem mudanças, CSV anterior reaproveitado: {output_file}")
+                written.append(output_file)
+                continue
                 
-            prompt = f"""
-            Você receberá um arquivo `.md` contendo tabelas em formato CSV.
-            Nome do arquivo: {os.path.basename(file_path)}
-            Sua tarefa é **extrair exclusivamente a tabela principal da carteira de ativos** e **padronizar os nomes das colunas**.
-            
-            1. Identifique a tabela correta.
-            2. Padronize colunas para: Posição, Ticker, Empresa, Setor, Preço de Entrada (R$), Preço Atual (R$), Preço Teto (R$), Peso na Carteira (%), Rentabilidade (%), Dividend Yield (%), Recomendação.
-            3. Mantenha formatação CSV (separado por , ou ; conforme padrão).
-            4. Retorne APENAS a tabela CSV.
-            5. Insira coluna 'Tipo Carteira'.
-            
-            Conteúdo:
-            {content}
-            """
-            
-            model = "gpt-4o" if provider == "openai" else "claude-sonnet-4-20250514"
-            result_csv = client.convert_spreadsheet(prompt, model=model, max_tokens=8192 if provider=="claude" else 16384)
-            
-            # Clean markdown code blocks if any
-            if result_csv.startswith("```csv"):
-                result_csv = result_csv[6:]
-            if result_csv.endswith("```"):
-                result_csv = result_csv[:-3]
-            result_csv = result_csv.strip()
+            if structured:
+                prompt = _build_wallet_rows_prompt(os.path.basename(file_path), content)
+            else:
+                prompt = _build_wallet_csv_prompt(os.path.basename(file_path), content)
+            if batch:
+                batch_prompts[output_file] = prompt
+                continue
+
+            if structured:
+                response = client.generate_structured(
+                    prompt, WALLET_ROWS_SCHEMA, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider)
+                )
+                result_csv = _wallet_rows_csv(response)
+                if result_csv is None:
+                    print(f"Erro: Nenhuma linha de carteira em {os.path.basename(file_path)}.")
+                    continue
+            else:
+                result_csv = _strip_csv_fences(client.convert_spreadsheet(
+                    prompt, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider)
+                ))
             
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(result_csv)
+            _write_output(output_file, result_csv)
             print(f"Salvo CSV: {output_file}")
+            written.append(output_file)
             
         except Exception as e:
             print(f"Erro ao converter {os.path.basename(file_path)}: {e}")
 
-def process_meus_dividendos_to_csv(html_file, output_csv_folder, provider="openai"):
+    if batch_prompts:
+        print(f"Enviando {len(batch_prompts)} arquivos MD em lote...")
+        if structured:
+            written += _write_spreadsheet_batch(client, batch_prompts, provider, poll_interval, "Salvo CSV", _wallet_rows_csv,
+                                                schema=WALLET_ROWS_SCHEMA)
+        else:
+            written += _write_spreadsheet_batch(client, batch_prompts, provider, poll_interval, "Salvo CSV", _strip_csv_fences)
+
+    _remember_outputs(manifest, hashes, written)
+    _record_jobs(manifest, STAGE_WALLET_CSV, written)
+    _settle_jobs(STAGE_SUNO_WALLETS_MD, md_files, lambda path: output_for(path) in written, manifest)
+
+def process_suno_wallets_html_to_csv(html_folder, output_csv_folder, provider="openai", use_manifest=False, skip_unchanged=True):
     """
-    Converts Meus Dividendos HTML to CSV.
+    Fused steps 1+2: one streamed LLM call per wallet, from cleaned HTML straight to the normalized CSV.
+    Rows are appended to the CSV as they arrive. Output names match step 2, so both paths can be compared.
+    With use_manifest=True, pending jobs are taken from the run manifest instead of files created today and the
+    CSVs are queued for loading; skip_unchanged=True (a wallet whose HTML has the same hash as last time
+    reuses the previous CSV) only applies then.
     """
+    manifest = _run_manifest(use_manifest)
+    html_files = _input_files(html_folder, ".html", STAGE_SUNO_WALLETS_HTML, manifest)
+
+    print(f"Encontrados {len(html_files)} carteiras HTML de hoje para converter em CSV.")
+    if not html_files:
+        return
     client = get_client(provider)
+
+    for file_path in html_files:
+        convert_wallet_html_to_csv(client, file_path, output_csv_folder, provider, skip_unchanged, manifest)
+
+    _settle_jobs(
+        STAGE_SUNO_WALLETS_HTML, html_files, lambda path: os.path.exists(_fused_output_for(path, output_csv_folder)), manifest
+    )
+
+def convert_wallet_html_to_csv(client, file_path, output_csv_folder, provider="openai", skip_unchanged=True, manifest=None):
+    """
+    Fused conversion of a single wallet HTML file. Returns the CSV path, or None if skipped or failed.
+    With a manifest (JobQueue), unchanged wallets reuse the previous CSV and the CSV is queued for loading.
+    """
+    os.makedirs(output_csv_folder, exist_ok=True)
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_file = _fused_output_for(file_path, output_csv_folder)
+
+    if os.path.exists(output_file):
+        print(f"Pulando {file_name} (já convertido para CSV).")
+        return None
+
+    print(f"Convertendo carteira para CSV: {file_name}...")
+
+    writer = _CsvLineWriter(output_file)
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            html_content = f.read()
+
+        # Hashes the HTML, unlike step 2 (the MD), so the two paths must not share a key
+        key, digest = f"{STAGE_WALLET_CSV}-fundido:{wallet_name(file_path)}", content_hash(html_content)
+        if skip_unchanged and _reuse_unchanged_output(manifest, key, digest, output_file):
+            print(f"Carteira sem mudanças, CSV anterior reaproveitado: {output_file}")
+            _record_jobs(manifest, STAGE_WALLET_CSV, [output_file])
+            return output_file
+
+        prompt = _build_wallet_html_csv_prompt(file_name, html_content)
+        with span("processar: carteira", file=file_path, mode="fundido") as record:
+            client.stream_spreadsheet(
+                prompt, writer.feed, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider),
+                on_restart=writer.reset
+            )
+            writer.close()
+            record["bytes_out"] = writer.bytes
+            record["rows"] = writer.rows
+        if writer.rows <= 1:
+            raise ValueError("resposta sem linhas de carteira")
+        print(f"Salvo CSV ({writer.rows - 1} linhas): {output_file}")
+        _remember_outputs(manifest, {output_file: (key, digest)}, [output_file])
+        _record_jobs(manifest, STAGE_WALLET_CSV, [output_file])
+        return output_file
+
+    except Exception as e:
+        # A half-written CSV would be taken as done on the next run
+        writer.discard()
+        print(f"Erro ao converter carteira {file_name}: {e}")
+    return None
+
+def wallet_csv_exists(file_path, output_csv_folder) -> bool:
+    """
+    Whether the wallet at file_path already has its CSV, i.e. convert_wallet_html_to_csv skips it.
+    """
+    return os.path.exists(_fused_output_for(file_path, output_csv_folder))
+
+def _fused_output_for(file_path, output_csv_folder):
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_csv_folder, f"{file_name}-{_file_date(file_path)}.csv")
+
+class _CsvLineWriter:
+    """
+    Appends streamed text to a CSV file one complete line at a time, dropping Markdown fences and blank lines.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.pending = ""
+        self.rows = 0
+        self.bytes = 0
+
+    def feed(self, text):
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self._write_line(line)
+
+    def reset(self):
+        """
+        Starts the file over, when the stream is retried from the beginning.
+        """
+        if self.file:
+            self.file.seek(0)
+            self.file.truncate()
+        self.pending = ""
+        self.rows = 0
+        self.bytes = 0
+
+    def close(self):
+        if self.pending:
+            self._write_line(self.pending)
+            self.pending = ""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _write_line(self, line):
+        line = line.strip()
+        if not line or line.startswith("```"):
+            return
+        if self.file is None:
+            self.file = open(self.path, "w", encoding="utf-8")
+        # Rows are separated, not terminated, by newlines, like the other CSV outputs
+        text = line if self.rows == 0 else "\n" + line
+        self.file.write(text)
+        self.file.flush()
+        self.rows += 1
+        self.bytes += len(text)
+
+def _build_wallet_html_csv_prompt(file_name, html_content):
+    return render_prompt("carteira-html-csv", file_name=file_name, content=html_content)
+
+def _build_wallet_csv_prompt(file_name, content):
+    return render_prompt("carteira-csv", file_name=file_name, content=content)
+
+def _build_wallet_rows_prompt(file_name, content):
+    return render_prompt("carteira-linhas", file_name=file_name, content=content)
+
+def _wallet_rows_csv(response):
+    """
+    CSV text of a WALLET_ROWS_SCHEMA answer, or None when it has no valid rows.
+    """
+    rows = wallet_rows_from_response(response)
+    return wallet_rows_to_csv(rows) if rows else None
+
+def _strip_csv_fences(result_csv):
+    # Clean markdown code blocks if any
+    if result_csv.startswith("```csv"):
+        result_csv = result_csv[6:]
+    if result_csv.endswith("```"):
+        result_csv = result_csv[:-3]
+    return result_csv.strip()
+
+def _write_spreadsheet_batch(client, prompts, provider, poll_interval, saved_label, postprocess=None, schema=None):
+    """
+    Runs convert_spreadsheet (or generate_structured, with a schema) as one batch job and writes each
+    result to the output file used as its id. Returns the output files written.
+    """
+    try:
+        if schema is not None:
+            results = client.generate_structured_batch(
+                prompts, schema, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider), poll_interval=poll_interval
+            )
+        else:
+            results = client.convert_spreadsheet_batch(
+                prompts, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider), poll_interval=poll_interval
+            )
+    except Exception as e:
+        print(f"Erro no lote: {e}")
+        return []
+
+    written = []
+    for output_file in prompts:
+        if output_file not in results:
+            print(f"Erro: Sem resposta no lote para {os.path.basename(output_file)}.")
+            continue
+        text = postprocess(results[output_file]) if postprocess else results[output_file]
+        if text is None:
+            print(f"Erro: Resposta inválida no lote para {os.path.basename(output_file)}.")
+            continue
+        _write_output(output_file, text)
+        print(f"{saved_label}: {output_file}")
+        written.append(output_file)
+    return written
+
+def process_meus_dividendos_to_csv(html_file, output_csv_folder, provider="openai", use_local_parser=True, use_manifest=False,
+                                   manifest=None):
+    """
+    Converts Meus Dividendos HTML to CSV. Returns the CSV path, or None on failure.
+    The table is parsed locally first; the LLM is only called when it fails the schema check.
+    With use_manifest=True, html_file is ignored and every pending job in the run manifest is converted.
+    With a manifest (JobQueue), the CSV is queued for loading.
+    """
     os.makedirs(output_csv_folder, exist_ok=True)
+
+    if use_manifest:
+        manifest = manifest or open_manifest()
+        for path in manifest.claim(STAGE_MEUS_DIVIDENDOS):
+            if process_meus_dividendos_to_csv(path, output_csv_folder, provider, use_local_parser, manifest=manifest):
+                manifest.mark_done(STAGE_MEUS_DIVIDENDOS, path)
+            else:
+                manifest.mark_failed(STAGE_MEUS_DIVIDENDOS, path)
+        return None
     
     if not os.path.exists(html_file):
         print(f"File not found: {html_file}")
@@ -199,27 +767,25 @@ def process_meus_dividendos_to_csv(html_file, output_csv_folder, provider="opena
     try:
         with open(html_file, "r", encoding="utf-8") as f:
             html_content = f.read()
-            
-        prompt = f"""
-        - Você é um especialista em planilhas extremamente meticuloso. Receberá a seguir uma planilha em HTML.
-        - Converta para CSV separado por ponto e vírgula (;).
-        - Mantenha títulos.
-        - Retorne APENAS o CSV.
-        
-        Planilha (HTML):
-        {html_content}
-        """
-        
-        model = "gpt-4o" if provider == "openai" else "claude-sonnet-4-20250514"
-        csv_output = client.convert_spreadsheet(prompt, model=model, max_tokens=8192 if provider=="claude" else 16384)
+
+        csv_output = spreadsheet_html_to_csv(html_content) if use_local_parser else None
+        if csv_output is None:
+            if use_local_parser:
+                print("Parser local falhou para Meus Dividendos, usando LLM.")
+            csv_output = _convert_meus_dividendos_with_llm(get_client(provider), html_content, provider)
         
         # Save
-        today_str = date.today().strftime("%Y-%m-%d")
-        filename = os.path.join(output_csv_folder, f"carteira-meus-dividendos-{today_str}.csv")
+        filename = os.path.join(output_csv_folder, f"carteira-meus-dividendos-{_file_date(html_file)}.csv")
         
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(csv_output)
+        _write_output(filename, csv_output)
         print(f"Salvo Meus Dividendos CSV: {filename}")
+        _record_jobs(manifest, STAGE_WALLET_CSV, [filename])
+        return filename
         
     except Exception as e:
         print(f"Erro ao processar Meus Dividendos: {e}")
+    return None
+
+def _convert_meus_dividendos_with_llm(client, html_content, provider):
+    prompt = render_prompt("meus-dividendos-csv", content=html_content)
+    return client.convert_spreadsheet(prompt, model=_default_model(provider), max_tokens=_spreadsheet_max_tokens(provider))
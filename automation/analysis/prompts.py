@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from automation.analysis.schemas import WALLET_COLUMNS
+
+# Providers cache the longest prompt prefix already seen (OpenAI automatically, Anthropic up to a
+# cache_control breakpoint), so every template keeps its instructions first and identical across calls,
+# and only the content part varies. Both only cache prefixes above ~1024 tokens: shorter instructions
+# are still sent first, together with the system text and the tool schema that come before them.
+
+class Prompt(str):
+    """
+    A rendered prompt. Still a plain string for the clients and the response cache, but it remembers
+    where its static prefix ends (for the Anthropic cache breakpoint) and which template made it.
+    """
+    def __new__(cls, prefix, content, template):
+        prompt = super().__new__(cls, prefix + content)
+        prompt.prefix = prefix
+        prompt.template = template
+        return prompt
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    instructions is the static prefix; it may only use fields with a handful of values (e.g. the content
+    format), so each variant stays a stable prefix. content holds everything that changes per call.
+    Bump version whenever the wording changes.
+    """
+    name: str
+    version: int
+    instructions: str
+    content: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **fields) -> Prompt:
+        return Prompt(self.instructions.format(**fields), self.content.format(**fields), self.label)
+
+_templates = {}
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    versions = _templates.setdefault(template.name, {})
+    if template.version in versions:
+        raise ValueError(f"Prompt {template.label} já registrado.")
+    versions[template.version] = template
+    return template
+
+def get_template(name, version=None) -> PromptTemplate:
+    """
+    The given version of a template, or its latest one.
+    """
+    versions = _templates[name]
+    return versions[version if version is not None else max(versions)]
+
+def render_prompt(name, version=None, **fields) -> Prompt:
+    return get_template(name, version).render(**fields)
+
+register(PromptTemplate("relatorio", 2, """\
+Você é um especialista em investimentos de longo prazo. Receberá a seguir um relatório em {content_format}.
+
+**TAREFA**:
+1. Apenas se o relaótio não for o "radar-fii" (que tem uma extensa lista de FIIs e seus índices), verificar se o relatório contém recomendação de COMPRA, VENDA ou AJUSTE DE CARTEIRA de algum ativo.
+2. Caso contenha, listar (em Markdown):
+- Nome do ativo
+- Se é compra, venda ou ajuste
+- Preço-teto (se houver)
+- Percentual de alocação (se houver)
+- Curta justificativa
+3. Se não houver nenhuma recomendação (ou for o "radar-fii"), apresente apenas um resumo sucinto do conteúdo (em Markdown), enfatizando o que for relevante para investimentos de longo prazo.
+4. Evite adjetivos em excesso.
+5. Retorne JSON com keys: "fileNamePrefix" ("com-recomendacao" ou "sem-recomendacao") e "result" (markdown).
+
+""", """\
+**RELATÓRIO ({content_format})**:
+{content}
+"""))
+
+# Cheap tier of the report router: reports without recommendation signals only need a summary, but the
+# small model may still flag one, which sends the report to the large model with the "relatorio" prompt
+register(PromptTemplate("relatorio-resumo", 1, """\
+Você é um especialista em investimentos de longo prazo. Receberá a seguir um relatório em {content_format}.
+
+**TAREFA**:
+1. Apresente um resumo sucinto do conteúdo (em Markdown), enfatizando o que for relevante para investimentos de longo prazo.
+2. Evite adjetivos em excesso.
+3. Se o relatório contiver recomendação de COMPRA, VENDA ou AJUSTE DE CARTEIRA de algum ativo (exceto no "radar-fii"), retorne "fileNamePrefix" = "com-recomendacao" e "result" vazio.
+4. Caso contrário, retorne JSON com keys: "fileNamePrefix" ("sem-recomendacao") e "result" (markdown).
+
+""", """\
+**RELATÓRIO ({content_format})**:
+{content}
+"""))
+
+register(PromptTemplate("relatorio-parte", 2, """\
+Você receberá uma parte de um relatório de investimentos (em Markdown).
+Resuma de forma sucinta o conteúdo relevante para investimentos de longo prazo, preservando
+integralmente qualquer recomendação de COMPRA, VENDA ou AJUSTE DE CARTEIRA (ativo, preço-teto, alocação, justificativa).
+Retorne JSON com a key "result" (markdown).
+
+""", """\
+**PARTE {index} DE {total} DO RELATÓRIO**:
+{content}
+"""))
+
+register(PromptTemplate("carteira-md", 2, """\
+- Você é um especialista em planilhas extremamente meticuloso. Receberá a seguir um relatório em HTML que contém dados tabulares.
+- Analise o conteúdo e organize as informações relevantes em um ou mais blocos CSV.
+- Retorne SOMENTE o texto em formato Markdown (.md), contendo as tabelas CSV.
+- Se precisar de mais de um CSV, separe-os com um título.
+- Ignore colunas sem dados.
+- Ignore a coluna "Ativo".
+
+""", """\
+Relatório (HTML):
+{content}
+"""))
+
+register(PromptTemplate("carteira-csv", 2, """\
+Você receberá um arquivo `.md` contendo tabelas em formato CSV.
+Sua tarefa é **extrair exclusivamente a tabela principal da carteira de ativos** e **padronizar os nomes das colunas**.
+
+1. Identifique a tabela correta.
+2. Padronize colunas para: Posição, Ticker, Empresa, Setor, Preço de Entrada (R$), Preço Atual (R$), Preço Teto (R$), Peso na Carteira (%), Rentabilidade (%), Dividend Yield (%), Recomendação.
+3. Mantenha formatação CSV (separado por , ou ; conforme padrão).
+4. Retorne APENAS a tabela CSV.
+5. Insira coluna 'Tipo Carteira', preenchida a partir do nome do arquivo.
+
+""", """\
+Nome do arquivo: {file_name}
+Conteúdo:
+{content}
+"""))
+
+register(PromptTemplate("carteira-linhas", 2, """\
+Você receberá um arquivo `.md` contendo tabelas em formato CSV.
+Sua tarefa é **extrair exclusivamente as linhas da tabela principal da carteira de ativos**.
+
+1. Identifique a tabela correta; ignore tabelas de resumo ou histórico.
+2. Uma linha por ativo, com os campos do schema.
+3. Números como decimais simples (ex.: 1234.56), sem "R$" nem "%".
+4. Preencha tipo_carteira a partir do nome do arquivo.
+5. Use null para dados ausentes.
+
+""", """\
+Nome do arquivo: {file_name}
+Conteúdo:
+{content}
+"""))
+
+register(PromptTemplate("carteira-html-csv", 2, """\
+- Você é um especialista em planilhas extremamente meticuloso. Receberá a seguir uma carteira recomendada em HTML.
+- Extraia **exclusivamente a tabela principal da carteira de ativos**; ignore tabelas de resumo ou histórico.
+- Retorne APENAS o CSV, separado por ";", sem blocos de código e sem texto antes ou depois.
+- A primeira linha deve ser exatamente: """ + ";".join(column for _, column, _ in WALLET_COLUMNS) + """
+- Uma linha por ativo. Números como decimais simples (ex.: 1234.56), sem "R$" nem "%". Deixe vazio o que não existir.
+- Preencha 'Tipo Carteira' a partir do nome do arquivo.
+
+""", """\
+Nome do arquivo: {file_name}
+Carteira (HTML):
+{content}
+"""))
+
+register(PromptTemplate("meus-dividendos-csv", 2, """\
+- Você é um especialista em planilhas extremamente meticuloso. Receberá a seguir uma planilha em HTML.
+- Converta para CSV separado por ponto e vírgula (;).
+- Mantenha títulos.
+- Retorne APENAS o CSV.
+
+""", """\
+Planilha (HTML):
+{content}
+"""))
@@ -0,0 +1,236 @@
+import re
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from automation.config import LLM_MAX_RETRIES, LLM_DEFAULT_RPM, LLM_DEFAULT_TPM
+from automation.telemetry import annotate
+
+# 429 = rate limited, 529 = Anthropic overloaded; the 5xx are transient server errors
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504, 529)
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+_DURATION_RE = re.compile(r"([\d.]+)(ms|h|m|s)")
+
+# Rate-limit headers: (limit, remaining, reset) for requests and tokens
+_HEADERS = {
+    "openai": {
+        "requests": ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+        "tokens": ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    },
+    "claude": {
+        "requests": ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+        "tokens": ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+    },
+}
+
+class Budget:
+    """
+    Per-minute allowance refilled continuously (token bucket). capacity None means unlimited.
+    """
+    def __init__(self, per_minute=None):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now) -> float:
+        self._refill(now)
+        if self.capacity is None:
+            return 0.0
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / self.capacity
+
+    def take(self, amount):
+        if self.capacity is not None:
+            self.available -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        if self.capacity is not None and amount > 0:
+            self.available = min(self.capacity, self.available + amount)
+
+    def observe(self, limit=None, remaining=None):
+        """
+        Adopts the limit and remaining allowance reported by the provider.
+        """
+        self._refill(time.monotonic())
+        if limit:
+            if self.capacity is None:
+                self.available = limit
+            self.capacity = limit
+        if remaining is not None and self.capacity is not None:
+            self.available = min(self.available, remaining)
+
+    def _refill(self, now):
+        if self.capacity is not None:
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+class ModelLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets of one model, shared by every worker thread.
+    """
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = Budget(rpm)
+        self.tokens = Budget(tpm)
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens) -> float:
+        """
+        Blocks until a request of ~tokens fits both budgets, then reserves it. Returns the seconds waited.
+        """
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now), self.paused_until - now)
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return now - start
+                self._cond.wait(wait)
+
+    def settle(self, reserved, used):
+        """
+        Returns the unused part of a reservation once the real usage is known.
+        """
+        with self._cond:
+            if used > reserved:
+                self.tokens.take(used - reserved)
+            else:
+                self.tokens.give_back(reserved - used)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """
+        Holds every worker of this model, e.g. after a 429.
+        """
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, provider, headers):
+        if not headers:
+            return
+        names = _HEADERS.get(provider)
+        if names is None:
+            return
+        with self._cond:
+            for kind, budget in (("requests", self.requests), ("tokens", self.tokens)):
+                limit_name, remaining_name, reset_name = names[kind]
+                budget.observe(_header_int(headers, limit_name), _header_int(headers, remaining_name))
+                if _header_int(headers, remaining_name) == 0:
+                    reset = _reset_seconds(headers.get(reset_name))
+                    if reset:
+                        self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            self._cond.notify_all()
+
+class RequestScheduler:
+    """
+    Runs LLM requests within per-model RPM/TPM budgets, learning the real limits from the
+    rate-limit headers, and retries 429/529/5xx with jittered exponential backoff.
+    """
+    def __init__(self, max_retries=LLM_MAX_RETRIES, base_delay=1.0, max_delay=60.0, default_rpm=LLM_DEFAULT_RPM, default_tpm=LLM_DEFAULT_TPM):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider, model) -> ModelLimiter:
+        with self._lock:
+            key = (provider, model)
+            if key not in self._limiters:
+                self._limiters[key] = ModelLimiter(self.default_rpm, self.default_tpm)
+            return self._limiters[key]
+
+    def set_limits(self, provider, model, rpm=None, tpm=None):
+        """
+        Sets the budgets up front (e.g. from the account tier) instead of waiting for the headers.
+        """
+        limiter = self.limiter(provider, model)
+        with limiter._cond:
+            limiter.requests.observe(limit=rpm)
+            limiter.tokens.observe(limit=tpm)
+
+    def call(self, provider, model, estimated_tokens, request):
+        """
+        Runs request() -> (headers, result, used_tokens) within the model budget and returns result.
+        Retryable failures pause the model for every worker, then try again up to max_retries times.
+        """
+        limiter = self.limiter(provider, model)
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            waited += limiter.acquire(estimated_tokens)
+            try:
+                headers, result, used_tokens = request()
+            except Exception as e:
+                limiter.settle(estimated_tokens, 0)
+                response = getattr(e, "response", None)
+                limiter.observe(provider, getattr(response, "headers", None))
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    annotate(retries=attempt, throttled_seconds=round(waited, 3))
+                    raise
+                delay = self.backoff(attempt, _retry_after(response))
+                print(f"Limite/erro transitório em {model} ({getattr(e, 'status_code', type(e).__name__)}), nova tentativa em {delay:.1f}s.")
+                limiter.pause(delay)
+                continue
+
+            limiter.observe(provider, headers)
+            limiter.settle(estimated_tokens, used_tokens if used_tokens is not None else estimated_tokens)
+            annotate(retries=attempt, throttled_seconds=round(waited, 3))
+            return result
+
+    def backoff(self, attempt, retry_after=None) -> float:
+        """
+        Full-jitter exponential backoff, never shorter than the server's retry-after.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+def _is_retryable(error) -> bool:
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def _retry_after(response):
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        try:
+            if value is not None:
+                return float(value) * scale
+        except ValueError:
+            pass
+    return None
+
+def _reset_seconds(value):
+    """
+    Parses reset headers: OpenAI durations ("1m2.5s", "20ms") or Anthropic RFC 3339 timestamps.
+    """
+    if not value:
+        return None
+    if "T" in value:
+        try:
+            reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return max((reset_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(number) * units[unit] for number, unit in _DURATION_RE.findall(value))
+
+# Shared by both clients so concurrent workers draw from the same budgets
+SCHEDULER = RequestScheduler()
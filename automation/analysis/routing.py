@@ -0,0 +1,55 @@
+import re
+import html
+from dataclasses import dataclass
+from typing import Optional
+
+TIER_LARGE = "grande"
+TIER_SMALL = "pequeno"
+
+# Cheap tier; the large tier is the default model of the processors
+SMALL_MODELS = {"openai": "gpt-4.1-mini", "claude": "claude-3-5-haiku-20241022"}
+
+# Signals of a buy/sell/adjust call. COMPRA/VENDA are matched in capitals only, which is how the reports
+# state the call; in lower case they are everyday words ("a compra da empresa", "receita de vendas")
+RECOMMENDATION_PATTERNS = [
+    re.compile(r"\b(?:COMPRA|VENDA)\b"),
+    re.compile(r"\bpre[çc]o[- ]teto\b", re.IGNORECASE),
+    re.compile(r"\brecomenda(?:mos|ção|cao)\s+(?:de\s+|a\s+)?(?:compra|venda)\b", re.IGNORECASE),
+    re.compile(r"\b(?:aumentar|reduzir|zerar|iniciar|encerrar)\s+(?:a\s+|nossa\s+)?posi[çc](?:ão|ao)\b", re.IGNORECASE),
+    re.compile(r"\bajuste\s+(?:de|na)\s+carteira\b", re.IGNORECASE),
+    re.compile(r"\b(?:entra|sai)\s+(?:na|da)\s+carteira\b", re.IGNORECASE),
+]
+
+# Reports the "relatorio" prompt always summarizes, whatever they contain
+SUMMARY_ONLY_RE = re.compile(r"radar[-_ ]fii", re.IGNORECASE)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+@dataclass(frozen=True)
+class Route:
+    tier: str
+    # Text that sent the report to the large model, for the logs
+    signal: Optional[str] = None
+
+def report_text(content: str) -> str:
+    """
+    Visible text of a cleaned HTML (or Markdown) report, enough for the keyword checks.
+    """
+    return html.unescape(_TAG_RE.sub(" ", content))
+
+def classify_report(content: str, file_name: str = "") -> Route:
+    """
+    Local first tier: reports with any recommendation signal go to the large model for full extraction,
+    the others only need the cheap summary. Errs on the side of the large model.
+    """
+    if SUMMARY_ONLY_RE.search(file_name):
+        return Route(TIER_SMALL)
+    text = report_text(content)
+    for pattern in RECOMMENDATION_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return Route(TIER_LARGE, match.group(0))
+    return Route(TIER_SMALL)
+
+def small_model(provider) -> str:
+    return SMALL_MODELS["claude" if provider == "claude" else "openai"]
@@ -0,0 +1,166 @@
+import io
+import csv
+from dataclasses import dataclass
+from typing import Optional
+from automation.analysis.tables import parse_br_number, normalize_text
+
+# Output schemas in the OpenAI json_schema shape ({"name", "description", "schema"}); ClaudeClient
+# turns them into a forced tool. Strict mode needs every property required and no extra properties.
+
+REPORT_PREFIXES = ("com-recomendacao", "sem-recomendacao")
+
+REPORT_VERDICT_SCHEMA = {
+    "name": "report_verdict",
+    "description": "Classificação do relatório e resumo em Markdown.",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "fileNamePrefix": {"type": "string", "enum": list(REPORT_PREFIXES)},
+            "result": {"type": "string", "description": "Recomendações ou resumo, em Markdown."},
+        },
+        "required": ["fileNamePrefix", "result"],
+        "additionalProperties": False,
+    },
+}
+
+# Map step of oversized reports: a partial summary only, the verdict comes from the final call
+REPORT_PART_SCHEMA = {
+    "name": "report_part",
+    "description": "Resumo de uma parte do relatório, em Markdown.",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "result": {"type": "string", "description": "Resumo da parte, preservando as recomendações, em Markdown."},
+        },
+        "required": ["result"],
+        "additionalProperties": False,
+    },
+}
+
+# (field, CSV column, JSON type) of a normalized wallet row, in the column order of the CSV
+WALLET_COLUMNS = [
+    ("posicao", "Posição", "integer"),
+    ("ticker", "Ticker", "string"),
+    ("empresa", "Empresa", "string"),
+    ("setor", "Setor", "string"),
+    ("preco_entrada", "Preço de Entrada (R$)", "number"),
+    ("preco_atual", "Preço Atual (R$)", "number"),
+    ("preco_teto", "Preço Teto (R$)", "number"),
+    ("peso", "Peso na Carteira (%)", "number"),
+    ("rentabilidade", "Rentabilidade (%)", "number"),
+    ("dividend_yield", "Dividend Yield (%)", "number"),
+    ("recomendacao", "Recomendação", "string"),
+    ("tipo_carteira", "Tipo Carteira", "string"),
+]
+
+WALLET_ROWS_SCHEMA = {
+    "name": "wallet_rows",
+    "description": "Linhas da tabela principal da carteira, com colunas padronizadas. Use null para dados ausentes.",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "rows": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        name: {"type": json_type if name == "ticker" else [json_type, "null"], "description": column}
+                        for name, column, json_type in WALLET_COLUMNS
+                    },
+                    "required": [name for name, _, _ in WALLET_COLUMNS],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["rows"],
+        "additionalProperties": False,
+    },
+}
+
+@dataclass
+class ReportVerdict:
+    file_name_prefix: str
+    result: str
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Builds the verdict from a schema-constrained answer. Returns None for anything else.
+        """
+        if not isinstance(response, dict) or not isinstance(response.get("result"), str):
+            return None
+        prefix = response.get("fileNamePrefix")
+        return cls(prefix if prefix in REPORT_PREFIXES else "nd", response["result"])
+
+@dataclass
+class WalletRow:
+    ticker: str
+    posicao: Optional[int] = None
+    empresa: Optional[str] = None
+    setor: Optional[str] = None
+    preco_entrada: Optional[float] = None
+    preco_atual: Optional[float] = None
+    preco_teto: Optional[float] = None
+    peso: Optional[float] = None
+    rentabilidade: Optional[float] = None
+    dividend_yield: Optional[float] = None
+    recomendacao: Optional[str] = None
+    tipo_carteira: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, item: dict):
+        """
+        Coerces one schema row; numbers the model still sent as "R$ 1.234,56" strings are parsed too.
+        Returns None for rows without a ticker.
+        """
+        ticker = normalize_text(str(item.get("ticker") or ""))
+        if not ticker:
+            return None
+        values = {"ticker": ticker}
+        for name, _, json_type in WALLET_COLUMNS:
+            value = item.get(name)
+            if name == "ticker" or value is None:
+                continue
+            if json_type == "string":
+                values[name] = normalize_text(str(value)) or None
+            else:
+                number = value if isinstance(value, (int, float)) else _parse_number(str(value))
+                if number is not None:
+                    values[name] = int(number) if json_type == "integer" else float(number)
+        return cls(**values)
+
+def _parse_number(text):
+    number = parse_br_number(text)
+    if number is None:
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+    return number
+
+def wallet_rows_from_response(response) -> list:
+    """
+    Typed rows from a WALLET_ROWS_SCHEMA answer. Returns an empty list when there are none.
+    """
+    if not isinstance(response, dict) or not isinstance(response.get("rows"), list):
+        return []
+    rows = [WalletRow.from_dict(item) for item in response["rows"] if isinstance(item, dict)]
+    return [row for row in rows if row is not None]
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+def wallet_rows_to_csv(rows: list, delimiter=";") -> str:
+    """
+    Writes the rows with the standard column names, in the same number format as the local table parser.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow([column for _, column, _ in WALLET_COLUMNS])
+    for row in rows:
+        writer.writerow([_format_value(getattr(row, name)) for name, _, _ in WALLET_COLUMNS])
+    return buffer.getvalue().strip()
@@ -0,0 +1,143 @@
+import re
+import io
+import csv
+from bs4 import BeautifulSoup
+
+# "R$ 1.234,56", "-12,3%", "US$ 10.5", "1.234" ...
+BR_NUMBER_RE = re.compile(r"^(?P<sign>[-+]?)\s*(?:R\$|US\$|\$)?\s*(?P<sign2>[-+]?)(?P<number>\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:,\d+)?)\s*(?P<percent>%?)$")
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+# Header names that identify a table listing assets
+ASSET_COLUMNS_RE = re.compile(r"ticker|ativo|c[óo]digo|papel|fundo|empresa", re.IGNORECASE)
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+def parse_br_number(value: str):
+    """
+    Parses Brazilian formatted numbers ("R$ 1.234,56", "12,5%") into floats. Returns None if not numeric.
+    """
+    match = BR_NUMBER_RE.match(normalize_text(value))
+    if not match:
+        return None
+    number = float(match.group("number").replace(".", "").replace(",", "."))
+    if "-" in (match.group("sign"), match.group("sign2")):
+        number = -number
+    return number
+
+def normalize_cell(value: str) -> str:
+    """
+    Normalizes a table cell: collapses whitespace and converts Brazilian numbers/percents to plain decimals.
+    """
+    text = normalize_text(value)
+    number = parse_br_number(text)
+    if number is None:
+        return text
+    return str(int(number)) if number.is_integer() else repr(number)
+
+def extract_tables(html_content: str) -> list:
+    """
+    Extracts every <table> into a dict with "title", "header" and "rows" (normalized cells).
+    """
+    soup = BeautifulSoup(html_content, "html.parser")
+    tables = []
+
+    for table in soup.find_all("table"):
+        rows = []
+        header = []
+        for tr in table.find_all("tr"):
+            cells = tr.find_all(["th", "td"])
+            if not cells:
+                continue
+            values = [normalize_cell(cell.get_text(" ")) for cell in cells]
+            if not header and all(cell.name == "th" for cell in cells):
+                header = values
+            else:
+                rows.append(values)
+
+        if not header and rows:
+            header = rows.pop(0)
+
+        caption = table.find("caption")
+        heading = table.find_previous(HEADING_TAGS)
+        title = normalize_text(caption.get_text(" ")) if caption else (normalize_text(heading.get_text(" ")) if heading else "")
+
+        tables.append({"title": title, "header": header, "rows": rows})
+
+    return tables
+
+def drop_columns(table: dict, names=(), drop_empty=True) -> dict:
+    """
+    Removes columns by header name and (optionally) columns without any data.
+    """
+    lowered = {name.lower() for name in names}
+    keep = []
+    for idx, name in enumerate(table["header"]):
+        if name.lower() in lowered:
+            continue
+        if drop_empty and not any(idx < len(row) and row[idx] for row in table["rows"]):
+            continue
+        keep.append(idx)
+
+    return {
+        "title": table["title"],
+        "header": [table["header"][idx] for idx in keep],
+        "rows": [[row[idx] if idx < len(row) else "" for idx in keep] for row in table["rows"]],
+    }
+
+def is_valid_table(table: dict, min_rows=1) -> bool:
+    """
+    Schema check: a header with at least two columns, enough rows, and every row the header's width.
+    """
+    header = table["header"]
+    if len(header) < 2 or len(table["rows"]) < min_rows:
+        return False
+    return all(len(row) == len(header) for row in table["rows"])
+
+def is_wallet_table(table: dict) -> bool:
+    """
+    A valid table that has a column identifying the assets (ticker, ativo, fundo...).
+    """
+    return is_valid_table(table) and any(ASSET_COLUMNS_RE.search(name) for name in table["header"])
+
+def table_to_csv(table: dict, delimiter=",") -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(table["header"])
+    writer.writerows(table["rows"])
+    return buffer.getvalue().strip()
+
+def tables_to_markdown(tables: list) -> str:
+    """
+    Renders tables in the same shape step 1 asks the LLM for: a title followed by a CSV block.
+    """
+    blocks = []
+    for idx, table in enumerate(tables, start=1):
+        title = table["title"] or f"Tabela {idx}"
+        blocks.append(f"## {title}\n\n```csv\n{table_to_csv(table)}\n```")
+    return "\n\n".join(blocks) + "\n"
+
+def wallet_html_to_markdown(html_content: str):
+    """
+    Deterministic replacement for the step 1 LLM call. Returns None when no wallet table passes the schema check.
+    """
+    tables = [table for table in extract_tables(html_content) if is_wallet_table(table)]
+    if not tables:
+        return None
+    # Same rule as the step 1 prompt: ignore the "Ativo" column, unless it is the only one naming the asset
+    cleaned = []
+    for table in tables:
+        without_ativo = drop_columns(table, names=["Ativo"])
+        cleaned.append(without_ativo if is_wallet_table(without_ativo) else drop_columns(table))
+    return tables_to_markdown(cleaned)
+
+def spreadsheet_html_to_csv(html_content: str, delimiter=";"):
+    """
+    Deterministic replacement for the Meus Dividendos LLM call. Returns None when the table fails the schema check.
+    """
+    tables = [table for table in extract_tables(html_content) if is_wallet_table(table)]
+    if not tables:
+        return None
+    return "\n\n".join(
+        (f"{table['title']}\n" if table["title"] else "") + table_to_csv(table, delimiter=delimiter)
+        for table in tables
+    )
@@ -0,0 +1,133 @@
+import os
+import re
+import zipfile
+import threading
+from datetime import datetime
+from automation.telemetry import span
+
+# Compression of new members, by name; each member records its own, so a zip can mix them
+COMPRESSIONS = {"deflate": zipfile.ZIP_DEFLATED, "bzip2": zipfile.ZIP_BZIP2, "lzma": zipfile.ZIP_LZMA, "store": zipfile.ZIP_STORED}
+DEFAULT_CODEC = "deflate"
+DEFLATE_LEVEL = 6
+
+_MONTH_IN_NAME_RE = re.compile(r"(\d{4}-\d{2})-\d{2}")
+_ZIP_SUFFIX = ".zip"
+
+class Archive:
+    """
+    Append-only archive of downloaded files, one <month>.zip per month (by the date in the file name, else mtime).
+    New files are written in zip append mode, so archived members are never recompressed, and any unzip tool
+    reads the result. A member is found through the zip central directory, so reading it is a single seek.
+    """
+    def __init__(self, folder, codec=DEFAULT_CODEC):
+        if codec not in COMPRESSIONS:
+            raise ValueError(f"Codec desconhecido: {codec} (use {', '.join(COMPRESSIONS)}).")
+        self.folder = folder
+        self.codec = codec
+        self._lock = threading.Lock()
+        # month -> ZipFile opened for reading, dropped when the month gets new members
+        self._readers = {}
+        os.makedirs(folder, exist_ok=True)
+
+        # member name -> month, for O(1) lookups across months
+        self.members = {}
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.endswith(_ZIP_SUFFIX):
+                month = file_name[:-len(_ZIP_SUFFIX)]
+                with zipfile.ZipFile(self._path(month)) as archive:
+                    for name in archive.namelist():
+                        self.members[name] = month
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def months(self) -> list:
+        return sorted(set(self.members.values()))
+
+    def names(self, month=None) -> list:
+        if month is not None:
+            return [name for name, member_month in self.members.items() if member_month == month]
+        return list(self.members)
+
+    def read(self, name) -> bytes:
+        """
+        Reads one member without extracting the rest of its month.
+        """
+        month = self.members[name]
+        # Under the lock, since an append closes the reader of its month
+        with self._lock:
+            if month not in self._readers:
+                self._readers[month] = zipfile.ZipFile(self._path(month))
+            return self._readers[month].read(name)
+
+    def read_text(self, name) -> str:
+        return self.read(name).decode("utf-8")
+
+    def add_files(self, files) -> list:
+        """
+        Archives (name, path) pairs that are not in the archive yet. Returns the names added.
+        """
+        pending = [(name, path) for name, path in files if name not in self.members]
+        if not pending:
+            return []
+
+        by_month = {}
+        for name, path in pending:
+            by_month.setdefault(_month_of(name, os.path.getmtime(path)), []).append((name, path))
+
+        with span("arquivo: compactar", files=len(pending), codec=self.codec) as record:
+            record["bytes"] = record["bytes_out"] = 0
+            with self._lock:
+                for month, month_files in sorted(by_month.items()):
+                    reader = self._readers.pop(month, None)
+                    if reader is not None:
+                        reader.close()
+                    # Append mode writes after the existing members and rewrites only the central directory
+                    with zipfile.ZipFile(self._path(month), "a", COMPRESSIONS[self.codec], compresslevel=self._level(),
+                                         strict_timestamps=False) as archive:
+                        for name, path in month_files:
+                            archive.write(path, name)
+                            info = archive.getinfo(name)
+                            record["bytes"] += info.file_size
+                            record["bytes_out"] += info.compress_size
+                            self.members[name] = month
+        return [name for name, _ in pending]
+
+    def close(self):
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+    def _path(self, month):
+        return os.path.join(self.folder, f"{month}{_ZIP_SUFFIX}")
+
+    def _level(self):
+        return DEFLATE_LEVEL if self.codec == "deflate" else None
+
+def _month_of(name, mtime) -> str:
+    match = _MONTH_IN_NAME_RE.search(os.path.basename(name))
+    if match:
+        return match.group(1)
+    return datetime.fromtimestamp(mtime).strftime("%Y-%m")
+
+def archive_folder(folder_path, archive_folder_path, codec=DEFAULT_CODEC) -> list:
+    """
+    Appends the files of folder_path (recursively, named by relative path) that are not archived yet to the
+    monthly zips in archive_folder_path. Already archived names are skipped without a stat.
+    Returns the names added.
+    """
+    archive = Archive(archive_folder_path, codec)
+    skip = os.path.abspath(archive_folder_path)
+    files = []
+    for root, dirs, file_names in os.walk(folder_path):
+        # Blob store and archives of the same downloads root are not archive material
+        dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != skip]
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            files.append((os.path.relpath(path, folder_path).replace(os.sep, "/"), path))
+
+    added = archive.add_files(files)
+    archive.close()
+    print(f"Arquivados {len(added)} arquivos novos ({len(files) - len(added)} já estavam no arquivo).")
+    return added
@@ -0,0 +1,63 @@
+import os
+import shutil
+import threading
+from automation.utils import content_hash
+from automation.telemetry import span
+
+class BlobStore:
+    """
+    Content-addressed store of downloaded pages: each distinct content (by content_hash, so volatile
+    fragments don't count) is written once under <root>/<2 hex>/<hash>, and the dated file names are
+    hard links to it.
+    """
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def save(self, path, text, hash_text=None):
+        """
+        Stores text and links it at path, replacing what was there. hash_text, when given, is what gets
+        hashed (e.g. the cleaned version of a raw page). Returns (hash, True if the content was new).
+        """
+        digest = content_hash(hash_text if hash_text is not None else text)
+        blob = self.blob_path(digest)
+        with self._lock:
+            is_new = not os.path.exists(blob)
+            if is_new:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                with span("arquivo: blob", path=blob, bytes=len(text)):
+                    with open(blob + ".tmp", "w", encoding="utf-8") as f:
+                        f.write(text)
+                    os.replace(blob + ".tmp", blob)
+            _link(blob, path)
+        return digest, is_new
+
+def _link(blob, path):
+    """
+    Points path at the blob. Falls back to a copy where hard links are not possible (other filesystem).
+    Never writes through an existing link, which would change the blob.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(blob, tmp_path)
+    except OSError:
+        shutil.copyfile(blob, tmp_path)
+    os.replace(tmp_path, path)
+
+_stores = {}
+
+def blob_store_for(download_path):
+    """
+    Shared BlobStore next to a download folder (<parent>/.blobs), so links stay on the same filesystem
+    and the folders of one downloads root share their blobs.
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(download_path)), ".blobs")
+    if root not in _stores:
+        _stores[root] = BlobStore(root)
+    return _stores[root]
@@ -20,3 +20,38 @@ MEUS_DIVIDENDOS_PASSWORD = os.getenv("MEUS_DIVIDENDOS_PASSWORD")
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOWNLOADS_PUBLIC = os.path.join(BASE_DIR, "downloads-publico")
 DOWNLOADS_PRIVATE = os.path.join(BASE_DIR, "downloads-privado")
+
+# Chromedriver binary; when unset it is resolved once per process by webdriver_manager
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
+
+# Login sessions kept across runs: cookies per site (<SESSIONS_DIR>/<site>.json) and, optionally, a persistent
+# Chrome profile for the main browser (drivers of a pool always start fresh and get the cookies copied)
+SESSIONS_DIR = os.getenv("SESSIONS_DIR", os.path.join(BASE_DIR, ".sessoes"))
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR")
+
+# Monthly zips of the downloads (python -m automation archive); outside the download roots so they are not re-archived
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(BASE_DIR, "arquivo"))
+
+# Ids of Suno reports already downloaded
+REPORT_INDEX_PATH = os.path.join(DOWNLOADS_PUBLIC, "relatorios-index.sqlite")
+
+# Run manifest / job queue shared by scrapers and processors
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(BASE_DIR, "manifest.sqlite"))
+
+# Columnar store of every wallet snapshot (partitioned Parquet); holds Meus Dividendos data, so it is private
+SNAPSHOTS_DIR = os.getenv("SNAPSHOTS_DIR", os.path.join(DOWNLOADS_PRIVATE, "carteiras-parquet"))
+
+# LLM response cache (set LLM_CACHE_PATH to a SQLite file to enable)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# Run telemetry: spans are kept in memory; set TELEMETRY_DIR to a folder to also write one JSON-lines file per run
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR") or None
+# Finished spans kept in memory for the reports; the per-name totals of the whole run are kept regardless
+TELEMETRY_MAX_SPANS = int(os.getenv("TELEMETRY_MAX_SPANS", "10000"))
+
+# LLM request scheduler: retries of 429/529/5xx and per-model budgets (learned from the rate-limit headers if unset)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM")) if os.getenv("LLM_DEFAULT_RPM") else None
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM")) if os.getenv("LLM_DEFAULT_TPM") else None
@@ -1,12 +1,31 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import os
+from automation.config import CHROMEDRIVER_PATH
 
-def create_driver(download_path=None, headless=False):
+# Selenium and webdriver_manager are imported by the functions that start a browser,
+# so processing-only runs never load them
+
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """
+    Path of the chromedriver binary: CHROMEDRIVER_PATH if set, else resolved by webdriver_manager
+    once per process (install() checks versions over the network on every call).
+    """
+    if CHROMEDRIVER_PATH:
+        return CHROMEDRIVER_PATH
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+def create_driver(download_path=None, headless=False, profile_dir=None):
     """
     Creates and configures a Chrome WebDriver.
+    With profile_dir, Chrome keeps its profile (cookies, cache) there between runs; a profile can only be
+    used by one browser at a time.
     """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
     options = webdriver.ChromeOptions()
     
     prefs = {
@@ -23,10 +42,10 @@ def create_driver(download_path=None, headless=False):
     
     if headless:
         options.add_argument("--headless")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
 
-    # Install/Get driver path via webdriver_manager
-    # Note: The original code used ChromeDriverManager().install() which returns the path
-    service = Service(ChromeDriverManager().install())
+    service = Service(chromedriver_path())
     
     driver = webdriver.Chrome(service=service, options=options)
     return driver
@@ -43,3 +62,51 @@ def set_download_path(driver, download_path):
         "downloadPath": abs_path
     })
 
+def copy_session(source_driver, target_driver, url):
+    """
+    Copies the cookies of a logged-in driver into another driver.
+    The target must visit the site first, since cookies can only be set for the current domain.
+    """
+    target_driver.get(url)
+    for cookie in source_driver.get_cookies():
+        # Chrome rejects some sameSite values coming back from get_cookies
+        cookie.pop("sameSite", None)
+        target_driver.add_cookie(cookie)
+    target_driver.get(url)
+
+def create_driver_pool(size, source_driver=None, session_url=None, download_path=None, headless=True):
+    """
+    Creates `size` drivers, optionally sharing the session cookies of source_driver.
+    """
+    drivers = []
+    try:
+        for _ in range(size):
+            new_driver = create_driver(download_path=download_path, headless=headless)
+            drivers.append(new_driver)
+            if source_driver is not None and session_url:
+                copy_session(source_driver, new_driver, session_url)
+    except Exception:
+        close_driver_pool(drivers)
+        raise
+    return drivers
+
+def close_driver_pool(drivers):
+    for pool_driver in drivers:
+        try:
+            pool_driver.quit()
+        except Exception:
+            pass
+
+def run_in_pool(drivers, items, worker):
+    """
+    Splits items round-robin across drivers and runs worker(driver, items_shard) for each one in parallel.
+    """
+    items = list(items)
+    shards = [items[idx::len(drivers)] for idx in range(len(drivers))]
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        futures = [
+            executor.submit(worker, pool_driver, shard)
+            for pool_driver, shard in zip(drivers, shards) if shard
+        ]
+        for future in futures:
+            future.result()
@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import threading
+from automation.config import MANIFEST_PATH
+
+# Stages: scrapers enqueue into them, processors consume from them
+STAGE_SUNO_REPORTS = "suno-relatorios"
+STAGE_SUNO_WALLETS_HTML = "suno-carteiras-html"
+STAGE_SUNO_WALLETS_MD = "suno-carteiras-md"
+STAGE_MEUS_DIVIDENDOS = "meus-dividendos"
+# Normalized wallet CSVs, consumed by the snapshot load stage
+STAGE_WALLET_CSV = "carteiras-csv"
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+class JobQueue:
+    """
+    SQLite-backed run manifest. Each saved file is a job (stage, path) moving through
+    pending -> processing -> done/failed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "stage TEXT NOT NULL, path TEXT NOT NULL, state TEXT NOT NULL, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (stage, path))"
+        )
+        # Last input hash handled per key (e.g. stage + wallet) and the output it produced
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            "key TEXT PRIMARY KEY, hash TEXT NOT NULL, path TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def enqueue(self, stage, path):
+        """
+        Adds a job as pending. A file saved again (re-downloaded) goes back to pending unless it is being processed.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (stage, path, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (stage, path) DO UPDATE SET state = excluded.state, error = NULL, updated_at = excluded.updated_at "
+                "WHERE jobs.state != ?",
+                (stage, os.path.abspath(path), PENDING, now, now, PROCESSING)
+            )
+            self._conn.commit()
+
+    def claim(self, stage, limit=None) -> list:
+        """
+        Moves pending jobs of a stage to processing and returns their paths (oldest first).
+        """
+        with self._lock:
+            query = "SELECT path FROM jobs WHERE stage = ? AND state = ? ORDER BY created_at"
+            params = [stage, PENDING]
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            paths = [row[0] for row in self._conn.execute(query, params).fetchall()]
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE stage = ? AND path = ?",
+                [(PROCESSING, time.time(), stage, path) for path in paths]
+            )
+            self._conn.commit()
+        return paths
+
+    def mark_done(self, stage, path):
+        self._set_state(stage, path, DONE)
+
+    def mark_failed(self, stage, path, error=None):
+        self._set_state(stage, path, FAILED, error)
+
+    def requeue(self, stage, states=(PROCESSING, FAILED)):
+        """
+        Puts interrupted (and by default failed) jobs back to pending, to resume after a crash.
+        """
+        placeholders = ",".join("?" * len(states))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET state = ?, updated_at = ? WHERE stage = ? AND state IN ({placeholders})",
+                [PENDING, time.time(), stage, *states]
+            )
+            self._conn.commit()
+
+    def counts(self, stage) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs WHERE stage = ? GROUP BY state", (stage,)).fetchall()
+        return dict(rows)
+
+    def last_output(self, key):
+        """
+        Returns (hash, output path) last remembered for key, or None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT hash, path FROM outputs WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def remember_output(self, key, content_hash, path):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outputs (key, hash, path, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET hash = excluded.hash, path = excluded.path, updated_at = excluded.updated_at",
+                (key, content_hash, os.path.abspath(path), time.time())
+            )
+            self._conn.commit()
+
+    def _set_state(self, stage, path, state, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE stage = ? AND path = ?",
+                (state, error, time.time(), stage, os.path.abspath(path))
+            )
+            self._conn.commit()
+
+_queues = {}
+
+def open_manifest(path=None):
+    """
+    Returns a shared JobQueue per path (MANIFEST_PATH by default, read at call time).
+    """
+    path = path or MANIFEST_PATH
+    if path not in _queues:
+        _queues[path] = JobQueue(path)
+    return _queues[path]
+
+def recording(stage, on_saved=None):
+    """
+    on_saved callback for the scrapers that enqueues each saved file as a job of stage, then calls on_saved.
+    Only runs that consume the manifest (use_manifest=True, the pipeline) should record, or jobs pile up pending.
+    """
+    manifest = open_manifest()
+
+    def record(path):
+        manifest.enqueue(stage, path)
+        if on_saved:
+            on_saved(path)
+    return record
@@ -1,21 +1,26 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+from selenium.common.exceptions import TimeoutException
 import os
 from datetime import date
 from bs4 import BeautifulSoup
 from automation.config import MEUS_DIVIDENDOS_EMAIL, MEUS_DIVIDENDOS_PASSWORD
 from automation.driver import set_download_path
+from automation.manifest import recording, STAGE_MEUS_DIVIDENDOS
+from automation.waits import wait_for_page_stable, wait_for_url_change
+from automation.telemetry import span
+from automation.blobs import blob_store_for
+from automation.sessions import SiteSession
 
-def download_meus_dividendos_wallet(driver, download_path):
-    """
-    Downloads wallet data from Meus Dividendos.
-    """
-    set_download_path(driver, download_path)
+LOGIN_URL = "https://portal.meusdividendos.com/login"
+SMARTFOLIO_URL = "https://smartfolio.meusdividendos.com/beta"
+
+def _form_login(driver):
     wait = WebDriverWait(driver, 20)
-    
-    driver.get("https://portal.meusdividendos.com/login")
+
+    with span("página: meus dividendos (login)"):
+        driver.get(LOGIN_URL)
     
     try:
         email_input = wait.until(EC.presence_of_element_located((By.ID, "ng_flow_input_email")))
@@ -26,34 +31,51 @@ def download_meus_dividendos_wallet(driver, download_path):
         
         login_button = driver.find_element(By.CSS_SELECTOR, "button.ng_flow_user_right_inputs_btn")
         login_button.click()
-        time.sleep(5)
+        wait_for_url_change(driver, "/login", "meus dividendos: login", budget=10)
     except TimeoutException:
         print("Login page skipped or fields not found (already logged in?).")
+
+MEUS_DIVIDENDOS_SESSION = SiteSession("meus-dividendos", "meusdividendos.com", SMARTFOLIO_URL, _form_login, probe_budget=15)
+
+def download_meus_dividendos_wallet(driver, download_path, on_saved=None, use_manifest=False):
+    """
+    Downloads wallet data from Meus Dividendos.
+    on_saved(path) is called with the saved file, e.g. to feed a pipeline stage.
+    With use_manifest=True, the file is also queued in the run manifest for process --manifest.
+    """
+    if use_manifest:
+        on_saved = recording(STAGE_MEUS_DIVIDENDOS, on_saved)
+    set_download_path(driver, download_path)
+    wait = WebDriverWait(driver, 20)
     
-    time.sleep(5)
-    
-    driver.get("https://smartfolio.meusdividendos.com/beta")
-    time.sleep(15)
+    # The session probe opens the smartfolio page, so a valid session lands right where the download starts
+    MEUS_DIVIDENDOS_SESSION.ensure(driver)
+    if not driver.current_url.startswith(SMARTFOLIO_URL):
+        with span("página: meus dividendos (smartfolio)"):
+            driver.get(SMARTFOLIO_URL)
+            wait_for_page_stable(driver, "meus dividendos: smartfolio", budget=15)
     
     # Click Wallet
     carteira_btn = wait.until(EC.element_to_be_clickable(
         (By.XPATH, "//button[.//span[contains(text(),'Carteira')]]")
     ))
     carteira_btn.click()
-    time.sleep(15)
+    wait_for_page_stable(driver, "meus dividendos: carteira", budget=15)
     
     # Click "Todos" tab
     todos_tab = wait.until(EC.element_to_be_clickable(
         (By.XPATH, "//li[@class='nav-item']/a[.//small[contains(text(),'Todos')]]")
     ))
     todos_tab.click()
-    time.sleep(15)
+    wait_for_page_stable(driver, "meus dividendos: todos", budget=15)
     
     # Get Table
-    table_container = wait.until(EC.presence_of_element_located(
-        (By.CSS_SELECTOR, "div.table-responsive.portfolio-report-table-container")
-    ))
-    table_html = table_container.get_attribute("innerHTML")
+    with span("dom: meus dividendos") as record:
+        table_container = wait.until(EC.presence_of_element_located(
+            (By.CSS_SELECTOR, "div.table-responsive.portfolio-report-table-container")
+        ))
+        table_html = table_container.get_attribute("innerHTML")
+        record["bytes"] = len(table_html)
     
     # Clean HTML
     soup = BeautifulSoup(table_html, "html.parser")
@@ -66,7 +88,9 @@ def download_meus_dividendos_wallet(driver, download_path):
     today_str = date.today().strftime("%Y-%m-%d")
     filename = os.path.join(download_path, f"carteira-meus-dividendos-{today_str}.htm")
     
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(clean_html_content)
+    with span("arquivo: meus dividendos", path=filename, bytes=len(clean_html_content)) as record:
+        record["hash"], record["new"] = blob_store_for(download_path).save(filename, clean_html_content)
+    if on_saved:
+        on_saved(filename)
         
     return filename
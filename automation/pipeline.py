@@ -0,0 +1,246 @@
+import os
+import time
+import queue
+import threading
+from automation.config import DOWNLOADS_PUBLIC, DOWNLOADS_PRIVATE, CHROME_PROFILE_DIR
+from automation.manifest import open_manifest, STAGE_SUNO_REPORTS, STAGE_SUNO_WALLETS_HTML, STAGE_MEUS_DIVIDENDOS, STAGE_WALLET_CSV
+from automation.telemetry import span
+
+# Items waiting between two stages; a full queue blocks the producer instead of piling up files
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()
+
+class Stage:
+    """
+    A pipeline node. Sources (no inputs) run function(emit) once; the other stages run function(item) for each
+    item coming from their inputs and emit what it returns (None emits nothing).
+    """
+    def __init__(self, name, function, inputs=(), after=(), workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.after = list(after)
+        self.workers = workers if inputs else 1
+        self.queue = queue.Queue(maxsize=queue_size) if inputs else None
+        self.consumers = []
+        self.done = threading.Event()
+        self.open_inputs = len(self.inputs)
+        self.running = self.workers
+        self.items = 0
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+class Pipeline:
+    """
+    Stages connected by bounded queues, each running in its own threads, so a stage starts on the first item
+    as soon as it is produced. Stages must be added after the stages they read from or wait for,
+    which keeps the graph acyclic. after= only orders stages (e.g. scrapers sharing one browser).
+    """
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def source(self, name, function, after=()):
+        return self._add(Stage(name, function, after=after))
+
+    def stage(self, name, function, inputs, after=(), workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        return self._add(Stage(name, function, inputs, after, workers, queue_size))
+
+    def _add(self, stage):
+        if stage.name in self.stages:
+            raise ValueError(f"Etapa duplicada: {stage.name}")
+        for name in stage.inputs + stage.after:
+            if name not in self.stages:
+                raise ValueError(f"Etapa {stage.name} depende de {name}, que precisa ser adicionada antes.")
+        for name in stage.inputs:
+            self.stages[name].consumers.append(stage)
+        self.stages[stage.name] = stage
+        return stage
+
+    def run(self) -> dict:
+        """
+        Runs every stage to completion. Returns name -> {"items", "errors", "seconds"}.
+        """
+        threads = []
+        for stage in self.stages.values():
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage,), name=f"pipeline: {stage.name}", daemon=True)
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return self.report()
+
+    def report(self) -> dict:
+        results = {}
+        print(f"{'Etapa':<28} {'Itens':>6} {'Erros':>6} {'Início':>8} {'Fim':>8}")
+        origin = min((s.started for s in self.stages.values() if s.started), default=0)
+        for stage in self.stages.values():
+            started = (stage.started or origin) - origin
+            finished = (stage.finished or origin) - origin
+            results[stage.name] = {"items": stage.items, "errors": stage.errors, "seconds": finished - started}
+            print(f"{stage.name:<28} {stage.items:>6} {stage.errors:>6} {started:>7.1f}s {finished:>7.1f}s")
+        return results
+
+    def _emit(self, stage, item):
+        if item is None:
+            return
+        with self._lock:
+            stage.items += 1
+        for consumer in stage.consumers:
+            consumer.queue.put(item)
+
+    def _work(self, stage):
+        # Set once this worker has taken its _DONE; until then its producers may still be putting items
+        closed = not stage.inputs
+        try:
+            for name in stage.after:
+                self.stages[name].done.wait()
+            with self._lock:
+                stage.started = stage.started or time.monotonic()
+
+            with span(f"pipeline: {stage.name}"):
+                if not stage.inputs:
+                    try:
+                        stage.function(lambda item: self._emit(stage, item))
+                    except Exception as e:
+                        print(f"Erro na etapa {stage.name}: {e}")
+                        with self._lock:
+                            stage.errors += 1
+                else:
+                    while True:
+                        item = stage.queue.get()
+                        if item is _DONE:
+                            closed = True
+                            break
+                        try:
+                            self._emit(stage, stage.function(item))
+                        except Exception as e:
+                            print(f"Erro na etapa {stage.name} ({item}): {e}")
+                            with self._lock:
+                                stage.errors += 1
+        finally:
+            # Whatever happened, producers must not block on a full queue and consumers must get their _DONE
+            if not closed:
+                self._drain(stage)
+            self._finish(stage)
+
+    def _drain(self, stage):
+        """
+        Discards this worker's remaining items (counted as errors) up to its _DONE.
+        """
+        while stage.queue.get() is not _DONE:
+            with self._lock:
+                stage.errors += 1
+
+    def _finish(self, stage):
+        with self._lock:
+            stage.running -= 1
+            if stage.running:
+                return
+            stage.finished = time.monotonic()
+            closed = []
+            for consumer in stage.consumers:
+                consumer.open_inputs -= 1
+                if consumer.open_inputs == 0:
+                    closed.append(consumer)
+        for consumer in closed:
+            for _ in range(consumer.workers):
+                consumer.queue.put(_DONE)
+        stage.done.set()
+
+def _tracked(manifest, manifest_stage, function, is_done=None):
+    """
+    Wraps a per-file processor so its manifest job ends up done or failed. The processors return None both when
+    they fail and when they skip a file whose output already exists, so is_done(path) tells the two apart:
+    a skipped file is done, with nothing new to emit.
+    """
+    def run(path):
+        output = function(path)
+        if output or (is_done is not None and is_done(path)):
+            manifest.mark_done(manifest_stage, path)
+        else:
+            manifest.mark_failed(manifest_stage, path)
+        return output
+    return run
+
+def run_ingest(driver=None, provider="openai", report_workers=4, wallet_workers=2, headless=False, load=False):
+    """
+    Whole ingest as one pipeline: Suno reports -> wallets -> Meus Dividendos are scraped one after the other
+    with the same browser, while each saved file is already being summarized/converted by the LLM stages.
+    Wallets go through the fused HTML -> CSV conversion. With load=True the CSVs are also loaded into the
+    snapshot store. Returns the per-stage results.
+    """
+    # Selenium and the processors are only imported by the runs that use them
+    from automation.driver import create_driver
+    from automation.suno.auth import login_suno
+    from automation.suno.reports import download_suno_reports
+    from automation.suno.wallets import download_suno_wallets
+    from automation.meus_dividendos.scraper import download_meus_dividendos_wallet
+    from automation.analysis.processors import (get_client, process_report_file, convert_wallet_html_to_csv, process_meus_dividendos_to_csv,
+                                                report_summary_exists, wallet_csv_exists)
+
+    client = get_client(provider)
+    # The scrapers enqueue every saved file (use_manifest=True); the stages settle those jobs and queue their outputs
+    manifest = open_manifest()
+    reports_html = os.path.join(DOWNLOADS_PUBLIC, "html-relatorios")
+    reports_md = os.path.join(DOWNLOADS_PUBLIC, "resumos-relatorios")
+    wallets_html = os.path.join(DOWNLOADS_PUBLIC, "html-carteiras")
+    wallets_csv = os.path.join(DOWNLOADS_PUBLIC, "carteiras-csv")
+    meus_dividendos_html = os.path.join(DOWNLOADS_PRIVATE, "meus-dividendos")
+    meus_dividendos_csv = os.path.join(DOWNLOADS_PRIVATE, "meus-dividendos-csv")
+    os.makedirs(reports_md, exist_ok=True)
+
+    def scrape_reports(emit):
+        login_suno(driver)
+        download_suno_reports(driver, reports_html, on_saved=emit, use_manifest=True)
+
+    pipeline = Pipeline()
+    pipeline.source("suno: relatórios", scrape_reports)
+    pipeline.source(
+        "suno: carteiras", lambda emit: download_suno_wallets(driver, wallets_html, on_saved=emit, use_manifest=True), after=["suno: relatórios"]
+    )
+    pipeline.source(
+        "meus dividendos", lambda emit: download_meus_dividendos_wallet(driver, meus_dividendos_html, on_saved=emit, use_manifest=True),
+        after=["suno: carteiras"]
+    )
+
+    pipeline.stage(
+        "resumos",
+        _tracked(
+            manifest, STAGE_SUNO_REPORTS, lambda path: process_report_file(client, path, reports_md, provider, manifest=manifest),
+            lambda path: report_summary_exists(path, reports_md)
+        ),
+        inputs=["suno: relatórios"], workers=report_workers
+    )
+    pipeline.stage(
+        "carteiras: csv",
+        _tracked(
+            manifest, STAGE_SUNO_WALLETS_HTML, lambda path: convert_wallet_html_to_csv(client, path, wallets_csv, provider, manifest=manifest),
+            lambda path: wallet_csv_exists(path, wallets_csv)
+        ),
+        inputs=["suno: carteiras"], workers=wallet_workers
+    )
+    pipeline.stage(
+        "meus dividendos: csv",
+        _tracked(
+            manifest, STAGE_MEUS_DIVIDENDOS, lambda path: process_meus_dividendos_to_csv(path, meus_dividendos_csv, provider, manifest=manifest)
+        ),
+        inputs=["meus dividendos"]
+    )
+    if load:
+        from automation.snapshots import open_snapshot_store
+        store = open_snapshot_store()
+        pipeline.stage("carga", _tracked(manifest, STAGE_WALLET_CSV, store.load_csv), inputs=["carteiras: csv", "meus dividendos: csv"])
+
+    # A driver passed in belongs to the caller (e.g. the notebook keeps using it); one created here is quit here
+    owns_driver = driver is None
+    if owns_driver:
+        driver = create_driver(headless=headless, profile_dir=CHROME_PROFILE_DIR)
+    try:
+        return pipeline.run()
+    finally:
+        if owns_driver:
+            driver.quit()
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+from automation.config import SESSIONS_DIR
+from automation.waits import wait_for_page_stable
+from automation.telemetry import span
+
+# Fields accepted by Network.setCookies; getAllCookies also returns read-only ones (size, session, ...)
+_COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+class SiteSession:
+    """
+    Keeps one site logged in across runs. ensure() opens probe_url and checks is_logged_in; when the
+    session is gone it restores the cookies saved by the last run and probes again, and only then
+    falls back to login (the form login). Cookies are read and written through CDP, so every
+    subdomain of the site is covered without visiting it first.
+    """
+    def __init__(self, name, domain, probe_url, login, is_logged_in=None, probe_budget=5, folder=SESSIONS_DIR):
+        self.name = name
+        self.domain = domain
+        self.probe_url = probe_url
+        self.login = login
+        self.is_logged_in = is_logged_in or (lambda driver: "/login" not in driver.current_url)
+        self.probe_budget = probe_budget
+        self.cookie_path = os.path.join(folder, f"{name}.json") if folder else None
+
+    def ensure(self, driver) -> str:
+        """
+        Returns how the session was obtained: "ativa" (browser profile), "cookies", "login" or "falhou".
+        """
+        with span(f"sessão: {self.name}", url=self.probe_url) as record:
+            # A fresh profile has no cookies for the site, so there is nothing to probe yet
+            if self._browser_cookies(driver) and self._probe(driver):
+                status = "ativa"
+            elif self.restore(driver) and self._probe(driver):
+                status = "cookies"
+            else:
+                self.login(driver)
+                status = "login" if self._probe(driver) else "falhou"
+            record["status"] = status
+
+        if status == "falhou":
+            print(f"Sessão {self.name}: login não confirmado.")
+        else:
+            self.save(driver)
+        return status
+
+    def _probe(self, driver) -> bool:
+        driver.get(self.probe_url)
+        wait_for_page_stable(driver, f"{self.name}: sessão", budget=self.probe_budget)
+        return self.is_logged_in(driver)
+
+    def _browser_cookies(self, driver) -> list:
+        return [
+            cookie for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+            if cookie["domain"].lstrip(".").endswith(self.domain)
+        ]
+
+    def save(self, driver):
+        if not self.cookie_path:
+            return
+        cookies = self._browser_cookies(driver)
+        os.makedirs(os.path.dirname(self.cookie_path), exist_ok=True)
+        tmp_path = self.cookie_path + ".tmp"
+        # Session cookies are credentials: readable by the owner only
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            json.dump(cookies, f)
+        os.replace(tmp_path, self.cookie_path)
+
+    def restore(self, driver) -> bool:
+        """
+        Loads the saved cookies that have not expired into the browser. Returns False when there are none.
+        """
+        if not self.cookie_path or not os.path.exists(self.cookie_path):
+            return False
+        try:
+            with open(self.cookie_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cookies de {self.name} ilegíveis: {e}")
+            return False
+
+        now = time.time()
+        cookies = []
+        for cookie in saved:
+            # Browser-session cookies come back with expires=-1; they are what keeps most logins alive
+            if cookie.get("expires", -1) > 0 and cookie["expires"] < now:
+                continue
+            cookie = {field: cookie[field] for field in _COOKIE_FIELDS if field in cookie}
+            if cookie.get("expires", -1) <= 0:
+                cookie.pop("expires", None)
+            cookies.append(cookie)
+        if not cookies:
+            return False
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        return True
+
+    def forget(self):
+        """
+        Drops the saved cookies, e.g. after a password change.
+        """
+        if self.cookie_path and os.path.exists(self.cookie_path):
+            os.remove(self.cookie_path)
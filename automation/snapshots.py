@@ -0,0 +1,346 @@
+import io
+import os
+import re
+import csv
+import json
+import unicodedata
+from datetime import date
+from automation.config import SNAPSHOTS_DIR
+from automation.manifest import open_manifest, STAGE_WALLET_CSV
+from automation.telemetry import span
+from automation.utils import wallet_name
+from automation.analysis.schemas import WALLET_COLUMNS, WalletRow
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# <name>-YYYY-MM-DD.csv, as written by the wallet and Meus Dividendos processors; the wallet is
+# wallet_name(<name>), since Suno names also carry the scrape date
+SNAPSHOT_FILE_RE = re.compile(r"^(?P<wallet>.+)-(?P<date>\d{4}-\d{2}-\d{2})\.csv$")
+
+# Header spellings seen in the CSVs (normalized by _header_key) -> WalletRow field
+HEADER_ALIASES = {
+    "posicao": "posicao", "pos": "posicao", "#": "posicao",
+    "ticker": "ticker", "ativo": "ticker", "codigo": "ticker", "papel": "ticker",
+    "empresa": "empresa", "nome": "empresa",
+    "setor": "setor", "segmento": "setor",
+    "preco de entrada": "preco_entrada", "preco entrada": "preco_entrada", "preco medio": "preco_entrada",
+    "preco atual": "preco_atual", "cotacao": "preco_atual", "cotacao atual": "preco_atual",
+    "preco teto": "preco_teto", "teto": "preco_teto",
+    "peso na carteira": "peso", "peso": "peso", "participacao": "peso",
+    "rentabilidade": "rentabilidade", "retorno": "rentabilidade",
+    "dividend yield": "dividend_yield", "dy": "dividend_yield",
+    "recomendacao": "recomendacao", "vies": "recomendacao",
+    "tipo carteira": "tipo_carteira", "tipo de carteira": "tipo_carteira",
+}
+
+# Weight moves smaller than this (percentage points) are rounding noise, not changes
+WEIGHT_TOLERANCE = 0.01
+
+CHANGE_LOG_COLUMNS = ("tipo", "ticker", "anterior", "atual")
+
+_ARROW_TYPES = {"integer": "int32", "number": "float64", "string": "string"}
+
+def _schema():
+    fields = [
+        ("snapshot_date", pa.date32()),
+        ("wallet", pa.string()),
+        ("source", pa.string()),
+        ("row", pa.int32()),
+    ]
+    fields += [(name, pa.type_for_alias(_ARROW_TYPES[json_type])) for name, _, json_type in WALLET_COLUMNS]
+    # Columns with no typed field (e.g. Quantidade, Saldo), as a JSON object
+    fields.append(("extra", pa.string()))
+    return pa.schema(fields)
+
+def _header_key(name: str) -> str:
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"\((r\$|%)\)", "", text)
+    text = re.sub(r"[^a-z0-9#]+", " ", text)
+    return text.strip()
+
+def sniff_delimiter(text: str) -> str:
+    """
+    The CSVs come with "," or ";" depending on who wrote them (local parser, LLM); decides from the header.
+    """
+    header = text.split("\n", 1)[0]
+    try:
+        return csv.Sniffer().sniff(header, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ";" if header.count(";") >= header.count(",") else ","
+
+def read_wallet_csv(text: str) -> list:
+    """
+    Parses a wallet CSV into (WalletRow, extra columns) pairs, mapping the header to the typed fields.
+    """
+    reader = csv.reader(io.StringIO(text.strip()), delimiter=sniff_delimiter(text))
+    header = next(reader, None)
+    if not header:
+        return []
+    fields = [HEADER_ALIASES.get(_header_key(name)) for name in header]
+
+    rows = []
+    for values in reader:
+        item = {}
+        extra = {}
+        for name, field, value in zip(header, fields, values):
+            if field and field not in item:
+                item[field] = value if value.strip() else None
+            elif value.strip():
+                extra[name.strip()] = value.strip()
+        row = WalletRow.from_dict(item)
+        if row is not None:
+            rows.append((row, extra))
+    return rows
+
+class SnapshotStore:
+    """
+    Every normalized wallet snapshot in one Parquet dataset, partitioned by snapshot_date and wallet
+    (hive layout: snapshot_date=YYYY-MM-DD/wallet=<name>/). Loading a snapshot again replaces its partition.
+    """
+    def __init__(self, root):
+        if pa is None:
+            raise RuntimeError("pyarrow não instalado: pip install pyarrow")
+        self.root = root
+        self.schema = _schema()
+        os.makedirs(root, exist_ok=True)
+
+    def partition_path(self, wallet, snapshot_date):
+        return os.path.join(self.root, f"snapshot_date={snapshot_date.isoformat()}", f"wallet={wallet}", "part-0.parquet")
+
+    def append(self, wallet, snapshot_date, rows, source="suno") -> str:
+        """
+        Writes the (WalletRow, extra) pairs of one snapshot. Returns the Parquet file path.
+        """
+        columns = {name: [] for name in self.schema.names}
+        for idx, (row, extra) in enumerate(rows):
+            columns["snapshot_date"].append(snapshot_date)
+            columns["wallet"].append(wallet)
+            columns["source"].append(source)
+            columns["row"].append(idx)
+            for name, _, _ in WALLET_COLUMNS:
+                columns[name].append(getattr(row, name))
+            columns["extra"].append(json.dumps(extra, ensure_ascii=False) if extra else None)
+
+        path = self.partition_path(wallet, snapshot_date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see half a partition
+        tmp_path = path + ".tmp"
+        pq.write_table(pa.table(columns, schema=self.schema), tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_csv(self, csv_path, source=None):
+        """
+        Loads a <wallet>-YYYY-MM-DD.csv file. Returns the Parquet file path, or None if the name or content doesn't fit.
+        """
+        match = SNAPSHOT_FILE_RE.match(os.path.basename(csv_path))
+        if not match:
+            print(f"Nome fora do padrão <carteira>-AAAA-MM-DD.csv: {os.path.basename(csv_path)}")
+            return None
+        wallet = wallet_name(match.group("wallet"))
+        snapshot_date = date.fromisoformat(match.group("date"))
+        source = source or ("meus-dividendos" if "meus-dividendos" in wallet else "suno")
+
+        with span("carga: snapshot", file=csv_path, wallet=wallet) as record:
+            with open(csv_path, "r", encoding="utf-8") as f:
+                rows = read_wallet_csv(f.read())
+            record["rows"] = len(rows)
+            if not rows:
+                print(f"Nenhuma linha com ticker em {os.path.basename(csv_path)}.")
+                return None
+            return self.append(wallet, snapshot_date, rows, source)
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning="hive", schema=self.schema)
+
+    def query(self, columns=None, filter=None):
+        """
+        Reads the dataset as a pyarrow Table, pruning partitions by filter (a pyarrow.compute expression).
+        """
+        if not os.listdir(self.root):
+            return self.schema.empty_table().select(columns or self.schema.names)
+        return self.dataset().to_table(columns=columns, filter=filter)
+
+    def history(self, ticker, field="preco_teto", wallet=None) -> list:
+        """
+        (snapshot_date, wallet, value) of a ticker over time, oldest first.
+        """
+        condition = ds.field("ticker") == ticker
+        if wallet is not None:
+            condition &= ds.field("wallet") == wallet
+        table = self.query(["snapshot_date", "wallet", field], condition).sort_by([("snapshot_date", "ascending"), ("wallet", "ascending")])
+        return list(zip(*(table.column(name).to_pylist() for name in ("snapshot_date", "wallet", field))))
+
+    def price_ceiling_changes(self, ticker=None, since=None) -> list:
+        """
+        Each change of preço teto per (wallet, ticker) between consecutive snapshots, oldest first,
+        as dicts with snapshot_date, wallet, ticker, old and new.
+        """
+        condition = ds.field("preco_teto").is_valid()
+        if ticker is not None:
+            condition &= ds.field("ticker") == ticker
+        table = self.query(["snapshot_date", "wallet", "ticker", "preco_teto"], condition).sort_by(
+            [("wallet", "ascending"), ("ticker", "ascending"), ("snapshot_date", "ascending")]
+        )
+
+        changes = []
+        previous = {}
+        for item in table.to_pylist():
+            key = (item["wallet"], item["ticker"])
+            old = previous.get(key)
+            previous[key] = item["preco_teto"]
+            if old is not None and old != item["preco_teto"] and (since is None or item["snapshot_date"] >= since):
+                changes.append({
+                    "snapshot_date": item["snapshot_date"], "wallet": item["wallet"], "ticker": item["ticker"],
+                    "old": old, "new": item["preco_teto"],
+                })
+        changes.sort(key=lambda change: change["snapshot_date"])
+        return changes
+
+    def wallets(self, snapshot_date) -> list:
+        table = self.query(["wallet"], ds.field("snapshot_date") == snapshot_date)
+        return sorted(set(table.column("wallet").to_pylist()))
+
+    def snapshot(self, wallet, snapshot_date) -> list:
+        """
+        Rows of one snapshot as dicts, in their original order.
+        """
+        condition = (ds.field("wallet") == wallet) & (ds.field("snapshot_date") == snapshot_date)
+        return self.query(filter=condition).sort_by("row").to_pylist()
+
+    def previous_date(self, wallet, before):
+        """
+        Date of the last snapshot of wallet before the given date, or None.
+        """
+        table = self.query(["snapshot_date"], (ds.field("wallet") == wallet) & (ds.field("snapshot_date") < before))
+        dates = table.column("snapshot_date").to_pylist()
+        return max(dates) if dates else None
+
+    def diff(self, wallet, snapshot_date):
+        """
+        Returns (previous snapshot date, changes) of a wallet snapshot against the one before it.
+        The first snapshot of a wallet has no previous one and no changes.
+        """
+        previous = self.previous_date(wallet, snapshot_date)
+        if previous is None:
+            return None, []
+        return previous, diff_rows(self.snapshot(wallet, previous), self.snapshot(wallet, snapshot_date))
+
+def diff_rows(previous, current, weight_tolerance=WEIGHT_TOLERANCE) -> list:
+    """
+    Changes between two snapshots (row dicts) by ticker: entrada, saída, peso and preço teto,
+    as dicts with tipo, ticker, anterior and atual.
+    """
+    before = {row["ticker"]: row for row in previous}
+    after = {row["ticker"]: row for row in current}
+
+    changes = []
+    for ticker, row in after.items():
+        old = before.get(ticker)
+        if old is None:
+            changes.append({"tipo": "entrada", "ticker": ticker, "anterior": None, "atual": row["peso"]})
+            continue
+        if _moved(old["peso"], row["peso"], weight_tolerance):
+            changes.append({"tipo": "peso", "ticker": ticker, "anterior": old["peso"], "atual": row["peso"]})
+        if old["preco_teto"] != row["preco_teto"]:
+            changes.append({"tipo": "preço teto", "ticker": ticker, "anterior": old["preco_teto"], "atual": row["preco_teto"]})
+    for ticker, row in before.items():
+        if ticker not in after:
+            changes.append({"tipo": "saída", "ticker": ticker, "anterior": row["peso"], "atual": None})
+    return changes
+
+def _moved(old, new, tolerance):
+    if old is None or new is None:
+        return old != new
+    return abs(old - new) > tolerance
+
+def write_change_log(changes, path):
+    """
+    Writes the changes as a ";" CSV with CHANGE_LOG_COLUMNS.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\n")
+    writer.writerow(CHANGE_LOG_COLUMNS)
+    for change in changes:
+        writer.writerow(["" if change[name] is None else change[name] for name in CHANGE_LOG_COLUMNS])
+    with span("arquivo: mudanças", path=path, changes=len(changes)):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(buffer.getvalue().strip())
+
+_stores = {}
+
+def open_snapshot_store(root=SNAPSHOTS_DIR):
+    """
+    Returns a shared SnapshotStore per root folder.
+    """
+    if root not in _stores:
+        _stores[root] = SnapshotStore(root)
+    return _stores[root]
+
+def load_wallet_snapshots(csv_folder, store=None, source=None, use_manifest=False):
+    """
+    Load stage: appends the wallet CSVs of a folder to the snapshot store. Snapshots already loaded
+    (partition newer than the CSV) are skipped. With use_manifest=True, the CSVs queued by the processors
+    are loaded instead. Returns the CSVs loaded.
+    """
+    store = store or open_snapshot_store()
+    if use_manifest:
+        csv_files = open_manifest().claim(STAGE_WALLET_CSV)
+    else:
+        csv_files = sorted(os.path.join(csv_folder, f) for f in os.listdir(csv_folder) if SNAPSHOT_FILE_RE.match(f))
+
+    print(f"Encontrados {len(csv_files)} CSVs de carteira para carregar.")
+
+    written = []
+    for csv_path in csv_files:
+        try:
+            match = SNAPSHOT_FILE_RE.match(os.path.basename(csv_path))
+            if match and not use_manifest:
+                partition = store.partition_path(wallet_name(match.group("wallet")), date.fromisoformat(match.group("date")))
+                if os.path.exists(partition) and os.path.getmtime(partition) >= os.path.getmtime(csv_path):
+                    continue
+            path = store.load_csv(csv_path, source)
+            if path:
+                print(f"Carregado: {os.path.basename(csv_path)}")
+                written.append(csv_path)
+        except Exception as e:
+            print(f"Erro ao carregar {os.path.basename(csv_path)}: {e}")
+
+    if use_manifest:
+        queue = open_manifest()
+        for csv_path in csv_files:
+            if csv_path in written:
+                queue.mark_done(STAGE_WALLET_CSV, csv_path)
+            else:
+                queue.mark_failed(STAGE_WALLET_CSV, csv_path)
+    return written
+
+def diff_wallet_snapshots(output_folder, snapshot_date=None, store=None) -> dict:
+    """
+    Diff stage: compares each wallet snapshot of snapshot_date (default today) with the previous one and
+    writes mudancas-<wallet>-YYYY-MM-DD.csv for the wallets that changed. Returns wallet -> changes.
+    """
+    store = store or open_snapshot_store()
+    snapshot_date = snapshot_date or date.today()
+    os.makedirs(output_folder, exist_ok=True)
+
+    results = {}
+    for wallet in store.wallets(snapshot_date):
+        with span("diff: carteira", wallet=wallet) as record:
+            previous, changes = store.diff(wallet, snapshot_date)
+            record["changes"] = len(changes)
+        results[wallet] = changes
+        if previous is None:
+            print(f"{wallet}: primeiro snapshot, nada a comparar.")
+        elif not changes:
+            print(f"{wallet}: sem mudanças desde {previous.isoformat()}.")
+        else:
+            path = os.path.join(output_folder, f"mudancas-{wallet}-{snapshot_date.isoformat()}.csv")
+            write_change_log(changes, path)
+            print(f"{wallet}: {len(changes)} mudanças desde {previous.isoformat()} -> {path}")
+    return results
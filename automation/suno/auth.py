@@ -2,10 +2,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-import time
 from automation.config import SUNO_EMAIL, SUNO_PASSWORD
+from automation.waits import wait_for_url_change, wait_for_page_stable
+from automation.sessions import SiteSession
 
 def login_suno(driver):
+    """
+    Makes sure the driver is logged into Suno: reuses the browser session or the cookies saved by the
+    last run when still valid, and only submits the login form when they have expired.
+    Returns how the session was obtained (see SiteSession.ensure).
+    """
+    return SUNO_SESSION.ensure(driver)
+
+def _form_login_suno(driver):
     """
     Logs into Suno using the provided driver and configured credentials.
     """
@@ -36,6 +45,9 @@ def login_suno(driver):
         driver.find_element(By.ID, "login_button").click()
         
         # Wait for login to complete
-        time.sleep(5)
+        wait_for_url_change(driver, "/login", "suno: login", budget=5)
+        wait_for_page_stable(driver, "suno: pós-login", budget=5)
     except TimeoutException:
         print("Login fields not found or already logged in.")
+
+SUNO_SESSION = SiteSession("suno", "suno.com.br", "https://investidor.suno.com.br/carteiras", _form_login_suno)
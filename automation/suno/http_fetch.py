@@ -0,0 +1,56 @@
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+from automation.telemetry import span
+
+def session_from_driver(driver, pool_size=8):
+    """
+    Creates a keep-alive requests session carrying the cookies and user agent of a logged-in driver.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_html(session, url, selectors, timeout=30):
+    """
+    Fetches a page and returns (final_url, innerHTML of the first matching selector).
+    Returns (final_url, None) when the content is not in the server response (login redirect, client-side rendering...).
+    """
+    with span("http: página", url=url) as record:
+        try:
+            response = session.get(url, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"Erro HTTP em {url}: {e}")
+            record["status"] = "error"
+            return url, None
+
+        record["status_code"] = response.status_code
+        record["bytes"] = len(response.content)
+        if response.status_code != 200 or "/login" in response.url:
+            record["status"] = "fallback"
+            return response.url, None
+
+    with span("dom: http", url=url) as record:
+        soup = BeautifulSoup(response.text, "html.parser")
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element is not None and element.get_text(strip=True):
+                return response.url, element.decode_contents()
+        record["status"] = "fallback"
+    return response.url, None
+
+def fetch_many(session, urls, selectors, max_workers=8):
+    """
+    Fetches several pages concurrently. Returns url -> (final_url, html or None).
+    """
+    urls = list(urls)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda url: fetch_html(session, url, selectors), urls)
+        return dict(zip(urls, results))
@@ -0,0 +1,45 @@
+import os
+import time
+import sqlite3
+import threading
+
+class ReportIndex:
+    """
+    Persistent set of Suno report card ids already downloaded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "report_id TEXT PRIMARY KEY, url TEXT, downloaded_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def known(self, report_ids) -> set:
+        """
+        Returns which of the given ids were already downloaded, in a single query.
+        """
+        report_ids = [report_id for report_id in report_ids if report_id]
+        if not report_ids:
+            return set()
+        placeholders = ",".join("?" * len(report_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT report_id FROM reports WHERE report_id IN ({placeholders})", report_ids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add(self, report_id, url=None):
+        if not report_id:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (report_id, url, downloaded_at) VALUES (?, ?, ?)",
+                (report_id, url, time.time())
+            )
+            self._conn.commit()
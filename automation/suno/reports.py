@@ -4,40 +4,171 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, ElementClickInterceptedException, NoSuchWindowException
 import time
 import os
-from automation.utils import url_to_filename
-from automation.driver import set_download_path
+from automation.utils import url_to_filename, clean_html
+from automation.driver import set_download_path, create_driver_pool, close_driver_pool, run_in_pool
+from automation.waits import wait_for_page_stable, wait_for_selector
+from automation.suno.http_fetch import session_from_driver, fetch_many
+from automation.suno.report_index import ReportIndex
+from automation.config import REPORT_INDEX_PATH
+from automation.manifest import recording, STAGE_SUNO_REPORTS
+from automation.telemetry import span, annotate
+from automation.blobs import blob_store_for
 
-def download_suno_reports(driver, download_path):
+RELATORIOS_URL = "https://investidor.suno.com.br/relatorios"
+REPORT_LOCATOR = "div[id^='report']"
+REPORT_CONTENT_SELECTORS = ["#readerData", ".elementor.radar-fii"]
+
+_CARD_IDS_JS = "return Array.from(document.querySelectorAll(arguments[0])).map(function (card) { return card.id; });"
+
+# One round-trip for every card: [link of the card (if any), already read?]
+_CARD_LINKS_JS = """
+return Array.from(document.querySelectorAll(arguments[0])).map(function (card) {
+    var link = card.querySelector('a[href]');
+    return [link ? link.href : null, card.outerHTML.indexOf('opacity: 0.6') !== -1];
+});
+"""
+
+def download_suno_reports(driver, download_path, workers=1, headless=True, backend="selenium", http_workers=8, index_path=REPORT_INDEX_PATH,
+                          on_saved=None, use_manifest=False):
     """
     Downloads Suno reports as HTML files.
+    Report card ids already in the index at index_path are skipped, and scrolling stops at the first
+    fully known page of the feed. Pass index_path=None to disable the index.
+    With workers > 1, the links of the report cards are split across extra browsers sharing the logged-in
+    session; cards without a link are clicked open in the feed by this driver.
+    With backend="http", cards that expose a link are fetched with a pooled requests session using
+    the browser cookies; cards without a link or whose fetch fails fall back to Selenium.
+    on_saved(path) is called for each new or changed report file, e.g. to feed a pipeline stage.
+    With use_manifest=True, each of those files is also queued in the run manifest for process --manifest.
     """
+    if use_manifest:
+        on_saved = recording(STAGE_SUNO_REPORTS, on_saved)
     set_download_path(driver, download_path)
+    index = ReportIndex(index_path) if index_path else None
+    card_ids = _load_report_feed(driver, index)
+
+    known = index.known(card_ids) if index else set()
+    indices = [idx for idx, card_id in enumerate(card_ids) if card_id not in known]
+    print(f"{len(card_ids)} relatórios no feed, {len(indices)} novos.")
+
+    if backend == "http":
+        indices = _download_reports_http(driver, download_path, http_workers, indices, card_ids, index, on_saved)
+        print(f"{len(indices)} relatórios via Selenium (fallback).")
+
+    if workers <= 1 or not indices:
+        _download_reports_at(driver, indices, download_path, card_ids, index, on_saved)
+        return
+
+    # The pool gets the card links read from this driver's feed, so extra browsers never reload the feed
+    cards = driver.execute_script(_CARD_LINKS_JS, REPORT_LOCATOR)
+    linked = [(card_ids[idx], cards[idx][0]) for idx in indices if idx < len(cards) and cards[idx][0] and not cards[idx][1]]
+    clicked = [idx for idx in indices if idx >= len(cards) or not cards[idx][0]]
+    _index_read_cards(index, card_ids, cards, indices)
+    if not linked:
+        _download_reports_at(driver, clicked, download_path, card_ids, index, on_saved)
+        return
+
+    def worker(pool_driver, items):
+        # Cards without a link only open from the feed, which is still loaded in this driver
+        if pool_driver is driver:
+            _download_reports_at(driver, clicked, download_path, card_ids, index, on_saved)
+        _download_report_urls(pool_driver, items, download_path, index, on_saved)
+
+    extra_drivers = create_driver_pool(workers - 1, source_driver=driver, session_url=RELATORIOS_URL, download_path=download_path, headless=headless)
+    try:
+        run_in_pool([driver] + extra_drivers, linked, worker)
+    finally:
+        close_driver_pool(extra_drivers)
+
+def _load_report_feed(driver, index=None):
+    """
+    Opens the reports feed, scrolls it and returns the ids of the report cards loaded.
+    With an index, scrolling stops once a freshly loaded page only has known reports.
+    """
     wait = WebDriverWait(driver, 20)
     
-    driver.get("https://investidor.suno.com.br/relatorios")
-    time.sleep(15) # Wait for page load
+    with span("página: relatórios (feed)", url=RELATORIOS_URL):
+        driver.get(RELATORIOS_URL)
+        container = wait_for_selector(driver, "#main-content", "relatórios: feed", budget=15)
+        wait_for_page_stable(driver, "relatórios: feed", budget=15)
     
-    container = driver.find_element(By.ID, "main-content")
+    with span("dom: cards"):
+        card_ids = driver.execute_script(_CARD_IDS_JS, REPORT_LOCATOR)
+    page = card_ids
     
     # Scroll to load more reports
     # Original code scrolled 8 times
     for _ in range(8):
+        if index is not None and page and len(index.known(page)) == len(page):
+            print("Página de relatórios já conhecidos encontrada, parando o scroll.")
+            break
+
         h0 = driver.execute_script("return arguments[0].scrollHeight", container)
         driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", container)
         try:
             wait.until(lambda d: driver.execute_script("return arguments[0].scrollHeight", container) > h0)
         except TimeoutException:
             break
+
+        loaded = driver.execute_script(_CARD_IDS_JS, REPORT_LOCATOR)
+        page = loaded[len(card_ids):]
+        card_ids = loaded
             
-    # Collect reports
-    locator = "div[id^='report']"
+    return card_ids
+
+def _download_reports_http(driver, download_path, max_workers, indices, card_ids, index=None, on_saved=None):
+    """
+    Fetches unread report cards over HTTP. Returns the feed positions that still need Selenium.
+    """
+    cards = driver.execute_script(_CARD_LINKS_JS, REPORT_LOCATOR)
+    unread = {idx: cards[idx][0] for idx in indices if idx < len(cards) and not cards[idx][1]}
+    _index_read_cards(index, card_ids, cards, indices)
+    linked = {idx: href for idx, href in unread.items() if href}
+
+    session = session_from_driver(driver, pool_size=max_workers)
+    results = fetch_many(session, linked.values(), REPORT_CONTENT_SELECTORS, max_workers=max_workers)
+
+    remaining = []
+    for idx in unread:
+        href = linked.get(idx)
+        final_url, html = results.get(href, (None, None))
+        if html is None:
+            remaining.append(idx)
+            continue
+        filename = os.path.join(download_path, url_to_filename(final_url))
+        if _save_report_html(download_path, filename, html) and on_saved:
+            on_saved(filename)
+        if index is not None:
+            index.add(card_ids[idx], final_url)
+    return remaining
+
+def _index_read_cards(index, card_ids, cards, indices):
+    """
+    Adds the cards the feed already shows as read to the index, so later runs skip them and stop scrolling at them.
+    """
+    if index is None:
+        return
+    for idx in indices:
+        if idx < len(cards) and cards[idx][1]:
+            index.add(card_ids[idx], cards[idx][0])
+
+def _save_report_html(download_path, filename, html):
+    """
+    Saves a raw report through the blob store, hashed on its cleaned version. Returns False when the
+    file already held the same content, so it doesn't need processing again.
+    """
+    existed = os.path.exists(filename)
+    with span("arquivo: relatório", path=filename, bytes=len(html)) as record:
+        record["hash"], record["new"] = blob_store_for(download_path).save(filename, html, hash_text=clean_html(html))
+    return record["new"] or not existed
+
+def _download_reports_at(driver, indices, download_path, card_ids=None, index=None, on_saved=None):
+    """Opens the report cards at the given feed positions and saves each one"""
+    wait = WebDriverWait(driver, 20)
+    locator = REPORT_LOCATOR
     original_window = driver.current_window_handle
     
-    # Get initial count
-    elements = driver.find_elements(By.CSS_SELECTOR, locator)
-    elements_count = len(elements)
-    
-    for idx in range(elements_count):
+    for idx in indices:
         try:
             # Refresh elements list to avoid StaleElementReferenceException
             reports = driver.find_elements(By.CSS_SELECTOR, locator)
@@ -52,6 +183,8 @@ def download_suno_reports(driver, download_path):
                 outer_html = elem.get_attribute("outerHTML")
                 if "opacity: 0.6" in outer_html:
                     print(f"Skipping report {idx}: Already read (found opacity: 0.6).")
+                    if index is not None and card_ids:
+                        index.add(card_ids[idx])
                     continue
             except Exception as e:
                 print(f"Error checking report {idx}: {e}")
@@ -59,7 +192,7 @@ def download_suno_reports(driver, download_path):
 
             # Scroll to center to avoid sticky headers covering the element
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elem)
-            time.sleep(1) # Small settling time
+            wait_for_page_stable(driver, "relatórios: scroll", budget=1, quiet_period=0.2)
 
             try:
                 elem.click()
@@ -74,27 +207,16 @@ def download_suno_reports(driver, download_path):
         
         # Switch to new window
         try:
-            wait.until(lambda d: len(d.window_handles) > 1)
-            new_win = next(h for h in driver.window_handles if h != original_window)
-            driver.switch_to.window(new_win)
-            
-            time.sleep(6) # Wait for content
-            
-            prefix = ""
-            try:
-                reader = wait.until(EC.presence_of_element_located((By.ID, "readerData")))
-                html = reader.get_attribute("innerHTML")
-            except TimeoutException:
-                try:
-                    radar = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".elementor.radar-fii")))
-                    html = radar.get_attribute("innerHTML")
-                except TimeoutException:
-                    html = driver.page_source
-                    prefix = "NAO-CONSEGUI_SALVAR_"
+            with span("página: relatório", index=idx):
+                wait.until(lambda d: len(d.window_handles) > 1)
+                new_win = next(h for h in driver.window_handles if h != original_window)
+                driver.switch_to.window(new_win)
+                
+                wait_for_page_stable(driver, "relatórios: janela", budget=6)
             
-            filename = os.path.join(download_path, prefix + url_to_filename(driver.current_url))
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(html)
+            with span("dom: relatório", index=idx):
+                html, prefix = _report_content(driver, wait)
+            _save_opened_report(driver, download_path, html, prefix, card_ids[idx] if card_ids else None, index, on_saved)
                 
             driver.close()
             driver.switch_to.window(original_window)
@@ -107,4 +229,47 @@ def download_suno_reports(driver, download_path):
             except NoSuchWindowException:
                 driver.switch_to.window(original_window)
         
-        time.sleep(2)
+        wait_for_page_stable(driver, "relatórios: retorno", budget=2, quiet_period=0.2)
+
+def _download_report_urls(driver, items, download_path, index=None, on_saved=None):
+    """
+    Opens each (card id, report link) directly and saves the report.
+    """
+    wait = WebDriverWait(driver, 20)
+    for card_id, href in items:
+        try:
+            with span("página: relatório", url=href):
+                driver.get(href)
+                wait_for_page_stable(driver, "relatórios: página", budget=6)
+            with span("dom: relatório", url=href):
+                html, prefix = _report_content(driver, wait)
+            _save_opened_report(driver, download_path, html, prefix, card_id, index, on_saved)
+        except Exception as e:
+            print(f"Error handling report {href}: {e}. Skipping.")
+
+def _report_content(driver, wait):
+    """
+    Returns (html, file name prefix) of the report open in driver; the prefix flags a whole-page fallback.
+    """
+    prefix = ""
+    try:
+        html = wait.until(EC.presence_of_element_located((By.ID, "readerData"))).get_attribute("innerHTML")
+    except TimeoutException:
+        try:
+            html = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".elementor.radar-fii"))).get_attribute("innerHTML")
+        except TimeoutException:
+            html = driver.page_source
+            prefix = "NAO-CONSEGUI_SALVAR_"
+            annotate(status="fallback")
+    annotate(bytes=len(html))
+    return html, prefix
+
+def _save_opened_report(driver, download_path, html, prefix, card_id, index=None, on_saved=None):
+    report_url = driver.current_url
+    filename = os.path.join(download_path, prefix + url_to_filename(report_url))
+    changed = _save_report_html(download_path, filename, html)
+
+    if not prefix and changed and on_saved:
+        on_saved(filename)
+    if index is not None and card_id and not prefix:
+        index.add(card_id, report_url)
@@ -2,26 +2,45 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-import time
 import os
 from urllib.parse import urlparse
 from automation.utils import url_to_filename, clean_html
-from automation.driver import set_download_path
+from automation.driver import set_download_path, create_driver_pool, close_driver_pool, run_in_pool
+from automation.waits import wait_for_page_stable, wait_for_selector, wait_for_content
+from automation.suno.http_fetch import session_from_driver, fetch_many
+from automation.manifest import recording, STAGE_SUNO_WALLETS_HTML
+from automation.telemetry import span
+from automation.blobs import blob_store_for
 from datetime import date
 
-def download_suno_wallets(driver, download_path):
+CARTEIRAS_URL = "https://investidor.suno.com.br/carteiras"
+# These wallets have sub-tabs that only exist after clicking, so they always go through Selenium
+TABBED_WALLET_PATHS = ("/carteiras/internacional", "/carteiras/fundos")
+# The wallet table is rendered after the page shell, so its presence is what "loaded" means
+WALLET_TABLE_SELECTOR = "#main-content table"
+
+def download_suno_wallets(driver, download_path, workers=1, headless=True, backend="selenium", http_workers=8, on_saved=None,
+                          use_manifest=False):
     """
     Downloads Suno wallets as HTML files.
+    With workers > 1, the wallet links are split across extra browsers sharing the logged-in session.
+    With backend="http", plain wallet pages are fetched with a pooled requests session using the
+    browser cookies; pages that fail fall back to Selenium.
+    on_saved(path) is called for each wallet file saved, e.g. to feed a pipeline stage.
+    With use_manifest=True, each of those files is also queued in the run manifest for process --manifest.
     """
+    if use_manifest:
+        on_saved = recording(STAGE_SUNO_WALLETS_HTML, on_saved)
     set_download_path(driver, download_path)
     wait = WebDriverWait(driver, 20)
     today_str = date.today().strftime("%Y-%m-%d")
     
-    driver.get("https://investidor.suno.com.br/carteiras")
-    time.sleep(15)
+    with span("página: carteiras (lista)", url=CARTEIRAS_URL):
+        driver.get(CARTEIRAS_URL)
+        scroll_container = wait_for_selector(driver, "#main-content", "carteiras: lista", budget=15)
+        wait_for_page_stable(driver, "carteiras: lista", budget=15)
     
     # Scroll logic
-    scroll_container = driver.find_element(By.ID, "main-content")
     for i in range(3):
         current_height = driver.execute_script("return arguments[0].scrollHeight", scroll_container)
         driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scroll_container)
@@ -33,15 +52,35 @@ def download_suno_wallets(driver, download_path):
     # Find links
     elements = driver.find_elements(By.CSS_SELECTOR, "a.WmCKBGPeU3I8A1eENMyG")
     hrefs = [elem.get_attribute("href") for elem in elements if elem.get_attribute("href")]
-    
-    carteiras_url = "https://investidor.suno.com.br/carteiras"
+
+    if backend == "http":
+        hrefs = _download_wallets_http(driver, hrefs, download_path, today_str, http_workers, on_saved)
+        print(f"{len(hrefs)} carteiras via Selenium (fallback).")
+
+    def worker(pool_driver, links):
+        _download_wallet_links(pool_driver, links, download_path, today_str, on_saved)
+
+    if workers <= 1:
+        worker(driver, hrefs)
+        return
+
+    # The current driver is one of the workers; the others start with its cookies
+    extra_drivers = create_driver_pool(workers - 1, source_driver=driver, session_url=CARTEIRAS_URL, download_path=download_path, headless=headless)
+    try:
+        run_in_pool([driver] + extra_drivers, hrefs, worker)
+    finally:
+        close_driver_pool(extra_drivers)
+        driver.get(CARTEIRAS_URL)
+
+def _download_wallet_links(driver, hrefs, download_path, today_str, on_saved=None):
+    """Visits each wallet link with the given driver and saves its content"""
+    wait = WebDriverWait(driver, 20)
     
     for link_href in hrefs:
         parsed_url = urlparse(link_href)
-        driver.get(link_href)
-        time.sleep(4)
-        
-        file_prefix = ""
+        with span("página: carteira", url=link_href):
+            driver.get(link_href)
+            wait_for_content(driver, WALLET_TABLE_SELECTOR, "carteiras: página", budget=4)
         
         if parsed_url.path == "/carteiras/internacional":
             all_divs = driver.find_elements(By.CSS_SELECTOR, "div.OBL8xjDqKulPUiJR2xLn")
@@ -50,48 +89,72 @@ def download_suno_wallets(driver, download_path):
                 if index >= len(all_divs): break
                 div_to_click = all_divs[index]
                 driver.execute_script("arguments[0].click();", div_to_click)
-                time.sleep(3)
+                wait_for_page_stable(driver, "carteiras: aba", budget=3)
                 
                 path_realtime = urlparse(driver.current_url).path
-                _save_wallet_content(driver, download_path, path_realtime, today_str, wait)
+                _save_wallet_content(driver, download_path, path_realtime, today_str, wait, on_saved)
                 
-            driver.get(carteiras_url)
+            driver.get(CARTEIRAS_URL)
             
         elif parsed_url.path == "/carteiras/fundos":
             all_divs = driver.find_elements(By.CSS_SELECTOR, "div.aitB5h9xFRt1CAXd2E8t.YxNKF3awfZ4s67CWXRjA > div.OBL8xjDqKulPUiJR2xLn")
             
             for div_to_click in all_divs:
                 driver.execute_script("arguments[0].click();", div_to_click)
-                time.sleep(3)
+                wait_for_page_stable(driver, "carteiras: aba", budget=3)
                 path_realtime = urlparse(driver.current_url).path
-                _save_wallet_content(driver, download_path, path_realtime, today_str, wait)
+                _save_wallet_content(driver, download_path, path_realtime, today_str, wait, on_saved)
             
-            driver.get(carteiras_url)
+            driver.get(CARTEIRAS_URL)
             
         else:
             path_realtime = parsed_url.path
-            _save_wallet_content(driver, download_path, path_realtime, today_str, wait)
+            _save_wallet_content(driver, download_path, path_realtime, today_str, wait, on_saved)
             driver.back()
-            time.sleep(2)
+            wait_for_content(driver, "#main-content", "carteiras: voltar", budget=2)
 
-def _save_wallet_content(driver, download_path, path_realtime, today_str, wait):
+def _download_wallets_http(driver, hrefs, download_path, today_str, max_workers, on_saved=None):
+    """
+    Fetches plain wallet pages over HTTP. Returns the hrefs that still need Selenium.
+    """
+    session = session_from_driver(driver, pool_size=max_workers)
+    http_hrefs = [href for href in hrefs if urlparse(href).path not in TABBED_WALLET_PATHS]
+    results = fetch_many(session, http_hrefs, ["#main-content"], max_workers=max_workers)
+
+    remaining = [href for href in hrefs if href not in results]
+    for href, (final_url, html_content) in results.items():
+        if html_content is None:
+            remaining.append(href)
+            continue
+        _write_wallet_file(download_path, urlparse(final_url).path, today_str, html_content, on_saved=on_saved)
+    return remaining
+
+def _save_wallet_content(driver, download_path, path_realtime, today_str, wait, on_saved=None):
     """Helper to extract and save wallet content"""
     file_prefix = ""
-    try:
-        main_content = wait.until(EC.presence_of_element_located((By.ID, "main-content")))
-        time.sleep(3)
-        html_content = main_content.get_attribute("innerHTML")
-    except TimeoutException:
-        html_content = driver.page_source
-        file_prefix = "NAO-CONSEGUI_SALVAR_"
-    
-    cleaned_html = clean_html(html_content)
-    
+    with span("dom: carteira", path=path_realtime) as record:
+        try:
+            main_content = wait.until(EC.presence_of_element_located((By.ID, "main-content")))
+            wait_for_page_stable(driver, "carteiras: conteúdo", budget=3)
+            html_content = main_content.get_attribute("innerHTML")
+        except TimeoutException:
+            html_content = driver.page_source
+            file_prefix = "NAO-CONSEGUI_SALVAR_"
+            record["status"] = "fallback"
+        record["bytes"] = len(html_content)
+
+    _write_wallet_file(download_path, path_realtime, today_str, html_content, file_prefix, on_saved)
+
+def _write_wallet_file(download_path, path_realtime, today_str, html_content, file_prefix="", on_saved=None):
     filename = os.path.join(
         download_path,
         f"{file_prefix}carteira-{today_str}-{url_to_filename(path_realtime)}"
     )
     
     if not os.path.exists(filename):
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(cleaned_html)
+        with span("arquivo: carteira", path=filename, bytes_in=len(html_content)) as record:
+            cleaned_html = clean_html(html_content)
+            record["bytes"] = len(cleaned_html)
+            record["hash"], record["new"] = blob_store_for(download_path).save(filename, cleaned_html)
+        if not file_prefix and on_saved:
+            on_saved(filename)
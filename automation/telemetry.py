@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from contextlib import contextmanager
+from automation.config import TELEMETRY_DIR, TELEMETRY_MAX_SPANS
+
+_TOTAL_KEYS = ("input_tokens", "cached_tokens", "output_tokens", "retries")
+
+class Tracer:
+    """
+    Records timed spans (page loads, DOM extraction, LLM requests, file writes) and, when directory is set,
+    appends each one as a JSON line to a per-run file in it.
+    Only the last max_spans records stay in memory; the per-name totals of the whole run are kept as they come.
+    """
+    def __init__(self, directory=None, max_spans=TELEMETRY_MAX_SPANS):
+        self.directory = directory
+        self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.spans = deque(maxlen=max_spans)
+        self._emitted = 0
+        self._totals = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+
+    @property
+    def path(self):
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"run-{self.run_id}.jsonl")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the block. Yields the span record, so the block can add attributes
+        (tokens, bytes, status...) before it is written.
+        """
+        stack = self._stack()
+        record = {
+            "run": self.run_id,
+            "id": next(self._ids),
+            "parent": stack[-1]["id"] if stack else None,
+            "name": name,
+            "start": time.time(),
+            "thread": threading.current_thread().name,
+            **attrs,
+        }
+        stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - started
+            record.setdefault("status", "ok")
+            stack.pop()
+            self._emit(record)
+
+    def annotate(self, **attrs):
+        """
+        Adds attributes to the innermost open span of the current thread, if any.
+        """
+        stack = self._stack()
+        if stack:
+            stack[-1].update(attrs)
+
+    def mark(self):
+        """
+        Number of spans finished so far, to report only what happened after it.
+        """
+        with self._lock:
+            return self._emitted
+
+    def summary(self, since=0):
+        """
+        Aggregates the finished spans by name. From the start of the run it is exact; after a mark,
+        it covers the spans still in memory.
+        """
+        with self._lock:
+            if since == 0:
+                return {name: dict(entry) for name, entry in self._totals.items()}
+            dropped = self._emitted - len(self.spans)
+            spans = list(self.spans)[max(since - dropped, 0):]
+
+        grouped = {}
+        for record in spans:
+            _add(grouped, record)
+        return grouped
+
+    def report(self, since=0):
+        """
+        Prints the summary table, slowest stages first.
+        """
+        grouped = self.summary(since)
+        if not grouped:
+            return
+        print(f"{'Etapa':<36} {'N':>5} {'Total (s)':>10} {'Média (s)':>10} {'Máx (s)':>9} {'Erros':>6} {'Tokens in':>10} {'Em cache':>9} {'Tokens out':>11} {'Retries':>8}")
+        for name, entry in sorted(grouped.items(), key=lambda item: item[1]["total"], reverse=True):
+            print(
+                f"{name:<36} {entry['count']:>5} {entry['total']:>10.1f} {entry['total'] / entry['count']:>10.2f} "
+                f"{entry['max']:>9.2f} {entry['errors']:>6} {entry['input_tokens']:>10} {entry['cached_tokens']:>9} {entry['output_tokens']:>11} {entry['retries']:>8}"
+            )
+        if self.path:
+            print(f"Telemetria: {self.path}")
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _emit(self, record):
+        with self._lock:
+            self.spans.append(record)
+            self._emitted += 1
+            _add(self._totals, record)
+            if not self.directory:
+                return
+            try:
+                if self._file is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"Erro ao gravar telemetria: {e}")
+                self.directory = None
+
+def _add(grouped, record):
+    entry = grouped.setdefault(record["name"], {
+        "count": 0, "total": 0.0, "max": 0.0, "errors": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "retries": 0,
+    })
+    entry["count"] += 1
+    entry["total"] += record["duration"]
+    entry["max"] = max(entry["max"], record["duration"])
+    entry["errors"] += record["status"] != "ok"
+    for key in _TOTAL_KEYS:
+        entry[key] += record.get(key) or 0
+
+# Shared across scrapers and processors so one run produces one file
+TRACER = Tracer(TELEMETRY_DIR)
+
+def span(name, **attrs):
+    return TRACER.span(name, **attrs)
+
+def annotate(**attrs):
+    TRACER.annotate(**attrs)
+
+def telemetry_report(since=0):
+    TRACER.report(since)
+
+_cell_hooks = {}
+
+def enable_cell_reports():
+    """
+    In Jupyter, prints the summary table of the spans recorded by each cell when it finishes.
+    Returns False outside IPython.
+    """
+    try:
+        from IPython import get_ipython
+    except ImportError:
+        return False
+    shell = get_ipython()
+    if shell is None:
+        return False
+    if "post" in _cell_hooks:
+        return True
+
+    marks = {"start": TRACER.mark()}
+
+    def pre_run_cell(*args):
+        marks["start"] = TRACER.mark()
+
+    def post_run_cell(*args):
+        TRACER.report(since=marks["start"])
+
+    shell.events.register("pre_run_cell", pre_run_cell)
+    shell.events.register("post_run_cell", post_run_cell)
+    _cell_hooks.update(pre=pre_run_cell, post=post_run_cell)
+    return True
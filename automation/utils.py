@@ -1,8 +1,11 @@
 import re
 import os
+import hashlib
 import zipfile
 from urllib.parse import urlparse
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup, Comment
+from bs4.dammit import EntitySubstitution, UnicodeDammit
 from datetime import date, datetime
 
 def url_to_filename(url: str) -> str:
@@ -15,14 +18,248 @@ def url_to_filename(url: str) -> str:
     name = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
     return f"{name}.html"
 
+_DATE_IN_NAME_RE = re.compile(r"-?\d{4}-\d{2}-\d{2}")
+
+def wallet_name(file_name: str) -> str:
+    """
+    The wallet a dated file belongs to, the same across days and stages:
+    "carteira-2024-05-02-x_y-2024-05-02.md" -> "carteira-x_y".
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return _DATE_IN_NAME_RE.sub("", stem)
+
+# Fragments that change on every load without the content changing; masked before hashing
+VOLATILE_PATTERNS = [
+    # "Atualizado em 18/10/2024 às 10:32"; only an actual date, since "atualizado em" also introduces
+    # content ("preço-teto atualizado em R$ 35,00")
+    re.compile(r"(?i)atualizad[oa] em \d{1,2}/\d{1,2}/\d{2,4}(,? (às|as) \d{1,2}[:h]\d{2}(:\d{2})?h?)?"),
+    # "há 5 minutos"
+    re.compile(r"(?i)\bhá \d+ (segundo|minuto|hora|dia)s?\b"),
+    # Clock times, only with context: "às 10:32", "10:32h", "10h32". A bare "1:10" is a ratio (splits, grupamentos)
+    re.compile(r"(?i)\b(às|as) \d{1,2}[:h]\d{2}(:\d{2})?h?\b"),
+    re.compile(r"(?i)\b\d{1,2}:\d{2}(:\d{2})? ?h\b"),
+    re.compile(r"\b\d{1,2}h\d{2}\b"),
+    # Cache-busting query parameters
+    re.compile(r"(?i)([?&](v|ver|t|ts|cb|_)=)[\w.-]+"),
+    # Nonces, session and build hashes
+    re.compile(r"(?i)\b[0-9a-f]{32,}\b"),
+]
+
+def normalize_volatile(text: str) -> str:
+    for pattern in VOLATILE_PATTERNS:
+        text = pattern.sub("\x00", text)
+    return text
+
+def content_hash(text: str) -> str:
+    """
+    sha256 of the text with the volatile fragments masked, so reloading an unchanged page gives the same hash.
+    """
+    return hashlib.sha256(normalize_volatile(text).encode("utf-8")).hexdigest()
+
+# Tags dropped with their whole subtree, and attribute name prefixes stripped from the rest
+REMOVED_TAGS = frozenset(["script", "style", "svg", "nav", "header", "footer", "aside", "form", "noscript", "iframe", "button", "input", "img"])
+REMOVED_ATTRIBUTE_PREFIXES = ("style", "data-", "onclick", "class", "id")
+
+# The html.parser tree builder rules that clean_html has to reproduce to match str(soup)
+_VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+])
+_PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+_LIST_ATTRIBUTES = {
+    "*": frozenset(["class", "accesskey", "dropzone"]),
+    "a": frozenset(["rel", "rev"]),
+    "link": frozenset(["rel", "rev"]),
+    "td": frozenset(["headers"]),
+    "th": frozenset(["headers"]),
+    "form": frozenset(["accept-charset"]),
+    "object": frozenset(["archive"]),
+    "area": frozenset(["rel"]),
+    "icon": frozenset(["sizes"]),
+    "iframe": frozenset(["sandbox"]),
+    "output": frozenset(["for"]),
+}
+_ASCII_SPACES = frozenset("\x20\x0a\x09\x0c\x0d")
+_NUMERIC_REFERENCE_RE = {10: re.compile("^([0-9]+)(.*)"), 16: re.compile("^([0-9a-f]+)(.*)")}
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _quote_attribute(value: str) -> str:
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+class _StreamingCleaner(HTMLParser):
+    """
+    Tokenizes with the same stdlib parser BeautifulSoup uses and writes the cleaned markup as it goes.
+    Keeps only the stack of open tag names; text is buffered between tag boundaries so that
+    whitespace-only runs collapse exactly like BeautifulSoup.endData does.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.data = []
+        self.stack = []
+        self.open_counts = {}
+        # Depth of the outermost removed tag we are inside of, or None
+        self.skip_depth = None
+        self.preserve_depth = 0
+        self.already_closed_empty = []
+
+    def finish(self) -> str:
+        self.close()
+        self.flush()
+        while self.stack:
+            self.pop()
+        return "".join(self.out)
+
+    def flush(self, keep=True):
+        """
+        Ends the current text run. Returns the (collapsed) text so declarations can wrap it.
+        """
+        if not self.data:
+            return None
+        text = "".join(self.data)
+        self.data = []
+        if not self.preserve_depth and all(c in _ASCII_SPACES for c in text):
+            text = "\n" if "\n" in text else " "
+        if keep and self.skip_depth is None:
+            self.out.append(_escape(text))
+        return text
+
+    def push(self, tag):
+        self.stack.append(tag)
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+        if tag in _PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+        if self.skip_depth is None and tag in REMOVED_TAGS:
+            self.skip_depth = len(self.stack)
+
+    def pop(self):
+        tag = self.stack.pop()
+        self.open_counts[tag] -= 1
+        if tag in _PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth -= 1
+        if self.skip_depth is None:
+            if tag not in _VOID_TAGS:
+                self.out.append(f"</{tag}>")
+        elif len(self.stack) < self.skip_depth:
+            self.skip_depth = None
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self.flush()
+        self.push(tag)
+        if self.skip_depth is None:
+            values = {}
+            for key, value in attrs:
+                values[key] = "" if value is None else value
+            list_attributes = _LIST_ATTRIBUTES.get(tag.lower(), frozenset())
+            parts = [f"<{tag}"]
+            for key, value in sorted(values.items()):
+                if key.startswith(REMOVED_ATTRIBUTE_PREFIXES):
+                    continue
+                if key in _LIST_ATTRIBUTES["*"] or key in list_attributes:
+                    value = " ".join(re.findall(r"\S+", value))
+                parts.append(f" {key}={_quote_attribute(value)}")
+            parts.append("/>" if tag in _VOID_TAGS else ">")
+            self.out.append("".join(parts))
+        if tag in _VOID_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.already_closed_empty.append(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed_empty:
+            self.already_closed_empty.remove(tag)
+            return
+        self.flush()
+        if not self.open_counts.get(tag):
+            return
+        while self.stack:
+            if self.stack[-1] == tag:
+                self.pop()
+                break
+            self.pop()
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.data.append(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        base = 10
+        if name.startswith(("x", "X")):
+            name = name[1:]
+            base = 16
+        dereferenced = ""
+        extra_data = ""
+        try:
+            code = int(name, base)
+        except ValueError:
+            code = None
+            match = _NUMERIC_REFERENCE_RE[base].search(name)
+            if match is not None:
+                code = int(match.group(1), base)
+                extra_data = match.group(2)
+        if code is None:
+            extra_data = name
+        else:
+            dereferenced = UnicodeDammit.numeric_character_reference(code)[0]
+        self.data.append(dereferenced)
+        self.data.append(extra_data)
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def _special(self, prefix, data, suffix):
+        self.flush()
+        self.data.append(data)
+        text = self.flush(keep=False)
+        if self.skip_depth is None:
+            self.out.append(prefix + text + suffix)
+
+    def handle_decl(self, decl):
+        self._special("<!DOCTYPE ", decl[len("DOCTYPE "):], ">\n")
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._special("<![CDATA[", data[len("CDATA["):], "]]>")
+        else:
+            self._special("<?", data, "?>")
+
+    def handle_pi(self, data):
+        self._special("<?", data, ">")
+
 def clean_html(html_content: str) -> str:
     """
     Cleans HTML content by removing scripts, styles, and other unnecessary tags.
+    Single pass over the html.parser token stream, without building a tree; the output is
+    byte-identical to clean_html_soup.
+    """
+    # No span of its own: it runs once per saved page, inside the span of the caller that saves it
+    cleaner = _StreamingCleaner()
+    cleaner.feed(html_content)
+    return cleaner.finish()
+
+def clean_html_soup(html_content: str) -> str:
+    """
+    Reference implementation of clean_html: builds the full BeautifulSoup tree and prunes it.
+    clean_html must produce exactly the same output.
     """
     soup = BeautifulSoup(html_content, "html.parser")
 
     # Remove irrelevant tags
-    for tag in soup(["script", "style", "svg", "nav", "header", "footer", "aside", "form", "noscript", "iframe", "button", "input", "img"]):
+    for tag in soup(list(REMOVED_TAGS)):
         tag.decompose()
 
     # Remove comments
@@ -34,7 +271,7 @@ def clean_html(html_content: str) -> str:
         # Keep only basic structure, removing style, onclick, etc.
         # Original code removed 'style', 'data-', 'onclick', 'class', 'id'
         for attr in list(tag.attrs.keys()): # List to avoid runtime error during iteration
-             if any(attr.startswith(x) for x in ["style", "data-", "onclick", "class", "id"]):
+             if attr.startswith(REMOVED_ATTRIBUTE_PREFIXES):
                 del tag.attrs[attr]
 
     return str(soup)
@@ -0,0 +1,131 @@
+import time
+import threading
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# Installs a MutationObserver once per document and reports how long the page has been quiet
+_READINESS_JS = """
+if (!window.__readyObserver) {
+    window.__lastMutation = performance.now();
+    window.__readyObserver = new MutationObserver(function () { window.__lastMutation = performance.now(); });
+    window.__readyObserver.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+return [document.readyState, performance.now() - window.__lastMutation, performance.getEntriesByType('resource').length];
+"""
+
+class ReadinessTimer:
+    """
+    Records how long each readiness wait took versus the fixed sleep it replaced.
+    """
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, label, budget, elapsed):
+        with self._lock:
+            self.records.append({"label": label, "budget": budget, "elapsed": elapsed})
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def seconds_saved(self):
+        return sum(max(r["budget"] - r["elapsed"], 0) for r in self.records)
+
+    def report(self):
+        """
+        Prints waits grouped by label and the total seconds saved against the old fixed sleeps.
+        """
+        grouped = {}
+        for r in self.records:
+            entry = grouped.setdefault(r["label"], {"count": 0, "budget": 0.0, "elapsed": 0.0})
+            entry["count"] += 1
+            entry["budget"] += r["budget"]
+            entry["elapsed"] += r["elapsed"]
+
+        print(f"{'Espera':<40} {'N':>4} {'Fixo (s)':>10} {'Real (s)':>10} {'Economia (s)':>13}")
+        for label, entry in grouped.items():
+            saved = entry["budget"] - entry["elapsed"]
+            print(f"{label:<40} {entry['count']:>4} {entry['budget']:>10.1f} {entry['elapsed']:>10.1f} {saved:>13.1f}")
+        print(f"Total economizado: {self.seconds_saved():.1f}s")
+
+# Shared across scrapers so one report covers the whole run
+TIMINGS = ReadinessTimer()
+
+def wait_for_page_stable(driver, label, budget, quiet_period=0.5, poll_interval=0.1):
+    """
+    Waits until the document is loaded, the DOM had no mutations and no new network resources
+    for quiet_period seconds. Never waits longer than budget (the fixed sleep it replaces).
+    """
+    start = time.monotonic()
+    deadline = start + budget
+    last_resources = None
+    resources_since = start
+
+    while time.monotonic() < deadline:
+        try:
+            ready_state, quiet_ms, resources = driver.execute_script(_READINESS_JS)
+        except WebDriverException:
+            # Page navigating away mid-poll; try again on the next document
+            time.sleep(poll_interval)
+            continue
+
+        now = time.monotonic()
+        if resources != last_resources:
+            last_resources = resources
+            resources_since = now
+
+        if ready_state == "complete" and quiet_ms >= quiet_period * 1000 and now - resources_since >= quiet_period:
+            break
+        time.sleep(poll_interval)
+
+    elapsed = time.monotonic() - start
+    TIMINGS.record(label, budget, elapsed)
+    return elapsed
+
+def wait_for_selector(driver, css_selector, label, budget, clickable=False):
+    """
+    Waits for a CSS selector to be present (or clickable) and returns the element.
+    Raises TimeoutException after budget seconds, like WebDriverWait.
+    """
+    start = time.monotonic()
+    condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+    try:
+        return WebDriverWait(driver, budget).until(condition((By.CSS_SELECTOR, css_selector)))
+    finally:
+        TIMINGS.record(label, budget, time.monotonic() - start)
+
+def wait_for_content(driver, css_selector, label, budget, quiet_period=0.5):
+    """
+    Waits for css_selector to be present, then for the page to be stable, both within one budget
+    (the fixed sleep they replace). A missing selector is not an error: the caller reads what the page has.
+    Returns the element, or None after budget seconds without it.
+    """
+    start = time.monotonic()
+    try:
+        element = WebDriverWait(driver, budget).until(EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
+    except TimeoutException:
+        TIMINGS.record(label, budget, time.monotonic() - start)
+        return None
+
+    # The selector phase is recorded with no budget of its own, so the two records add up to one budget
+    found_after = time.monotonic() - start
+    TIMINGS.record(label, found_after, found_after)
+    wait_for_page_stable(driver, label, max(budget - found_after, 0), quiet_period)
+    return element
+
+def wait_for_url_change(driver, old_url_fragment, label, budget):
+    """
+    Waits until the current URL no longer contains old_url_fragment (e.g. after submitting a login form).
+    """
+    start = time.monotonic()
+    try:
+        WebDriverWait(driver, budget).until(lambda d: old_url_fragment not in d.current_url)
+    except TimeoutException:
+        pass
+    TIMINGS.record(label, budget, time.monotonic() - start)
+
+def timing_report():
+    TIMINGS.report()
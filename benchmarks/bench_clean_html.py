@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of clean_html (streaming) against clean_html_soup (BeautifulSoup tree).
+
+    python -m benchmarks.bench_clean_html [--rows 2000] [--repeat 5]
+
+Also checks that both produce byte-identical output on every fixture.
+"""
+import argparse
+import time
+import warnings
+from automation.telemetry import TRACER
+from automation.utils import clean_html, clean_html_soup
+from benchmarks.fixtures import wallet_page
+
+EDGE_CASES = [
+    "<!DOCTYPE html>\n<p a=\"x&amp;y\" b='q\"q' d>t &amp; &lt; &nbsp; &#65; &bogus &#x41;z</p><br a=\"1\"><hr/>",
+    "<a rel=\" a  b \" accesskey>x</a><td headers=\"a\tb\"></td><![CDATA[ x ]]><?php x ?><!ELEMENT x>",
+    "<div>  <!-- c -->  \n</div><p>a</br>b</p></p><br></br></br><p> </x> </p>",
+    "<pre>  <b> </b>\n </pre> <textarea>  </textarea><form><p>x<pre> </form> y",
+    "<div id=a class=b data-x=1 style=c onclick=d href=e>t</div><P CLASS=x ID=y>u</P><p>unclosed <b>bold",
+]
+
+def _time(function, html, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+    # Spans stay in memory only; benchmark runs should not leave telemetry files behind
+    TRACER.directory = None
+
+    fixtures = {f"edge-{i}": html for i, html in enumerate(EDGE_CASES)}
+    fixtures["carteira-100"] = wallet_page(100)
+    fixtures[f"carteira-{args.rows}"] = wallet_page(args.rows)
+
+    for name, html in fixtures.items():
+        if clean_html(html) != clean_html_soup(html):
+            raise SystemExit(f"Saída diferente da referência em {name}")
+    print(f"Saída idêntica em {len(fixtures)} fixtures.")
+
+    print(f"{'Fixture':<20} {'KB':>8} {'Soup (ms)':>10} {'Stream (ms)':>12} {'Ganho':>7}")
+    for name, html in fixtures.items():
+        if name.startswith("edge-"):
+            continue
+        soup_time = _time(clean_html_soup, html, args.repeat)
+        stream_time = _time(clean_html, html, args.repeat)
+        print(f"{name:<20} {len(html) / 1024:>8.0f} {soup_time * 1000:>10.1f} {stream_time * 1000:>12.1f} {soup_time / stream_time:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Synthetic but realistically shaped pages for the benchmarks: Suno wallet pages, a radar-fii
+report and the Meus Dividendos spreadsheet. Deterministic for a given size, so runs compare.
+"""
+import os
+import random
+from automation.utils import url_to_filename, clean_html
+
+SECTORS = ["Bancos", "Energia Elétrica", "Saneamento", "Seguros", "Logística", "Shoppings", "Lajes Corporativas", "Papel"]
+RECOMMENDATIONS = ["COMPRA", "AGUARDAR", "VENDA", "MANTER"]
+
+WALLET_URLS = [
+    "https://investidor.suno.com.br/carteiras/dividendos",
+    "https://investidor.suno.com.br/carteiras/valor",
+    "https://investidor.suno.com.br/carteiras/small-caps",
+    "https://investidor.suno.com.br/carteiras/fundos",
+    "https://investidor.suno.com.br/carteiras/internacional",
+]
+
+def _br(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _ticker(rng, suffix="3"):
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4)) + suffix
+
+def _app_shell(title: str, main: str) -> str:
+    """
+    Wraps content in the chrome the scraped pages carry: scripts, styles, nav, footer, svg icons.
+    """
+    scripts = "".join(f'<script src="/_next/static/chunks/{i}.js" async></script>' for i in range(12))
+    state = "{" + ",".join(f'"k{i}":"{"x" * 40}"' for i in range(200)) + "}"
+    icons = "".join(f'<svg class="icon" viewBox="0 0 24 24"><path d="M{i} 0L24 {i}Z"/></svg>' for i in range(30))
+    return (
+        f'<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8"><title>{title}</title>'
+        f'<style>.row{{color:#333}} .badge{{padding:2px}}</style>{scripts}</head>'
+        f'<body class="theme-light"><header class="top-bar"><nav class="menu">{icons}'
+        '<a href="/carteiras" class="menu-item">Carteiras</a><a href="/relatorios" class="menu-item">Relatórios</a></nav></header>'
+        f'<main id="app" data-page="{title}">{main}</main>'
+        '<aside class="chat"><form><input name="msg"><button onclick="send()">Enviar</button></form></aside>'
+        f'<footer class="footer"><p>Suno Research. Todos os direitos reservados.</p></footer>'
+        f'<script id="__NEXT_DATA__" type="application/json">{state}</script></body></html>'
+    )
+
+def wallet_page(rows: int, seed: int = 0) -> str:
+    """
+    Suno wallet page: one large, attribute-heavy table plus the app shell.
+    """
+    rng = random.Random(seed)
+    body = []
+    for i in range(1, rows + 1):
+        entry = rng.uniform(5, 80)
+        current = entry * rng.uniform(0.6, 1.8)
+        body.append(
+            f'<tr class="table-row" data-index="{i}" style="height:32px">'
+            f'<td class="pos">{i}º</td>'
+            f'<td class="asset"><img src="/logos/{i}.png" alt=""><span class="ticker" id="t{i}">{_ticker(rng)}</span></td>'
+            f'<td>Empresa {i} S.A.</td><td>{rng.choice(SECTORS)}</td>'
+            f'<td class="num" data-value="{entry:.2f}">R$ {_br(entry)}</td>'
+            f'<td class="num">R$ {_br(current)}</td><td class="num">R$ {_br(entry * 1.2)}</td>'
+            f'<td class="num">{_br(100 / rows)}%</td><td class="num">{_br((current / entry - 1) * 100)}%</td>'
+            f'<td class="num">{_br(rng.uniform(2, 14))}%</td>'
+            f'<td><span class="badge badge-{i % 4}">{rng.choice(RECOMMENDATIONS)}</span>'
+            f'<button onclick="details({i})" class="btn">Ver</button></td></tr>\n'
+        )
+    table = (
+        '<table class="wallet-table"><thead><tr><th>#</th><th>Ativo</th><th>Empresa</th><th>Setor</th>'
+        '<th>Preço de Entrada</th><th>Preço Atual</th><th>Preço-Teto</th><th>Peso</th>'
+        f'<th>Rentabilidade</th><th>DY</th><th>Recomendação</th></tr></thead><tbody>{"".join(body)}</tbody></table>'
+    )
+    return _app_shell("Carteira", f'<h1 class="title">Carteira Recomendada</h1><!-- wallet -->{table}')
+
+def radar_fii_report(funds: int, seed: int = 0) -> str:
+    """
+    radar-fii report: long prose with a very large table of real estate funds and their indices.
+    """
+    rng = random.Random(seed)
+    paragraphs = "".join(
+        f'<p class="paragraph">Parágrafo {i}: o mercado de fundos imobiliários segue descontado, com P/VP médio de '
+        f'{_br(rng.uniform(0.7, 1.1))} e yield médio de {_br(rng.uniform(8, 13))}% ao ano.</p>'
+        for i in range(40)
+    )
+    rows = "".join(
+        f'<tr><td>{_ticker(rng, "11")}</td><td>{rng.choice(SECTORS)}</td><td>R$ {_br(rng.uniform(50, 150))}</td>'
+        f'<td>{_br(rng.uniform(0.6, 1.3))}</td><td>{_br(rng.uniform(6, 16))}%</td><td>R$ {_br(rng.uniform(0.5, 1.5))}</td></tr>\n'
+        for _ in range(funds)
+    )
+    table = (
+        '<table class="radar"><thead><tr><th>Fundo</th><th>Segmento</th><th>Cotação</th><th>P/VP</th>'
+        f"<th>DY 12m</th><th>Último rendimento</th></tr></thead><tbody>{rows}</tbody></table>"
+    )
+    article = f'<article id="report-1"><h1>Radar FII</h1><h2>Panorama</h2>{paragraphs}<h2>Tabela</h2>{table}</article>'
+    return _app_shell("radar-fii", article)
+
+def report_page(seed: int = 0) -> str:
+    """
+    Regular Suno report: a few sections of prose, sometimes with a buy/sell call.
+    """
+    rng = random.Random(seed)
+    ticker = _ticker(rng)
+    sections = "".join(
+        f"<h2>Seção {i}</h2>" + "".join(
+            f"<p>Os resultados do trimestre vieram em linha, com receita de R$ {_br(rng.uniform(100, 900))} milhões "
+            f"e margem EBITDA de {_br(rng.uniform(10, 40))}%.</p>" for _ in range(6)
+        )
+        for i in range(5)
+    )
+    if seed % 2 == 0:
+        sections += f"<h2>Recomendação</h2><p>Recomendamos COMPRA de {ticker} com preço-teto de R$ {_br(rng.uniform(10, 60))}.</p>"
+    return _app_shell("Relatório", f'<article id="report-{seed}"><h1>Atualização {ticker}</h1>{sections}</article>')
+
+def meus_dividendos_table(rows: int, seed: int = 0) -> str:
+    """
+    Meus Dividendos portfolio spreadsheet page.
+    """
+    rng = random.Random(seed)
+    body = "".join(
+        f'<tr class="mat-row"><td class="mat-cell">{_ticker(rng)}</td><td class="mat-cell">{rng.randint(1, 2000)}</td>'
+        f'<td class="mat-cell">R$ {_br(rng.uniform(5, 120))}</td><td class="mat-cell">R$ {_br(rng.uniform(5, 120))}</td>'
+        f'<td class="mat-cell">R$ {_br(rng.uniform(100, 100000))}</td><td class="mat-cell">{_br(rng.uniform(0, 10))}%</td></tr>\n'
+        for _ in range(rows)
+    )
+    table = (
+        '<table class="mat-table"><thead><tr><th>Ativo</th><th>Quantidade</th><th>Preço Médio</th>'
+        f"<th>Preço Atual</th><th>Saldo</th><th>% Carteira</th></tr></thead><tbody>{body}</tbody></table>"
+    )
+    return _app_shell("Meus Dividendos", f"<h2>Minha Carteira</h2>{table}")
+
+def raw_pages(scale: int = 1) -> list:
+    """
+    Returns (kind, file name, raw html) for the corpus; kind is "wallets", "reports" or "spreadsheets".
+    """
+    pages = []
+    for copy in range(scale):
+        for i, url in enumerate(WALLET_URLS):
+            pages.append(("wallets", f"carteira-{copy}-{url_to_filename(url)}", wallet_page(40 + 30 * i, seed=copy * 10 + i)))
+        pages.append(("reports", f"relatorio-{copy}-radar-fii.html", radar_fii_report(400, seed=copy)))
+        for i in range(4):
+            pages.append(("reports", f"relatorio-{copy}-{i}.html", report_page(seed=copy * 10 + i)))
+        pages.append(("spreadsheets", f"meus-dividendos-{copy}.html", meus_dividendos_table(150, seed=copy)))
+    return pages
+
+def build_corpus(folder: str, scale: int = 1) -> dict:
+    """
+    Writes the corpus to folder cleaned, the way the scrapers save it, in one sub-folder per kind.
+    Returns {"wallets": [...], "reports": [...], "spreadsheets": [...]} with the file paths.
+    """
+    corpus = {"wallets": [], "reports": [], "spreadsheets": []}
+    for kind in corpus:
+        os.makedirs(os.path.join(folder, kind), exist_ok=True)
+
+    for kind, name, html in raw_pages(scale):
+        path = os.path.join(folder, kind, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(clean_html(html))
+        corpus[kind].append(path)
+    return corpus
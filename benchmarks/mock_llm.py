@@ -0,0 +1,84 @@
+import json
+import time
+import threading
+from automation.analysis.compaction import estimate_tokens
+
+class MockLLMClient:
+    """
+    Stands in for AnalysisClient/ClaudeClient in the benchmarks: sleeps for a configurable latency
+    and returns answers shaped like the real ones, so only our own code is measured.
+    """
+    def __init__(self, latency=0.0, tokens_per_second=None):
+        self.latency = latency
+        # Optional generation speed, to make latency grow with the answer size
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+
+    def analyze_report(self, prompt, model=None, temperature=0.7, **kwargs):
+        result = "## Resumo\n\n" + "- Ponto relevante para o longo prazo.\n" * 10
+        # Only the report itself counts; the instructions of every report prompt mention COMPRA
+        content = prompt[len(getattr(prompt, "prefix", "")):]
+        prefix = "com-recomendacao" if "COMPRA" in content else "sem-recomendacao"
+        self._respond(prompt, result)
+        return {"fileNamePrefix": prefix, "result": result}
+
+    def convert_spreadsheet(self, prompt, model=None, temperature=0, **kwargs):
+        header = "Posição;Ticker;Empresa;Setor;Preço Teto (R$);Peso na Carteira (%);Recomendação;Tipo Carteira"
+        rows = [f"{i};ABCD{i % 10};Empresa {i} S.A.;Bancos;12,34;2,50;COMPRA;Dividendos" for i in range(1, 41)]
+        result = "```csv\n" + "\n".join([header] + rows) + "\n```"
+        self._respond(prompt, result)
+        return result
+
+    def stream_spreadsheet(self, prompt, on_text, model=None, temperature=0, on_restart=None, **kwargs):
+        header = "Posição;Ticker;Empresa;Setor;Preço de Entrada (R$);Preço Atual (R$);Preço Teto (R$);Peso na Carteira (%);Rentabilidade (%);Dividend Yield (%);Recomendação;Tipo Carteira"
+        rows = [f"{i};ABCD{i % 10};Empresa {i} S.A.;Bancos;10.5;11.2;12.34;2.5;6.67;7.1;COMPRA;Dividendos" for i in range(1, 41)]
+        result = "\n".join([header] + rows)
+        # Chunks of ~4 tokens, paced like a real stream when tokens_per_second is set
+        chunks = [result[i:i + 16] for i in range(0, len(result), 16)]
+        if self.latency:
+            time.sleep(self.latency)
+        for chunk in chunks:
+            if self.tokens_per_second:
+                time.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            on_text(chunk)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += estimate_tokens(prompt)
+        return result
+
+    def generate_structured(self, prompt, schema, model=None, temperature=0, **kwargs):
+        if schema["name"] == "report_verdict":
+            return self.analyze_report(prompt)
+        if schema["name"] == "report_part":
+            return {"result": self.analyze_report(prompt)["result"]}
+        rows = [
+            {
+                "posicao": i, "ticker": f"ABCD{i % 10}", "empresa": f"Empresa {i} S.A.", "setor": "Bancos",
+                "preco_entrada": 10.5, "preco_atual": 11.2, "preco_teto": 12.34, "peso": 2.5, "rentabilidade": 6.67,
+                "dividend_yield": 7.1, "recomendacao": "COMPRA", "tipo_carteira": "Dividendos",
+            }
+            for i in range(1, 41)
+        ]
+        self._respond(prompt, json.dumps(rows))
+        return {"rows": rows}
+
+    def analyze_report_batch(self, prompts, model=None, temperature=0.7, **kwargs):
+        return {item_id: self.analyze_report(prompt) for item_id, prompt in prompts.items()}
+
+    def convert_spreadsheet_batch(self, prompts, model=None, temperature=0, **kwargs):
+        return {item_id: self.convert_spreadsheet(prompt) for item_id, prompt in prompts.items()}
+
+    def generate_structured_batch(self, prompts, schema, model=None, temperature=0, **kwargs):
+        return {item_id: self.generate_structured(prompt, schema) for item_id, prompt in prompts.items()}
+
+    def _respond(self, prompt, result):
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += estimate_tokens(result) / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += estimate_tokens(prompt)
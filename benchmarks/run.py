@@ -0,0 +1,230 @@
+"""
+Benchmarks for the parsing and processing hot paths, on the synthetic fixture corpus.
+
+    python -m benchmarks.run [--scale 2] [--latency 0.05] [--workers 4] [--json out.json] [--baseline old.json]
+
+For each benchmark prints throughput, peak memory (tracemalloc) and tokens per file. With --baseline,
+exits with status 1 when a benchmark got slower than the tolerance.
+"""
+import io
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import warnings
+import tracemalloc
+from contextlib import redirect_stdout
+from unittest import mock
+from automation import manifest
+from automation.telemetry import TRACER
+from automation.utils import clean_html, url_to_filename, zip_files_from_folder
+from automation.archive import archive_folder
+from automation.analysis import processors
+from automation.analysis.compaction import compact_html, estimate_tokens
+from automation.analysis.tables import wallet_html_to_markdown, spreadsheet_html_to_csv
+from benchmarks.fixtures import raw_pages, build_corpus, WALLET_URLS
+from benchmarks.mock_llm import MockLLMClient
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _measure(function):
+    """
+    Runs function twice: once for wall time, once under tracemalloc for the peak memory.
+    function returns (files, bytes, tokens).
+    """
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        files, size, tokens = function()
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "files": files,
+        "mb": size / 1024 / 1024,
+        "seconds": elapsed,
+        "files_per_second": files / elapsed if elapsed else 0.0,
+        "mb_per_second": size / 1024 / 1024 / elapsed if elapsed else 0.0,
+        "peak_mb": peak / 1024 / 1024,
+        "tokens_per_file": tokens / files if files else 0,
+    }
+
+def build_benchmarks(workdir, corpus, pages, args):
+    """
+    Returns {name: function} for every benchmark. Each function returns (files, bytes, tokens).
+    """
+    reports = {path: _read(path) for path in corpus["reports"]}
+    wallets = {path: _read(path) for path in corpus["wallets"]}
+    spreadsheets = {path: _read(path) for path in corpus["spreadsheets"]}
+    urls = [f"{url}?page={i}&ordem=desc" for i in range(2000) for url in WALLET_URLS]
+    answers = MockLLMClient()
+
+    def fresh(name):
+        folder = os.path.join(workdir, name)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        return folder
+
+    def bench_clean_html():
+        tokens = sum(estimate_tokens(clean_html(html)) for _, _, html in pages)
+        return len(pages), sum(len(html) for _, _, html in pages), tokens
+
+    def bench_url_to_filename():
+        for url in urls:
+            url_to_filename(url)
+        return len(urls), sum(len(url) for url in urls), 0
+
+    def bench_zip():
+        files = [path for paths in corpus.values() for path in paths]
+        zip_files_from_folder(os.path.join(workdir, "corpus"), os.path.join(fresh("zip"), "corpus.zip"))
+        return len(files), sum(os.path.getsize(path) for path in files), 0
+
+    def bench_archive():
+        files = [path for paths in corpus.values() for path in paths]
+        archive_folder(os.path.join(workdir, "corpus"), fresh("archive"))
+        return len(files), sum(os.path.getsize(path) for path in files), 0
+
+    def bench_report_prompts():
+        tokens = sum(estimate_tokens(processors._build_report_prompt(html)) for html in reports.values())
+        return len(reports), sum(len(html) for html in reports.values()), tokens
+
+    def bench_report_prompts_compact():
+        tokens = sum(
+            estimate_tokens(processors._build_report_prompt(compact_html(html)[0], content_format="Markdown"))
+            for html in reports.values()
+        )
+        return len(reports), sum(len(html) for html in reports.values()), tokens
+
+    def bench_wallet_prompts():
+        tokens = 0
+        for path, html in wallets.items():
+            md_prompt = processors._build_wallet_md_prompt(html)
+            csv_prompt = processors._build_wallet_csv_prompt(os.path.basename(path), html)
+            tokens += estimate_tokens(md_prompt) + estimate_tokens(csv_prompt)
+        return len(wallets), sum(len(html) for html in wallets.values()), tokens
+
+    def bench_local_parsers():
+        tokens = sum(estimate_tokens(wallet_html_to_markdown(html) or "") for html in wallets.values())
+        tokens += sum(estimate_tokens(spreadsheet_html_to_csv(html) or "") for html in spreadsheets.values())
+        files = len(wallets) + len(spreadsheets)
+        return files, sum(len(html) for html in list(wallets.values()) + list(spreadsheets.values())), tokens
+
+    def bench_postprocess():
+        output_folder = fresh("postprocess")
+        csv_answer = answers.convert_spreadsheet("")
+        report_answer = answers.analyze_report("COMPRA")
+        for path in reports:
+            processors._save_report_result(report_answer, os.path.splitext(os.path.basename(path))[0], output_folder)
+        for _ in wallets:
+            processors._strip_csv_fences(csv_answer)
+        files = len(reports) + len(wallets)
+        size = len(report_answer["result"]) * len(reports) + len(csv_answer) * len(wallets)
+        return files, size, estimate_tokens(report_answer["result"]) * len(reports) + estimate_tokens(csv_answer) * len(wallets)
+
+    def bench_process_reports():
+        client = MockLLMClient(latency=args.latency)
+        processors.process_reports(
+            os.path.dirname(corpus["reports"][0]), fresh("reports-md"), client=client, max_workers=args.workers
+        )
+        return len(reports), sum(len(html) for html in reports.values()), client.prompt_tokens
+
+    def bench_process_wallets():
+        client = MockLLMClient(latency=args.latency)
+        md_folder = fresh("wallets-md")
+        with mock.patch.object(processors, "get_client", return_value=client):
+            processors.process_suno_wallets_step1_html_to_md(os.path.dirname(corpus["wallets"][0]), md_folder, use_local_parser=False)
+            processors.process_suno_wallets_step2_md_to_csv(md_folder, fresh("wallets-csv"))
+        return len(wallets), sum(len(html) for html in wallets.values()), client.prompt_tokens
+
+    def bench_process_wallets_fused():
+        client = MockLLMClient(latency=args.latency)
+        with mock.patch.object(processors, "get_client", return_value=client):
+            processors.process_suno_wallets_html_to_csv(os.path.dirname(corpus["wallets"][0]), fresh("wallets-csv-fused"))
+        return len(wallets), sum(len(html) for html in wallets.values()), client.prompt_tokens
+
+    return {
+        "clean_html": bench_clean_html,
+        "url_to_filename": bench_url_to_filename,
+        "zip_files_from_folder": bench_zip,
+        "archive_folder (zips mensais)": bench_archive,
+        "prompt: relatórios (HTML)": bench_report_prompts,
+        "prompt: relatórios (compacto)": bench_report_prompts_compact,
+        "prompt: carteiras": bench_wallet_prompts,
+        "parser local de tabelas": bench_local_parsers,
+        "pós-processamento LLM": bench_postprocess,
+        "process_reports (mock LLM)": bench_process_reports,
+        "carteiras etapas 1+2 (mock LLM)": bench_process_wallets,
+        "carteiras fundido (mock LLM)": bench_process_wallets_fused,
+    }
+
+def print_results(results):
+    print(f"{'Benchmark':<34} {'Arq':>5} {'MB':>7} {'Tempo (s)':>10} {'Arq/s':>9} {'MB/s':>8} {'Pico (MB)':>10} {'Tokens/arq':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<34} {r['files']:>5} {r['mb']:>7.2f} {r['seconds']:>10.3f} {r['files_per_second']:>9.1f} "
+            f"{r['mb_per_second']:>8.2f} {r['peak_mb']:>10.1f} {r['tokens_per_file']:>11.0f}"
+        )
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the benchmarks whose time grew more than tolerance (fraction) against the baseline run.
+    """
+    regressions = []
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old and old["seconds"] and r["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append((name, old["seconds"], r["seconds"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="copies of the fixture corpus")
+    parser.add_argument("--latency", type=float, default=0.0, help="mocked LLM latency per call, in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="max_workers for process_reports")
+    parser.add_argument("--only", action="append", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--baseline", help="results file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+    # Spans stay in memory only; benchmark runs should not leave telemetry files behind
+    TRACER.directory = None
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    # Jobs and output hashes recorded by the processors go to a throwaway manifest, not the real one
+    manifest.MANIFEST_PATH = os.path.join(workdir, "manifest.sqlite")
+    try:
+        pages = raw_pages(args.scale)
+        corpus = build_corpus(os.path.join(workdir, "corpus"), args.scale)
+        benchmarks = build_benchmarks(workdir, corpus, pages, args)
+
+        results = {}
+        for name, function in benchmarks.items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            results[name] = _measure(function)
+        print_results(results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f"Regressão: {name} {old:.3f}s -> {new:.3f}s")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+
+# Before automation.config is imported: spans stay in memory and nothing is written next to the repo
+os.environ["TELEMETRY_DIR"] = ""
+
+import pytest
+from automation import manifest
+
+@pytest.fixture(autouse=True)
+def isolated_manifest(tmp_path, monkeypatch):
+    """
+    Every test gets its own run manifest, so nothing reads or writes the real manifest.sqlite.
+    """
+    monkeypatch.setattr(manifest, "MANIFEST_PATH", str(tmp_path / "manifest.sqlite"))
+    return manifest.open_manifest()
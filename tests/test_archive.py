@@ -0,0 +1,125 @@
+import os
+import zipfile
+import pytest
+from automation import __main__ as cli
+from automation.archive import Archive, archive_folder
+
+def write(folder, name, text, mtime=None):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+@pytest.fixture
+def downloads(tmp_path):
+    folder = tmp_path / "downloads"
+    write(folder, "html-relatorios/relatorio-2024-05-02.html", "<p>maio</p>")
+    write(folder, "html-relatorios/relatorio-2024-06-10.html", "<p>junho</p>")
+    write(folder, "carteiras-csv/Carteira Valor-2024-06-11.csv", "Ticker;Peso\nABCD3;5,0")
+    return folder
+
+def test_round_trip_groups_members_by_month(downloads, tmp_path):
+    destination = tmp_path / "arquivo"
+    added = archive_folder(str(downloads), str(destination))
+
+    assert sorted(added) == ["carteiras-csv/Carteira Valor-2024-06-11.csv", "html-relatorios/relatorio-2024-05-02.html",
+                             "html-relatorios/relatorio-2024-06-10.html"]
+    assert sorted(os.listdir(destination)) == ["2024-05.zip", "2024-06.zip"]
+    archive = Archive(str(destination))
+    assert archive.read_text("html-relatorios/relatorio-2024-06-10.html") == "<p>junho</p>"
+    assert archive.read_text("carteiras-csv/Carteira Valor-2024-06-11.csv") == "Ticker;Peso\nABCD3;5,0"
+    archive.close()
+
+def test_archives_are_plain_zips(downloads, tmp_path):
+    destination = tmp_path / "arquivo"
+    archive_folder(str(downloads), str(destination))
+    with zipfile.ZipFile(destination / "2024-06.zip") as archive:
+        assert archive.testzip() is None
+        assert archive.read("html-relatorios/relatorio-2024-06-10.html") == b"<p>junho</p>"
+        assert archive.getinfo("html-relatorios/relatorio-2024-06-10.html").compress_type == zipfile.ZIP_DEFLATED
+
+def test_second_run_appends_only_new_files(downloads, tmp_path):
+    destination = tmp_path / "arquivo"
+    archive_folder(str(downloads), str(destination))
+    with zipfile.ZipFile(destination / "2024-05.zip") as archive:
+        first = archive.getinfo("html-relatorios/relatorio-2024-05-02.html")
+        first_offset, first_size = first.header_offset, first.compress_size
+
+    write(downloads, "html-relatorios/relatorio-2024-05-20.html", "<p>maio, de novo</p>")
+    # An archived name is never rewritten, even if the file changed since
+    write(downloads, "html-relatorios/relatorio-2024-05-02.html", "<p>alterado</p>")
+    assert archive_folder(str(downloads), str(destination)) == ["html-relatorios/relatorio-2024-05-20.html"]
+
+    with zipfile.ZipFile(destination / "2024-05.zip") as archive:
+        assert archive.testzip() is None
+        assert [info.filename for info in archive.infolist()] == ["html-relatorios/relatorio-2024-05-02.html",
+                                                                 "html-relatorios/relatorio-2024-05-20.html"]
+        first = archive.getinfo("html-relatorios/relatorio-2024-05-02.html")
+        assert (first.header_offset, first.compress_size) == (first_offset, first_size)
+        assert archive.read("html-relatorios/relatorio-2024-05-02.html") == b"<p>maio</p>"
+    assert archive_folder(str(downloads), str(destination)) == []
+
+def test_lookup_by_name_and_month(downloads, tmp_path):
+    destination = tmp_path / "arquivo"
+    archive_folder(str(downloads), str(destination))
+    archive = Archive(str(destination))
+
+    assert "html-relatorios/relatorio-2024-05-02.html" in archive
+    assert "html-relatorios/relatorio-2024-07-01.html" not in archive
+    assert archive.months() == ["2024-05", "2024-06"]
+    assert archive.names("2024-05") == ["html-relatorios/relatorio-2024-05-02.html"]
+    assert archive.names("2023-01") == []
+    with pytest.raises(KeyError):
+        archive.read("html-relatorios/relatorio-2024-07-01.html")
+    archive.close()
+
+def test_reads_see_members_added_after_a_read(tmp_path):
+    archive = Archive(str(tmp_path / "arquivo"))
+    archive.add_files([("a-2024-05-01.txt", str(write(tmp_path, "a.txt", "a")))])
+    assert archive.read_text("a-2024-05-01.txt") == "a"
+    archive.add_files([("b-2024-05-02.txt", str(write(tmp_path, "b.txt", "b")))])
+    assert archive.read_text("b-2024-05-02.txt") == "b"
+    archive.close()
+
+def test_undated_files_go_to_their_mtime_month(tmp_path):
+    source = tmp_path / "downloads"
+    # 2024-03-15 12:00 UTC
+    write(source, "relatorios-index.sqlite", "índice", mtime=1710504000)
+    archive_folder(str(source), str(tmp_path / "arquivo"))
+    assert os.listdir(tmp_path / "arquivo") == ["2024-03.zip"]
+
+def test_archive_folder_skips_its_destination_and_hidden_folders(downloads):
+    write(downloads, ".blobs/ab/abcdef", "blob")
+    destination = downloads / "arquivo"
+    archive_folder(str(downloads), str(destination))
+    # Run again: the zips written inside the downloads root are not archived themselves
+    assert archive_folder(str(downloads), str(destination)) == []
+    assert not any(name.startswith((".blobs", "arquivo")) for name in Archive(str(destination)).names())
+
+@pytest.mark.parametrize("codec,compression", [("lzma", zipfile.ZIP_LZMA), ("store", zipfile.ZIP_STORED)])
+def test_codecs_mix_in_one_zip(downloads, tmp_path, codec, compression):
+    destination = tmp_path / "arquivo"
+    archive_folder(str(downloads), str(destination))
+    write(downloads, "html-relatorios/relatorio-2024-06-30.html", "<p>fim de junho</p>")
+    archive_folder(str(downloads), str(destination), codec=codec)
+    with zipfile.ZipFile(destination / "2024-06.zip") as archive:
+        assert archive.getinfo("html-relatorios/relatorio-2024-06-30.html").compress_type == compression
+        assert archive.getinfo("html-relatorios/relatorio-2024-06-10.html").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.testzip() is None
+
+def test_unknown_codec_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Archive(str(tmp_path / "arquivo"), codec="zstd")
+
+def test_cli_archives_each_downloads_root(tmp_path, monkeypatch):
+    public, private = tmp_path / "publico", tmp_path / "privado"
+    write(public, "html-relatorios/relatorio-2024-05-02.html", "<p>público</p>")
+    write(private, "meus-dividendos/carteira-meus-dividendos-2024-05-02.htm", "<p>privado</p>")
+    monkeypatch.setattr(cli, "DOWNLOADS_PUBLIC", str(public))
+    monkeypatch.setattr(cli, "DOWNLOADS_PRIVATE", str(private))
+
+    assert cli.main(["archive", "--dest", str(tmp_path / "arquivo")]) == 0
+    assert Archive(str(tmp_path / "arquivo" / "publico")).names() == ["html-relatorios/relatorio-2024-05-02.html"]
+    assert Archive(str(tmp_path / "arquivo" / "privado")).names() == ["meus-dividendos/carteira-meus-dividendos-2024-05-02.htm"]
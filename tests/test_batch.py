@@ -0,0 +1,303 @@
+import json
+import os
+import re
+import threading
+import pytest
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from automation.analysis import processors, openai_client, claude_client
+from automation.analysis.cache import CachedClient, ResponseCache
+from automation.analysis.openai_client import AnalysisClient
+from automation.analysis.claude_client import ClaudeClient
+from automation.analysis.schemas import WALLET_ROWS_SCHEMA
+from benchmarks.fixtures import build_corpus
+
+class BatchStub:
+    """
+    Local stand-in for the OpenAI Batch and Anthropic Message Batches APIs. Every request of a batch is
+    answered by answer(prompt text), which returns a dict (JSON/tool answer), a string, or None for an
+    errored request. Results come back in reverse order, like the real APIs that don't keep the order.
+    """
+    def __init__(self):
+        self.answer = lambda prompt: {"fileNamePrefix": "sem-recomendacao", "result": prompt[-20:]}
+        # custom_id -> prompt of every request submitted, per batch
+        self.submitted = []
+        # Batch retrievals answered "in progress" before the batch ends
+        self.polls_until_done = 1
+        self.openai_status = "completed"
+        self._batches = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, args=(0.01,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._route(self, "GET", b"")
+
+            def do_POST(self):
+                stub._route(self, "POST", self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+        return Handler
+
+    def _route(self, handler, method, body):
+        path = handler.path.split("?")[0]
+        routes = [
+            ("POST", r"/v1/files", self._openai_upload),
+            ("POST", r"/v1/batches", self._openai_create),
+            ("GET", r"/v1/batches/(?P<batch_id>[\w-]+)", self._openai_retrieve),
+            ("GET", r"/v1/files/(?P<batch_id>[\w-]+)-output/content", self._openai_output),
+            ("POST", r"/v1/messages/batches", self._claude_create),
+            ("GET", r"/v1/messages/batches/(?P<batch_id>[\w-]+)", self._claude_retrieve),
+            ("GET", r"/v1/messages/batches/(?P<batch_id>[\w-]+)/results", self._claude_results),
+        ]
+        for route_method, pattern, action in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                status, payload = action(body, **match.groupdict())
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                handler.send_response(status)
+                handler.send_header("Content-Type", "application/json")
+                handler.send_header("Content-Length", str(len(data)))
+                handler.end_headers()
+                handler.wfile.write(data)
+                return
+        handler.send_response(404)
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+
+    def _new_batch(self, requests):
+        batch_id = f"batch{len(self._batches)}"
+        self._batches[batch_id] = {"requests": requests, "polls": 0}
+        self.submitted.append({custom_id: _prompt_text(params) for custom_id, params in requests})
+        return batch_id
+
+    def _done(self, batch_id):
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        return batch["polls"] > self.polls_until_done
+
+    def _results_ready(self, batch_id):
+        return self._batches[batch_id]["polls"] > self.polls_until_done
+
+    # OpenAI: the JSONL goes up as a file, then a batch is created from it
+    def _openai_upload(self, body):
+        lines = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.startswith('{"custom_id"')]
+        self._uploaded = [(line["custom_id"], line["body"]) for line in lines]
+        return 200, {"id": "file-input", "object": "file", "purpose": "batch", "filename": "batch.jsonl", "bytes": len(body), "created_at": 0}
+
+    def _openai_create(self, body):
+        batch_id = self._new_batch(self._uploaded)
+        return 200, self._openai_batch(batch_id, "validating")
+
+    def _openai_retrieve(self, body, batch_id):
+        return 200, self._openai_batch(batch_id, self.openai_status if self._done(batch_id) else "in_progress")
+
+    def _openai_batch(self, batch_id, status):
+        output = f"{batch_id}-output" if status in ("completed", "expired") else None
+        return {"id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions", "completion_window": "24h", "created_at": 0,
+                "input_file_id": "file-input", "status": status, "output_file_id": output}
+
+    def _openai_output(self, body, batch_id):
+        if not self._results_ready(batch_id):
+            return 404, {"error": {"message": "batch em andamento"}}
+        lines = []
+        for custom_id, request in reversed(self._batches[batch_id]["requests"]):
+            answer = self.answer(_prompt_text(request))
+            if answer is None:
+                response = {"status_code": 500, "body": {"error": {"message": "falha"}}}
+            else:
+                content = json.dumps(answer) if isinstance(answer, dict) else answer
+                response = {"status_code": 200, "body": {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 80}},
+                }}
+            lines.append(json.dumps({"custom_id": custom_id, "response": response}))
+        return 200, "\n".join(lines).encode("utf-8")
+
+    # Anthropic: the requests go inline and the results are read from results_url
+    def _claude_create(self, body):
+        requests = [(request["custom_id"], request["params"]) for request in json.loads(body)["requests"]]
+        return 200, self._claude_batch(self._new_batch(requests), "in_progress")
+
+    def _claude_retrieve(self, body, batch_id):
+        return 200, self._claude_batch(batch_id, "ended" if self._done(batch_id) else "in_progress")
+
+    def _claude_batch(self, batch_id, status):
+        results_url = f"{self.url}/v1/messages/batches/{batch_id}/results" if status == "ended" else None
+        return {"id": batch_id, "type": "message_batch", "processing_status": status, "results_url": results_url,
+                "created_at": "2026-10-18T00:00:00Z", "expires_at": "2026-10-19T00:00:00Z",
+                "request_counts": {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}}
+
+    def _claude_results(self, body, batch_id):
+        if not self._results_ready(batch_id):
+            return 404, {"type": "error", "error": {"type": "not_found_error", "message": "batch em andamento"}}
+        lines = []
+        for custom_id, params in reversed(self._batches[batch_id]["requests"]):
+            answer = self.answer(_prompt_text(params))
+            if answer is None:
+                result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "falha"}}}
+            else:
+                if isinstance(answer, dict) and "tool_choice" in params:
+                    content = [{"type": "tool_use", "id": "toolu_1", "name": params["tool_choice"]["name"], "input": answer}]
+                else:
+                    content = [{"type": "text", "text": json.dumps(answer) if isinstance(answer, dict) else answer}]
+                result = {"type": "succeeded", "message": {
+                    "id": "msg_1", "type": "message", "role": "assistant", "model": params["model"], "content": content,
+                    "stop_reason": "end_turn", "usage": {"input_tokens": 20, "output_tokens": 10, "cache_read_input_tokens": 80},
+                }}
+            lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+        return 200, "\n".join(lines).encode("utf-8")
+
+def _prompt_text(request):
+    content = request["messages"][-1]["content"]
+    if isinstance(content, str):
+        return content
+    return "".join(block["text"] for block in content)
+
+@pytest.fixture
+def stub():
+    stub = BatchStub()
+    yield stub
+    stub.close()
+
+@pytest.fixture
+def openai(stub, monkeypatch):
+    monkeypatch.setattr(openai_client, "OPENAI_API_KEY", "teste")
+    return AnalysisClient(base_url=f"{stub.url}/v1")
+
+@pytest.fixture
+def claude(stub, monkeypatch):
+    monkeypatch.setattr(claude_client, "ANTHROPIC_API_KEY", "teste")
+    return ClaudeClient(base_url=stub.url)
+
+@pytest.fixture(params=["openai", "claude"])
+def client(request):
+    return request.getfixturevalue(request.param)
+
+def test_results_map_back_to_their_keys(stub, client):
+    # Keys are output paths, which don't fit in a custom_id; results also come back out of order
+    prompts = {f"/saida/Carteira {i} - Dividendos.csv": f"prompt {i}" for i in range(5)}
+    stub.answer = lambda prompt: f"csv de {prompt}"
+    results = client.convert_spreadsheet_batch(prompts, poll_interval=0)
+    assert results == {key: f"csv de {prompt}" for key, prompt in prompts.items()}
+    assert all(re.fullmatch(r"[a-zA-Z0-9_-]{1,64}", custom_id) for custom_id in stub.submitted[0])
+
+def test_batch_is_polled_until_it_ends(stub, client):
+    stub.polls_until_done = 3
+    stub.answer = lambda prompt: prompt
+    assert client.convert_spreadsheet_batch({"a": "um"}, poll_interval=0) == {"a": "um"}
+    # Results are only served once the stub reports the batch as ended
+    assert stub._batches["batch0"]["polls"] > 3
+
+def test_errored_requests_are_left_out(stub, client):
+    stub.answer = lambda prompt: None if "falha" in prompt else prompt.upper()
+    results = client.convert_spreadsheet_batch({"a": "ok", "b": "falha", "c": "outro"}, poll_interval=0)
+    assert results == {"a": "OK", "c": "OUTRO"}
+
+def test_analyze_report_batch_parses_verdicts(stub, client):
+    stub.answer = lambda prompt: {"fileNamePrefix": "com-recomendacao" if "COMPRA" in prompt else "sem-recomendacao", "result": "## Resumo"}
+    results = client.analyze_report_batch({"r1": "recomendação de COMPRA", "r2": "sem novidades"}, poll_interval=0)
+    assert results["r1"] == {"fileNamePrefix": "com-recomendacao", "result": "## Resumo"}
+    assert results["r2"]["fileNamePrefix"] == "sem-recomendacao"
+
+def test_structured_batch_returns_rows(stub, client):
+    stub.answer = lambda prompt: {"rows": [{"ticker": "ABCD3"}]}
+    results = client.generate_structured_batch({"x": "carteira"}, WALLET_ROWS_SCHEMA, poll_interval=0)
+    assert results == {"x": {"rows": [{"ticker": "ABCD3"}]}}
+
+def test_empty_batch_is_not_submitted(stub, client):
+    assert client.convert_spreadsheet_batch({}, poll_interval=0) == {}
+    assert stub.submitted == []
+
+def test_openai_batch_without_output_file_raises(stub, openai):
+    stub.openai_status = "failed"
+    with pytest.raises(RuntimeError):
+        openai.convert_spreadsheet_batch({"a": "um"}, poll_interval=0)
+
+def test_openai_expired_batch_keeps_partial_results(stub, openai):
+    stub.openai_status = "expired"
+    stub.answer = lambda prompt: None if prompt == "b" else prompt
+    assert openai.convert_spreadsheet_batch({"a": "a", "b": "b"}, poll_interval=0) == {"a": "a"}
+
+def test_claude_tool_answers_are_read_from_the_tool_call(stub, claude):
+    stub.answer = lambda prompt: {"fileNamePrefix": "sem-recomendacao", "result": "ok"}
+    params = claude._report_params("relatório", "modelo", 0.7, 100)
+    assert "tool_choice" in params
+    assert claude.analyze_report_batch({"r": "relatório"}, poll_interval=0) == {"r": {"fileNamePrefix": "sem-recomendacao", "result": "ok"}}
+
+def test_cached_client_only_batches_the_misses(stub, client, tmp_path):
+    cached = CachedClient(client, ResponseCache(str(tmp_path / "cache.sqlite")))
+    stub.answer = lambda prompt: f"csv de {prompt}"
+    cached.convert_spreadsheet_batch({"a": "um", "b": "dois"}, poll_interval=0)
+    results = cached.convert_spreadsheet_batch({"a": "um", "b": "dois", "c": "três"}, poll_interval=0)
+    assert results == {"a": "csv de um", "b": "csv de dois", "c": "csv de três"}
+    assert [sorted(batch.values()) for batch in stub.submitted] == [["dois", "um"], ["três"]]
+
+def test_cached_client_does_not_pin_errored_requests(stub, client, tmp_path):
+    cached = CachedClient(client, ResponseCache(str(tmp_path / "cache.sqlite")))
+    stub.answer = lambda prompt: None
+    assert cached.analyze_report_batch({"a": "um"}, poll_interval=0) == {}
+    stub.answer = lambda prompt: {"fileNamePrefix": "sem-recomendacao", "result": "ok"}
+    assert cached.analyze_report_batch({"a": "um"}, poll_interval=0)["a"]["result"] == "ok"
+    assert len(stub.submitted) == 2
+
+@pytest.fixture
+def corpus(tmp_path):
+    return build_corpus(str(tmp_path / "corpus"))
+
+def test_report_batch_writes_one_summary_per_result(stub, openai, corpus, tmp_path, capsys):
+    reports = os.path.dirname(corpus["reports"][0])
+    names = sorted(os.path.splitext(os.path.basename(path))[0] for path in corpus["reports"])
+    failing = os.path.splitext(os.path.basename(corpus["reports"][0]))[0]
+    stub.answer = lambda prompt: None if failing in prompt else {"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"}
+    # The report file name is not in the prompt, so fail on a marker from its content instead
+    with open(corpus["reports"][0], "a", encoding="utf-8") as f:
+        f.write(f"<p>{failing}</p>")
+
+    output = str(tmp_path / "resumos")
+    processors.process_reports(reports, output, client=openai, batch=True, poll_interval=0, route=False)
+
+    written = sorted(name.split("-", 2)[2][:-3] for name in os.listdir(output))
+    assert written == [name for name in names if name != failing]
+    assert f"Sem resposta no lote para {failing}" in capsys.readouterr().out
+
+def test_wallet_step1_batch_writes_the_llm_fallbacks(stub, openai, corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(processors, "get_client", lambda provider="openai": openai)
+    wallets = os.path.dirname(corpus["wallets"][0])
+    stub.answer = lambda prompt: "Ticker;Peso\nABCD3;5,0"
+    output = str(tmp_path / "md")
+    processors.process_suno_wallets_step1_html_to_md(wallets, output, use_local_parser=False, batch=True, poll_interval=0)
+
+    assert len(os.listdir(output)) == len(corpus["wallets"]) == len(stub.submitted[0])
+    for name in os.listdir(output):
+        with open(os.path.join(output, name), encoding="utf-8") as f:
+            assert f.read() == "Ticker;Peso\nABCD3;5,0"
+
+def test_wallet_step2_structured_batch_writes_csv(stub, claude, tmp_path, monkeypatch):
+    monkeypatch.setattr(processors, "get_client", lambda provider="openai": claude)
+    md_folder = tmp_path / "md"
+    md_folder.mkdir()
+    today = date.today().strftime("%Y-%m-%d")
+    for wallet in ("Dividendos", "Valor", "Vazia"):
+        (md_folder / f"Carteira {wallet}-{today}.md").write_text(f"carteira {wallet}", encoding="utf-8")
+    rows = [{"posicao": 1, "ticker": "ABCD3", "empresa": "Empresa", "setor": "Bancos", "preco_entrada": 10.5, "preco_atual": 11.0,
+             "preco_teto": 12.0, "peso": 5.0, "rentabilidade": 4.76, "dividend_yield": 7.0, "recomendacao": "COMPRA",
+             "tipo_carteira": "Dividendos"}]
+    stub.answer = lambda prompt: None if "Valor" in prompt else {"rows": [] if "Vazia" in prompt else rows}
+
+    output = tmp_path / "csv"
+    processors.process_suno_wallets_step2_md_to_csv(str(md_folder), str(output), provider="claude", batch=True, poll_interval=0)
+
+    # Errored and empty answers write nothing
+    assert sorted(os.listdir(output)) == [f"Carteira Dividendos-{today}.csv"]
+    assert "ABCD3" in (output / f"Carteira Dividendos-{today}.csv").read_text(encoding="utf-8")
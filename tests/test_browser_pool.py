@@ -0,0 +1,84 @@
+import os
+import threading
+import pytest
+from unittest import mock
+
+pytest.importorskip("selenium")
+
+from automation.driver import run_in_pool
+from automation.suno import reports
+
+def test_run_in_pool_splits_round_robin_and_skips_idle_drivers():
+    shards = {}
+    lock = threading.Lock()
+
+    def worker(driver, items):
+        with lock:
+            shards[driver] = items
+
+    run_in_pool(["a", "b", "c", "d"], range(5), worker)
+    assert shards == {"a": [0, 4], "b": [1], "c": [2], "d": [3]}
+
+    shards.clear()
+    run_in_pool(["a", "b", "c"], [7], worker)
+    assert shards == {"a": [7]}
+
+@pytest.fixture
+def feed():
+    """
+    A feed of five cards: c1 has no link, c2 was already read. Records what each driver was asked to open.
+    """
+    primary = mock.Mock(name="primary")
+    primary.execute_script.return_value = [["u0", False], [None, False], ["u2", True], ["u3", False], ["u4", False]]
+    extra = mock.Mock(name="extra")
+    opened = []
+    with mock.patch.object(reports, "set_download_path"), \
+         mock.patch.object(reports, "_load_report_feed", return_value=["c0", "c1", "c2", "c3", "c4"]) as load_feed, \
+         mock.patch.object(reports, "create_driver_pool", return_value=[extra]), \
+         mock.patch.object(reports, "close_driver_pool") as close_pool, \
+         mock.patch.object(reports, "_download_reports_at", side_effect=lambda d, indices, *a: opened.append((d, "clique", indices))), \
+         mock.patch.object(reports, "_download_report_urls", side_effect=lambda d, items, *a: opened.append((d, "link", items))):
+        yield primary, extra, opened, load_feed, close_pool
+
+def test_pool_gets_the_links_collected_by_the_primary_driver(feed, tmp_path):
+    primary, extra, opened, load_feed, close_pool = feed
+    reports.download_suno_reports(primary, str(tmp_path), workers=2, index_path=None)
+
+    # Only the primary driver loads the feed; the extra browser just opens links
+    load_feed.assert_called_once()
+    assert (primary, "clique", [1]) in opened
+    links = [item for driver, kind, items in opened if kind == "link" for item in items]
+    assert sorted(links) == [("c0", "u0"), ("c3", "u3"), ("c4", "u4")]
+    assert any(driver is extra for driver, _, _ in opened)
+    close_pool.assert_called_once_with([extra])
+
+def test_single_worker_clicks_through_the_feed(feed, tmp_path):
+    primary, extra, opened, _, _ = feed
+    reports.download_suno_reports(primary, str(tmp_path), workers=1, index_path=None)
+    assert opened == [(primary, "clique", [0, 1, 2, 3, 4])]
+
+def test_download_report_urls_saves_each_report(tmp_path, isolated_manifest):
+    class Element:
+        def get_attribute(self, name):
+            return "<p>Resumo do relatório</p>"
+
+    class Driver:
+        current_url = None
+
+        def get(self, url):
+            self.current_url = url
+
+        def find_element(self, by, value):
+            if value == "readerData":
+                return Element()
+            raise Exception(value)
+
+    download_path = tmp_path / "html"
+    download_path.mkdir()
+    saved = []
+    with mock.patch.object(reports, "wait_for_page_stable"):
+        reports._download_report_urls(Driver(), [("c0", "https://investidor.suno.com.br/relatorios/abc")], str(download_path),
+                                      on_saved=saved.append)
+    assert [os.path.basename(path) for path in saved] == ["investidor_suno_com_br_relatorios_abc.html"]
+    # Without use_manifest the scraper records nothing, so plain runs leave no pending jobs behind
+    assert isolated_manifest.counts(reports.STAGE_SUNO_REPORTS) == {}
@@ -0,0 +1,127 @@
+import time
+import pytest
+from automation.analysis.cache import ResponseCache, CachedClient, cache_key, complete_csv
+
+class CountingClient:
+    """
+    Stands in for the provider clients: answers from the prompt and counts the calls.
+    """
+    def __init__(self):
+        self.calls = []
+        self.stream_answer = "a;b\n1;2"
+
+    def analyze_report(self, prompt, **kwargs):
+        self.calls.append(("analyze_report", prompt, kwargs))
+        return {"fileNamePrefix": "sem-recomendacao", "result": prompt.upper()}
+
+    def convert_spreadsheet(self, prompt, **kwargs):
+        self.calls.append(("convert_spreadsheet", prompt, kwargs))
+        return "a;b\n" + "1;2\n" * kwargs.get("max_tokens", 1)
+
+    def generate_structured(self, prompt, schema, **kwargs):
+        self.calls.append(("generate_structured", prompt, kwargs))
+        return {"schema": schema["name"]}
+
+    def stream_spreadsheet(self, prompt, on_text, **kwargs):
+        self.calls.append(("stream_spreadsheet", prompt, kwargs))
+        on_text(self.stream_answer)
+        return self.stream_answer
+
+    def analyze_report_batch(self, prompts, **kwargs):
+        self.calls.append(("analyze_report_batch", sorted(prompts), kwargs))
+        return {item_id: self.analyze_report(prompt) for item_id, prompt in prompts.items()}
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.sqlite"))
+
+@pytest.fixture
+def client():
+    return CountingClient()
+
+def test_cache_key_ignores_whitespace_but_not_model():
+    assert cache_key("m", "a  b\n c", "gpt", 0) == cache_key("m", "a b c", "gpt", 0)
+    assert cache_key("m", "a b c", "gpt", 0) != cache_key("m", "a b c", "claude", 0)
+    assert cache_key("m", "a b c", "gpt", 0, max_tokens=10) != cache_key("m", "a b c", "gpt", 0, max_tokens=20)
+
+def test_response_cache_round_trip_and_stats(cache):
+    assert cache.get("k") is None
+    cache.set("k", {"result": "ok"})
+    assert cache.get("k") == {"result": "ok"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_response_cache_evicts_old_and_least_recent(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    cache.get("a")
+    cache.evict()
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" and cache.get("c") == "c"
+
+    cache.max_age_days = 0
+    assert cache.get("a") is None
+
+def test_cached_client_answers_repeats_from_cache(cache, client):
+    cached = CachedClient(client, cache)
+    first = cached.analyze_report("relatório", model="gpt-4.1")
+    assert cached.analyze_report("relatório ", model="gpt-4.1") == first
+    assert len(client.calls) == 1
+
+    cached.analyze_report("relatório", model="gpt-4.1-mini")
+    assert len(client.calls) == 2
+
+def test_cached_client_keys_on_max_tokens_and_schema(cache, client):
+    cached = CachedClient(client, cache)
+    short = cached.convert_spreadsheet("planilha", max_tokens=1)
+    assert cached.convert_spreadsheet("planilha", max_tokens=3) != short
+    assert cached.convert_spreadsheet("planilha", max_tokens=1) == short
+
+    assert cached.generate_structured("x", {"name": "a"}) == {"schema": "a"}
+    assert cached.generate_structured("x", {"name": "b"}) == {"schema": "b"}
+    assert len(client.calls) == 4
+
+def test_cached_client_does_not_pin_failed_answers(cache, client):
+    client.analyze_report = lambda prompt, **kwargs: client.calls.append(prompt) or "texto sem JSON"
+    cached = CachedClient(client, cache)
+    cached.analyze_report("relatório")
+    cached.analyze_report("relatório")
+    assert len(client.calls) == 2
+
+def test_cached_client_batch_only_submits_misses(cache, client):
+    cached = CachedClient(client, cache)
+    cached.analyze_report("um")
+    results = cached.analyze_report_batch({"1": "um", "2": "dois"})
+    assert results["1"]["result"] == "UM" and results["2"]["result"] == "DOIS"
+    batch_calls = [call for call in client.calls if call[0] == "analyze_report_batch"]
+    assert batch_calls[0][1] == ["2"]
+
+def test_prompt_version_invalidates(cache, client):
+    CachedClient(client, cache, version="1").analyze_report("relatório")
+    CachedClient(client, cache, version="2").analyze_report("relatório")
+    assert len(client.calls) == 2
+
+@pytest.mark.parametrize("text,complete", [
+    ("a;b\n1;2", True),
+    ("```csv\na;b\n1;2\n\n3;4\n```", True),
+    ('a;b\n"x;y";2', True),
+    ("", False),
+    ("a;b", False),
+    ("a;b\n1;2\n3", False),
+    ("a;b\n1;2;3", False),
+    ("texto\nsem csv", False),
+])
+def test_complete_csv(text, complete):
+    assert complete_csv(text) == complete
+
+@pytest.mark.parametrize("answer,calls", [("a;b\n1;2", 1), ("", 2), ("a;b\n1;2\n3", 2)])
+def test_stream_spreadsheet_only_caches_complete_csv(cache, client, answer, calls):
+    client.stream_answer = answer
+    cached = CachedClient(client, cache)
+    for _ in range(2):
+        chunks = []
+        assert cached.stream_spreadsheet("carteira", chunks.append) == answer
+        assert "".join(chunks) == answer
+    assert len(client.calls) == calls
@@ -0,0 +1,60 @@
+import pytest
+from automation.analysis.compaction import DEDUPE_MIN_CHARS, compact_html, dedupe_blocks, chunk_text
+from benchmarks.fixtures import raw_pages
+
+DISCLAIMER = "Este relatório foi elaborado pela Suno Research e não constitui oferta de compra ou venda de valores mobiliários."
+
+def test_dedupe_drops_repeated_long_blocks_case_insensitively():
+    assert dedupe_blocks([DISCLAIMER, "## Itaú", DISCLAIMER.upper()]) == [DISCLAIMER, "## Itaú"]
+
+@pytest.mark.parametrize("blocks", [
+    ["- COMPRA", "- COMPRA"],
+    ["## Tese", "texto", "## Tese"],
+    ["| Peso | 5% |", "| Peso | 5% |"],
+    ["Sim.", "Não.", "Sim."],
+])
+def test_dedupe_keeps_short_repeated_content(blocks):
+    assert dedupe_blocks(blocks) == blocks
+
+@pytest.mark.parametrize("furniture", ["Compartilhe:", "Compartilhar", "Voltar ao topo", "Leia também", "WhatsApp"])
+def test_dedupe_drops_repeated_page_furniture_of_any_length(furniture):
+    assert dedupe_blocks([furniture, "texto", furniture]) == [furniture, "texto"]
+
+def test_dedupe_threshold_is_configurable():
+    block = "x" * 20
+    assert dedupe_blocks([block, block], min_chars=10) == [block]
+    assert len(block) < DEDUPE_MIN_CHARS
+    assert dedupe_blocks([block, block]) == [block, block]
+
+def test_compact_html_renders_markdown_blocks():
+    html = """
+    <html><head><script>var x = 1;</script><style>p {}</style></head><body>
+      <h2>Carteira</h2>
+      <p>Primeira linha<br>segunda   linha</p>
+      <ul><li>COMPRA</li><li>VENDA</li></ul>
+      <table><tr><th>Ticker</th><th>Peso</th></tr><tr><td>ITUB4</td><td>5|6</td></tr></table>
+    </body></html>
+    """
+    text, stats = compact_html(html)
+    assert text.split("\n\n") == [
+        "## Carteira", "Primeira linha", "segunda linha", "- COMPRA", "- VENDA",
+        "| Ticker | Peso |\n| ITUB4 | 5/6 |",
+    ]
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+def test_compact_html_keeps_repeated_short_blocks_and_drops_repeated_disclaimers():
+    html = f"<h3>Recomendação</h3><p>{DISCLAIMER}</p><h3>Recomendação</h3><p>COMPRA</p><p>COMPRA</p><p>{DISCLAIMER}</p>"
+    text, _ = compact_html(html)
+    assert text.split("\n\n") == ["### Recomendação", DISCLAIMER, "### Recomendação", "COMPRA", "COMPRA"]
+
+@pytest.mark.parametrize("kind,name,html", [page for page in raw_pages() if page[0] == "reports"][:3])
+def test_compact_html_shrinks_the_corpus_reports(kind, name, html):
+    text, stats = compact_html(html)
+    assert text
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+def test_chunk_text_splits_on_blocks_and_large_tables_by_row():
+    text = "\n\n".join(["a" * 40, "b" * 40, "| x |\n| y |\n| z |"])
+    chunks = chunk_text(text, max_tokens=10)
+    assert chunks[:2] == ["a" * 40, "b" * 40]
+    assert "\n\n".join(chunks[2:]).replace("\n\n", "\n") == "| x |\n| y |\n| z |"
@@ -0,0 +1,59 @@
+import pytest
+import requests
+from unittest import mock
+from automation.suno.http_fetch import session_from_driver, fetch_html, fetch_many
+
+SELECTORS = ["#readerData", ".elementor.radar-fii"]
+
+class FakeSession:
+    """
+    Answers GETs from a url -> (status, final url, body) table; unknown urls raise like a network error.
+    """
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        if url not in self.pages:
+            raise requests.ConnectionError(url)
+        status, final_url, body = self.pages[url]
+        return mock.Mock(status_code=status, url=final_url, text=body, content=body.encode("utf-8"))
+
+def page(main):
+    return f"<html><body><nav>menu</nav>{main}</body></html>"
+
+def test_session_copies_browser_cookies_and_user_agent():
+    driver = mock.Mock()
+    driver.execute_script.return_value = "Mozilla/5.0 Teste"
+    driver.get_cookies.return_value = [{"name": "sessao", "value": "abc", "domain": ".suno.com.br", "path": "/"}]
+    session = session_from_driver(driver)
+    assert session.headers["User-Agent"] == "Mozilla/5.0 Teste"
+    assert session.cookies.get("sessao", domain=".suno.com.br") == "abc"
+
+def test_fetch_html_returns_first_matching_selector():
+    session = FakeSession({
+        "/r1": (200, "/r1", page("<div id='readerData'><p>Relatório</p></div>")),
+        "/radar": (200, "/radar", page("<div id='readerData'> </div><div class='elementor radar-fii'><p>FIIs</p></div>")),
+    })
+    assert fetch_html(session, "/r1", SELECTORS) == ("/r1", "<p>Relatório</p>")
+    # An empty #readerData means client-side rendering of that block; the next selector is tried
+    assert fetch_html(session, "/radar", SELECTORS) == ("/radar", "<p>FIIs</p>")
+
+@pytest.mark.parametrize("pages", [
+    {"/r": (200, "/login?next=/r", page("<form></form>"))},
+    {"/r": (500, "/r", "erro")},
+    {"/r": (200, "/r", page("<div id='app'></div>"))},
+    {},
+])
+def test_fetch_html_falls_back_when_content_is_missing(pages):
+    final_url, html = fetch_html(FakeSession(pages), "/r", SELECTORS)
+    assert html is None
+
+def test_fetch_many_maps_every_url():
+    pages = {f"/r{i}": (200, f"/r{i}", page(f"<div id='readerData'>{i}</div>")) for i in range(5)}
+    session = FakeSession(pages)
+    results = fetch_many(session, list(pages) + ["/fora"], SELECTORS, max_workers=3)
+    assert results["/r3"] == ("/r3", "3")
+    assert results["/fora"] == ("/fora", None)
+    assert sorted(session.requested) == sorted(list(pages) + ["/fora"])
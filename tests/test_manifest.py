@@ -0,0 +1,131 @@
+import os
+import pytest
+from unittest import mock
+from automation.manifest import JobQueue, recording, STAGE_SUNO_WALLETS_HTML, STAGE_SUNO_WALLETS_MD, STAGE_WALLET_CSV
+from automation.analysis import processors
+from benchmarks.fixtures import build_corpus
+from benchmarks.mock_llm import MockLLMClient
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite"))
+
+def test_claim_moves_pending_jobs_once(queue, tmp_path):
+    paths = [str(tmp_path / f"{name}.html") for name in ("a", "b", "c")]
+    for path in paths:
+        queue.enqueue("etapa", path)
+
+    assert queue.claim("etapa", limit=2) == paths[:2]
+    assert queue.claim("etapa") == paths[2:]
+    assert queue.claim("etapa") == []
+    assert queue.counts("etapa") == {"processing": 3}
+
+def test_settled_jobs_and_requeue(queue, tmp_path):
+    done, failed, running = (str(tmp_path / f"{name}.html") for name in ("done", "failed", "running"))
+    for path in (done, failed, running):
+        queue.enqueue("etapa", path)
+    queue.claim("etapa")
+    queue.mark_done("etapa", done)
+    queue.mark_failed("etapa", failed, "erro")
+    assert queue.counts("etapa") == {"done": 1, "failed": 1, "processing": 1}
+
+    queue.requeue("etapa")
+    assert sorted(queue.claim("etapa")) == sorted([failed, running])
+
+def test_enqueue_does_not_reset_a_job_in_progress(queue, tmp_path):
+    path = str(tmp_path / "a.html")
+    queue.enqueue("etapa", path)
+    queue.claim("etapa")
+    queue.enqueue("etapa", path)
+    assert queue.counts("etapa") == {"processing": 1}
+
+    queue.mark_done("etapa", path)
+    queue.enqueue("etapa", path)
+    assert queue.claim("etapa") == [path]
+
+def test_remember_output(queue, tmp_path):
+    assert queue.last_output("carteira") is None
+    queue.remember_output("carteira", "h1", str(tmp_path / "a.csv"))
+    queue.remember_output("carteira", "h2", str(tmp_path / "b.csv"))
+    assert queue.last_output("carteira") == ("h2", str(tmp_path / "b.csv"))
+
+@pytest.fixture
+def corpus(tmp_path):
+    return build_corpus(str(tmp_path / "corpus"))
+
+@pytest.fixture
+def llm():
+    client = MockLLMClient()
+    with mock.patch.object(processors, "get_client", return_value=client):
+        yield client
+
+def test_recording_enqueues_then_forwards(tmp_path, isolated_manifest):
+    saved = []
+    record = recording(STAGE_SUNO_WALLETS_HTML, saved.append)
+    record(str(tmp_path / "carteira.html"))
+    assert saved == [str(tmp_path / "carteira.html")]
+    assert isolated_manifest.claim(STAGE_SUNO_WALLETS_HTML) == [str(tmp_path / "carteira.html")]
+    # Without a callback it only records
+    recording(STAGE_SUNO_WALLETS_HTML)(str(tmp_path / "outra.html"))
+    assert isolated_manifest.counts(STAGE_SUNO_WALLETS_HTML) == {"processing": 1, "pending": 1}
+
+@pytest.mark.parametrize("use_manifest,expected", [(False, {}), (True, {"pending": 1})])
+def test_scrapers_record_only_when_asked(tmp_path, isolated_manifest, use_manifest, expected):
+    from automation.suno import wallets
+
+    def save_one_wallet(driver, links, download_path, today_str, on_saved=None):
+        wallets._write_wallet_file(download_path, "/carteiras/dividendos", today_str, "<p>ITUB4</p>", on_saved=on_saved)
+
+    saved = []
+    driver = mock.Mock()
+    driver.execute_script.return_value = 0
+    driver.find_elements.return_value = []
+    with mock.patch.object(wallets, "wait_for_selector"), mock.patch.object(wallets, "wait_for_page_stable"), \
+            mock.patch.object(wallets, "WebDriverWait"), mock.patch.object(wallets, "set_download_path"), \
+            mock.patch.object(wallets, "_download_wallet_links", save_one_wallet):
+        wallets.download_suno_wallets(driver, str(tmp_path), use_manifest=use_manifest, on_saved=saved.append)
+    assert len(saved) == 1
+    assert isolated_manifest.counts(STAGE_SUNO_WALLETS_HTML) == expected
+
+def test_processors_leave_manifest_alone_without_opt_in(corpus, llm, tmp_path, isolated_manifest):
+    wallets_html = os.path.dirname(corpus["wallets"][0])
+    processors.process_suno_wallets_step1_html_to_md(wallets_html, str(tmp_path / "md"), use_local_parser=False)
+    processors.process_suno_wallets_step2_md_to_csv(str(tmp_path / "md"), str(tmp_path / "csv"))
+    processors.process_suno_wallets_html_to_csv(wallets_html, str(tmp_path / "fundido"))
+
+    for stage in (STAGE_SUNO_WALLETS_MD, STAGE_WALLET_CSV):
+        assert isolated_manifest.counts(stage) == {}
+    assert isolated_manifest._conn.execute("SELECT COUNT(*) FROM outputs").fetchone()[0] == 0
+    assert len(os.listdir(tmp_path / "csv")) == len(corpus["wallets"])
+
+def test_manifest_chains_step1_into_step2(corpus, llm, tmp_path, isolated_manifest):
+    for path in corpus["wallets"]:
+        isolated_manifest.enqueue(STAGE_SUNO_WALLETS_HTML, path)
+
+    processors.process_suno_wallets_step1_html_to_md(None, str(tmp_path / "md"), use_local_parser=False, use_manifest=True)
+    processors.process_suno_wallets_step2_md_to_csv(None, str(tmp_path / "csv"), use_manifest=True)
+
+    total = len(corpus["wallets"])
+    assert isolated_manifest.counts(STAGE_SUNO_WALLETS_HTML) == {"done": total}
+    assert isolated_manifest.counts(STAGE_SUNO_WALLETS_MD) == {"done": total}
+    assert isolated_manifest.counts(STAGE_WALLET_CSV) == {"pending": total}
+
+def test_unchanged_wallet_reuses_previous_output(corpus, llm, tmp_path, isolated_manifest):
+    path = corpus["wallets"][0]
+    isolated_manifest.enqueue(STAGE_SUNO_WALLETS_HTML, path)
+    processors.process_suno_wallets_html_to_csv(None, str(tmp_path / "dia1"), use_manifest=True)
+    calls = llm.calls
+    assert calls == 1
+
+    isolated_manifest.enqueue(STAGE_SUNO_WALLETS_HTML, path)
+    processors.process_suno_wallets_html_to_csv(None, str(tmp_path / "dia2"), use_manifest=True)
+    assert llm.calls == calls
+    assert os.listdir(tmp_path / "dia2") == os.listdir(tmp_path / "dia1")
+
+def test_claimed_jobs_keep_their_own_date(corpus, llm, tmp_path, isolated_manifest):
+    old = str(tmp_path / "carteira-2024-05-02-x.html")
+    os.link(corpus["wallets"][0], old)
+    isolated_manifest.enqueue(STAGE_SUNO_WALLETS_HTML, old)
+
+    processors.process_suno_wallets_html_to_csv(None, str(tmp_path / "csv"), use_manifest=True)
+    assert os.listdir(tmp_path / "csv") == ["carteira-2024-05-02-x-2024-05-02.csv"]
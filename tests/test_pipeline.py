@@ -0,0 +1,169 @@
+import time
+import threading
+import pytest
+from unittest import mock
+from automation import pipeline
+from automation.pipeline import Pipeline
+
+def run(pipe, timeout=10):
+    """
+    Runs the pipeline in a thread, so a deadlock fails the test instead of hanging it.
+    """
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pipe.run()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline travou"
+    return results[0]
+
+def test_items_flow_through_stages():
+    seen = []
+    pipe = Pipeline()
+    pipe.source("fonte", lambda emit: [emit(i) for i in range(20)])
+    pipe.stage("dobro", lambda item: item * 2, inputs=["fonte"], workers=3)
+    pipe.stage("pares", lambda item: item if item % 4 == 0 else None, inputs=["dobro"])
+    pipe.stage("coleta", seen.append, inputs=["pares"])
+
+    results = run(pipe)
+    assert sorted(seen) == list(range(0, 40, 4))
+    assert {name: stage["items"] for name, stage in results.items()} == {"fonte": 20, "dobro": 20, "pares": 10, "coleta": 0}
+
+def test_stage_starts_before_source_finishes():
+    started = threading.Event()
+
+    def source(emit):
+        emit(1)
+        assert started.wait(5)
+
+    pipe = Pipeline()
+    pipe.source("fonte", source)
+    pipe.stage("etapa", lambda item: started.set(), inputs=["fonte"])
+    assert run(pipe)["fonte"]["errors"] == 0
+
+def test_after_orders_sources():
+    order = []
+    pipe = Pipeline()
+    pipe.source("primeira", lambda emit: time.sleep(0.05) or order.append("primeira"))
+    pipe.source("segunda", lambda emit: order.append("segunda"), after=["primeira"])
+    run(pipe)
+    assert order == ["primeira", "segunda"]
+
+def test_errors_are_counted_and_do_not_stop_the_run():
+    def flaky(item):
+        if item % 3 == 0:
+            raise ValueError("falhou")
+        return item
+
+    def broken_source(emit):
+        emit(1)
+        raise RuntimeError("navegador caiu")
+
+    pipe = Pipeline()
+    pipe.source("fonte", lambda emit: [emit(i) for i in range(9)])
+    pipe.source("quebrada", broken_source)
+    pipe.stage("etapa", flaky, inputs=["fonte", "quebrada"], workers=2)
+    results = run(pipe)
+    assert results["quebrada"]["errors"] == 1
+    assert (results["etapa"]["items"], results["etapa"]["errors"]) == (7, 3)
+
+def test_dead_worker_does_not_block_producers():
+    real_span = pipeline.span
+
+    def span(name, **attrs):
+        if name == "pipeline: etapa":
+            raise RuntimeError("span")
+        return real_span(name, **attrs)
+
+    pipe = Pipeline()
+    pipe.source("fonte", lambda emit: [emit(i) for i in range(30)])
+    pipe.stage("etapa", lambda item: item, inputs=["fonte"], queue_size=2)
+    pipe.stage("fim", lambda item: item, inputs=["etapa"])
+    with mock.patch.object(pipeline, "span", span), mock.patch("threading.excepthook"):
+        results = run(pipe)
+    assert results["fonte"]["items"] == 30
+    assert results["etapa"]["errors"] == 30
+
+def test_graph_is_validated():
+    pipe = Pipeline()
+    pipe.source("fonte", lambda emit: None)
+    with pytest.raises(ValueError):
+        pipe.source("fonte", lambda emit: None)
+    with pytest.raises(ValueError):
+        pipe.stage("etapa", lambda item: item, inputs=["inexistente"])
+
+def test_tracked_settles_manifest_jobs(isolated_manifest, tmp_path):
+    ok, bad = str(tmp_path / "ok.html"), str(tmp_path / "bad.html")
+    for path in (ok, bad):
+        isolated_manifest.enqueue("etapa", path)
+    isolated_manifest.claim("etapa")
+
+    tracked = pipeline._tracked(isolated_manifest, "etapa", lambda path: path if path == ok else None)
+    tracked(ok)
+    tracked(bad)
+    assert isolated_manifest.counts("etapa") == {"done": 1, "failed": 1}
+
+def test_tracked_counts_skipped_files_as_done(isolated_manifest, tmp_path):
+    from automation.analysis import processors
+    from benchmarks.mock_llm import MockLLMClient
+
+    html_folder, output = tmp_path / "html", tmp_path / "resumos"
+    html_folder.mkdir()
+    output.mkdir()
+    reports = {name: str(html_folder / f"{name}.html") for name in ("novo", "resumido", "quebrado")}
+    for name, path in reports.items():
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"<p>Relatório {name}</p>")
+        isolated_manifest.enqueue("resumos", path)
+    isolated_manifest.claim("resumos")
+    (output / "sem-recomendacao-resumido.md").write_text("## Resumo", encoding="utf-8")
+
+    class Client(MockLLMClient):
+        def analyze_report(self, prompt, model=None, temperature=0.7, **kwargs):
+            if "quebrado" in prompt:
+                raise RuntimeError("API fora do ar")
+            return super().analyze_report(prompt, model, temperature, **kwargs)
+
+    tracked = pipeline._tracked(
+        isolated_manifest, "resumos", lambda path: processors.process_report_file(Client(), path, str(output)),
+        lambda path: processors.report_summary_exists(path, str(output))
+    )
+    outputs = {name: tracked(path) for name, path in reports.items()}
+
+    # The already summarized report emits nothing but is not a failure
+    assert outputs["resumido"] is None and outputs["quebrado"] is None and outputs["novo"]
+    assert isolated_manifest.counts("resumos") == {"done": 2, "failed": 1}
+    failed = isolated_manifest._conn.execute("SELECT path FROM jobs WHERE state = 'failed'").fetchall()
+    assert failed == [(reports["quebrado"],)]
+
+@pytest.fixture
+def scrapers():
+    """
+    run_ingest with its browser, scrapers and LLM client faked out; the Suno reports scraper fails.
+    """
+    pytest.importorskip("selenium")
+    import automation.driver
+    import automation.suno.auth
+    import automation.suno.reports
+    import automation.suno.wallets
+    import automation.meus_dividendos.scraper
+    from automation.analysis import processors
+
+    created = mock.Mock()
+    with mock.patch.object(automation.driver, "create_driver", return_value=created), \
+         mock.patch.object(processors, "get_client"), \
+         mock.patch.object(automation.suno.auth, "login_suno"), \
+         mock.patch.object(automation.suno.reports, "download_suno_reports", side_effect=RuntimeError("falhou")), \
+         mock.patch.object(automation.suno.wallets, "download_suno_wallets"), \
+         mock.patch.object(automation.meus_dividendos.scraper, "download_meus_dividendos_wallet"):
+        yield created
+
+def test_run_ingest_quits_the_driver_it_creates(scrapers):
+    results = pipeline.run_ingest()
+    assert results["suno: relatórios"]["errors"] == 1
+    scrapers.quit.assert_called_once()
+
+def test_run_ingest_leaves_a_given_driver_open(scrapers):
+    driver = mock.Mock()
+    pipeline.run_ingest(driver)
+    driver.quit.assert_not_called()
+    scrapers.quit.assert_not_called()
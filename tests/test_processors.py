@@ -0,0 +1,59 @@
+import os
+import threading
+import pytest
+from automation.analysis import processors
+from benchmarks.fixtures import build_corpus
+from benchmarks.mock_llm import MockLLMClient
+
+class ConcurrencyClient(MockLLMClient):
+    """
+    MockLLMClient that records the models used and the most calls it had in flight at once.
+    """
+    def __init__(self, latency=0.05):
+        super().__init__(latency)
+        self.models = []
+        self.in_flight = 0
+        self.peak = 0
+        self._counter = threading.Lock()
+
+    def analyze_report(self, prompt, model=None, temperature=0.7, **kwargs):
+        with self._counter:
+            self.models.append(model)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return super().analyze_report(prompt, model, temperature, **kwargs)
+        finally:
+            with self._counter:
+                self.in_flight -= 1
+
+@pytest.fixture
+def reports(tmp_path):
+    return os.path.dirname(build_corpus(str(tmp_path / "corpus"))["reports"][0])
+
+def summaries(folder):
+    return sorted(name.split("-", 2)[2] for name in os.listdir(folder))
+
+def test_reports_fan_out_to_workers(reports, tmp_path):
+    client = ConcurrencyClient()
+    output = str(tmp_path / "resumos")
+    processors.process_reports(reports, output, client=client, max_workers=4, route=False)
+
+    assert summaries(output) == sorted(f"{os.path.splitext(name)[0]}.md" for name in os.listdir(reports))
+    assert client.peak > 1
+    assert set(client.models) == {processors._default_model("openai")}
+
+def test_processed_reports_are_skipped(reports, tmp_path):
+    output = str(tmp_path / "resumos")
+    processors.process_reports(reports, output, client=MockLLMClient())
+    client = MockLLMClient()
+    processors.process_reports(reports, output, client=client, max_workers=4)
+    assert client.calls == 0
+
+def test_sequential_batch_and_parallel_paths_agree(reports, tmp_path):
+    outputs = {}
+    for mode, options in {"sequencial": {}, "paralelo": {"max_workers": 3}, "lote": {"batch": True}}.items():
+        folder = str(tmp_path / mode)
+        processors.process_reports(reports, folder, client=MockLLMClient(), **options)
+        outputs[mode] = sorted(os.listdir(folder))
+    assert outputs["sequencial"] == outputs["paralelo"] == outputs["lote"]
@@ -0,0 +1,102 @@
+import json
+import pytest
+from automation.analysis import processors, prompts
+from automation.analysis.cache import CachedClient, ResponseCache, cache_key
+from automation.analysis.prompts import Prompt, PromptTemplate, get_template, register, render_prompt
+
+# (template, fields that change per file or chunk) for every prompt the processors render; the markers
+# are unique so a leak into the prefix can be spotted
+VARIANTS = [
+    ("relatorio", [{"content": "<p>§1§</p>", "content_format": "HTML"}, {"content": "<p>§2§</p>" * 50, "content_format": "HTML"}]),
+    ("relatorio-resumo", [{"content": "§1§", "content_format": "Markdown"}, {"content": "§2§", "content_format": "Markdown"}]),
+    ("relatorio-parte", [{"index": 9001, "total": 9003, "content": "§1§"}, {"index": 9002, "total": 9007, "content": "§2§"}]),
+    ("carteira-md", [{"content": "<table>§1§</table>"}, {"content": "<table>§2§</table>"}]),
+    ("carteira-csv", [{"file_name": "§a§.md", "content": "§1§"}, {"file_name": "§b§.md", "content": "§2§"}]),
+    ("carteira-linhas", [{"file_name": "§a§.md", "content": "§1§"}, {"file_name": "§b§.md", "content": "§2§"}]),
+    ("carteira-html-csv", [{"file_name": "§a§", "content": "§1§"}, {"file_name": "§b§", "content": "§2§"}]),
+    ("meus-dividendos-csv", [{"content": "<table>§1§</table>"}, {"content": "<table>§2§</table>"}]),
+]
+
+@pytest.mark.parametrize("name,fields", VARIANTS)
+def test_prefix_is_identical_across_files_and_chunks(name, fields):
+    prompts = [render_prompt(name, **values) for values in fields]
+    assert prompts[0].prefix and prompts[0].prefix == prompts[1].prefix
+    for prompt, values in zip(prompts, fields):
+        assert prompt.startswith(prompt.prefix)
+        # Everything that varies per file or chunk comes after the prefix
+        for key, value in values.items():
+            if key != "content_format":
+                assert str(value) not in prompt.prefix
+                assert str(value) in prompt[len(prompt.prefix):]
+
+def test_report_prefix_only_varies_with_the_content_format():
+    html, markdown = (processors._build_report_prompt("x", content_format=fmt) for fmt in ("HTML", "Markdown"))
+    assert html.prefix != markdown.prefix
+    assert processors._build_report_prompt("y", content_format="HTML").prefix == html.prefix
+
+def test_prompt_is_a_plain_string_that_remembers_its_prefix_and_template():
+    prompt = render_prompt("carteira-md", content="<table></table>")
+    assert isinstance(prompt, str)
+    assert prompt == prompt.prefix + prompt[len(prompt.prefix):]
+    assert prompt.template == f"carteira-md@v{get_template('carteira-md').version}"
+    # str operations give plain strings back; only rendering attaches the prefix
+    assert type(prompt.strip()) is str
+    assert json.loads(json.dumps(prompt)) == str(prompt)
+
+def test_templates_are_versioned(monkeypatch):
+    monkeypatch.setattr(prompts, "_templates", {})
+    template = PromptTemplate("teste-versao", 1, "Instruções {fmt}\n", "{content}")
+    register(template)
+    register(PromptTemplate("teste-versao", 2, "Novas instruções {fmt}\n", "{content}"))
+    with pytest.raises(ValueError):
+        register(template)
+    assert render_prompt("teste-versao", fmt="A", content="x").template == "teste-versao@v2"
+    assert render_prompt("teste-versao", version=1, fmt="A", content="x") == "Instruções A\nx"
+
+@pytest.fixture
+def claude():
+    pytest.importorskip("anthropic")
+    from automation.analysis.claude_client import CACHE_CONTROL, ClaudeClient
+    return ClaudeClient(), CACHE_CONTROL
+
+@pytest.mark.parametrize("name,fields", VARIANTS)
+def test_claude_cache_breakpoint_falls_at_the_prefix_end(claude, name, fields):
+    client, cache_control = claude
+    prompt = render_prompt(name, **fields[0])
+    prefix_block, content_block = client._content(prompt)
+    assert prefix_block == {"type": "text", "text": prompt.prefix, "cache_control": cache_control}
+    assert "cache_control" not in content_block
+    assert prefix_block["text"] + content_block["text"] == prompt
+
+def test_claude_sends_plain_strings_unsplit(claude):
+    client, _ = claude
+    assert client._content("texto simples") == "texto simples"
+
+def test_claude_params_carry_the_breakpoint(claude):
+    client, cache_control = claude
+    prompt = processors._build_wallet_csv_prompt("carteira.md", "| a |")
+    [message] = client._spreadsheet_params(prompt, "modelo", 0, 100)["messages"]
+    assert message["content"][0]["cache_control"] == cache_control
+
+class EchoClient:
+    def __init__(self):
+        self.prompts = []
+
+    def convert_spreadsheet(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return "a;b\n1;2"
+
+def test_prompt_survives_cached_client_keying(tmp_path):
+    client = EchoClient()
+    cached = CachedClient(client, ResponseCache(str(tmp_path / "cache.sqlite")))
+    prompt = processors._build_wallet_csv_prompt("carteira.md", "| a |")
+
+    cached.convert_spreadsheet(prompt, model="modelo")
+    # The wrapped client still gets the Prompt, so the Claude breakpoint is not lost behind the cache
+    [sent] = client.prompts
+    assert sent is prompt and sent.prefix == prompt.prefix
+    # Keys only depend on the text: the same prompt as a plain string is a hit
+    assert cache_key("convert_spreadsheet", prompt, "modelo", 0) == cache_key("convert_spreadsheet", str(prompt), "modelo", 0)
+    cached.convert_spreadsheet(str(prompt), model="modelo")
+    assert len(client.prompts) == 1
+    assert cached.cache.stats()["hits"] == 1
@@ -0,0 +1,258 @@
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from automation.analysis import rate_limit
+from automation.analysis.rate_limit import Budget, ModelLimiter, RequestScheduler, _reset_seconds
+
+class FakeClock:
+    """
+    Stands in for time.monotonic; waiting on a condition just moves the clock forward.
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.waits = []
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+        return False
+
+class FakeCondition:
+    def __init__(self, clock):
+        self.clock = clock
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+    def wait(self, timeout=None):
+        return self.clock.wait(timeout)
+
+    def notify_all(self):
+        pass
+
+class ApiError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = mock.Mock(headers=headers or {})
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    return clock
+
+def limiter(clock, rpm=None, tpm=None):
+    limiter = ModelLimiter(rpm, tpm)
+    limiter._cond = FakeCondition(clock)
+    return limiter
+
+def scheduler(clock, **kwargs):
+    """
+    Scheduler whose limiters run on the fake clock, so tests never sleep.
+    """
+    scheduler = RequestScheduler(**{"max_retries": 3, "default_rpm": None, "default_tpm": None, **kwargs})
+    original = scheduler.limiter
+    def fake_limiter(provider, model):
+        found = original(provider, model)
+        found._cond = FakeCondition(clock)
+        return found
+    scheduler.limiter = fake_limiter
+    return scheduler
+
+def test_budget_blocks_at_zero_and_refills_over_time(clock):
+    budget = Budget(per_minute=60)
+    budget.take(60)
+    assert budget.wait_time(1, clock.now) == pytest.approx(1.0)
+    clock.now += 30
+    assert budget.wait_time(30, clock.now) == 0.0
+
+def test_unlimited_budget_never_waits(clock):
+    budget = Budget()
+    budget.take(10 ** 9)
+    assert budget.wait_time(10 ** 9, clock.now) == 0.0
+
+def test_acquire_waits_until_the_bucket_has_room(clock):
+    model = limiter(clock, rpm=2)
+    assert model.acquire(0) == 0.0
+    assert model.acquire(0) == 0.0
+    # Empty bucket: the third request waits for one request's worth of refill (30s at 2 rpm)
+    assert model.acquire(0) == pytest.approx(30.0)
+    assert clock.waits == [pytest.approx(30.0)]
+
+def test_oversized_request_waits_for_a_full_bucket_instead_of_forever(clock):
+    model = limiter(clock, tpm=1000)
+    model.acquire(800)
+    assert model.acquire(5000) == pytest.approx(48.0)
+
+def test_settle_returns_unused_tokens_and_charges_overruns(clock):
+    model = limiter(clock, tpm=1000)
+    model.acquire(600)
+    model.settle(600, 100)
+    assert model.tokens.available == pytest.approx(900)
+    model.acquire(100)
+    model.settle(100, 400)
+    assert model.tokens.available == pytest.approx(500)
+
+@pytest.mark.parametrize("provider,headers", [
+    ("openai", {"x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "499",
+                "x-ratelimit-limit-tokens": "30000", "x-ratelimit-remaining-tokens": "12000"}),
+    ("claude", {"anthropic-ratelimit-requests-limit": "500", "anthropic-ratelimit-requests-remaining": "499",
+                "anthropic-ratelimit-tokens-limit": "30000", "anthropic-ratelimit-tokens-remaining": "12000"}),
+])
+def test_limits_are_learned_from_headers(clock, provider, headers):
+    model = limiter(clock)
+    model.observe(provider, headers)
+    assert model.requests.capacity == 500
+    assert model.tokens.capacity == 30000
+    assert model.tokens.available == 12000
+
+def test_unknown_provider_and_missing_headers_change_nothing(clock):
+    model = limiter(clock, rpm=10)
+    model.observe("outro", {"x-ratelimit-limit-requests": "500"})
+    model.observe("openai", None)
+    assert model.requests.capacity == 10
+
+def test_exhausted_remaining_pauses_until_reset(clock):
+    model = limiter(clock)
+    model.observe("openai", {"x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "0",
+                             "x-ratelimit-reset-requests": "1m2.5s"})
+    assert model.paused_until == pytest.approx(clock.now + 62.5)
+
+@pytest.mark.parametrize("value,expected", [
+    ("1m2.5s", 62.5),
+    ("20ms", 0.02),
+    ("6s", 6.0),
+    ("1h", 3600.0),
+    ("", None),
+    (None, None),
+    ("não é data T", None),
+])
+def test_reset_seconds_parses_durations(value, expected):
+    assert _reset_seconds(value) == (pytest.approx(expected) if expected is not None else None)
+
+def test_reset_seconds_parses_rfc3339_timestamps():
+    future = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat().replace("+00:00", "Z")
+    assert 25 < _reset_seconds(future) <= 30
+    past = (datetime.now(timezone.utc) - timedelta(seconds=30)).isoformat()
+    assert _reset_seconds(past) == 0.0
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504, 529])
+def test_retryable_statuses_are_retried(clock, monkeypatch, status):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: high)
+    answers = [ApiError(status), ({}, "ok", 10)]
+    def request():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    assert scheduler(clock).call("claude", "modelo", 10, request) == "ok"
+    assert answers == []
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+def test_other_client_errors_are_not_retried(clock, status):
+    calls = []
+    def request():
+        calls.append(1)
+        raise ApiError(status)
+    with pytest.raises(ApiError):
+        scheduler(clock).call("openai", "modelo", 10, request)
+    assert len(calls) == 1
+
+def test_connection_errors_are_retried(clock):
+    APIConnectionError = type("APIConnectionError", (Exception,), {})
+    answers = [APIConnectionError(), ({}, "ok", None)]
+    def request():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    assert scheduler(clock).call("openai", "modelo", 10, request) == "ok"
+
+def test_gives_up_after_max_retries(clock):
+    calls = []
+    def request():
+        calls.append(1)
+        raise ApiError(529)
+    with pytest.raises(ApiError):
+        scheduler(clock, max_retries=2).call("claude", "modelo", 10, request)
+    assert len(calls) == 3
+
+def test_retry_pauses_every_worker_of_the_model(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: high)
+    runner = scheduler(clock, base_delay=2.0)
+    answers = [ApiError(429), ({}, "ok", 10)]
+    def request():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    start = clock.now
+    runner.call("claude", "modelo", 10, request)
+    # The second attempt only ran after the backoff pause
+    assert clock.now - start == pytest.approx(2.0)
+
+def test_backoff_is_full_jitter_with_exponential_cap(monkeypatch):
+    bounds = []
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: bounds.append((low, high)) or high / 2)
+    runner = RequestScheduler(base_delay=1.0, max_delay=10.0)
+    assert runner.backoff(0) == 0.5
+    assert runner.backoff(2) == 2.0
+    runner.backoff(10)
+    assert bounds == [(0, 1.0), (0, 4.0), (0, 10.0)]
+
+def test_backoff_never_undercuts_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: 0.1)
+    assert RequestScheduler().backoff(0, retry_after=7.0) == 7.0
+
+@pytest.mark.parametrize("headers,expected", [
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after-ms": "1500", "retry-after": "9"}, 1.5),
+    ({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_retry_after_header_feeds_the_backoff(clock, monkeypatch, headers, expected):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: 0.0)
+    runner = scheduler(clock)
+    answers = [ApiError(429, headers), ({}, "ok", 10)]
+    def request():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    start = clock.now
+    runner.call("claude", "modelo", 10, request)
+    assert clock.now - start == pytest.approx(expected or 0.0)
+
+def test_reservation_is_settled_to_the_reported_usage(clock):
+    runner = scheduler(clock, default_tpm=1000)
+    runner.call("openai", "modelo", 500, lambda: ({}, "ok", 120))
+    assert runner.limiter("openai", "modelo").tokens.available == pytest.approx(880)
+
+def test_reservation_is_kept_when_usage_is_unknown(clock):
+    runner = scheduler(clock, default_tpm=1000)
+    runner.call("openai", "modelo", 500, lambda: ({}, "ok", None))
+    assert runner.limiter("openai", "modelo").tokens.available == pytest.approx(500)
+
+def test_failed_attempt_gives_its_reservation_back(clock):
+    runner = scheduler(clock, default_tpm=1000)
+    def request():
+        raise ApiError(400)
+    with pytest.raises(ApiError):
+        runner.call("openai", "modelo", 500, request)
+    assert runner.limiter("openai", "modelo").tokens.available == pytest.approx(1000)
+
+def test_set_limits_overrides_defaults(clock):
+    runner = scheduler(clock, default_rpm=10)
+    runner.set_limits("claude", "modelo", rpm=50, tpm=40000)
+    model = runner.limiter("claude", "modelo")
+    assert (model.requests.capacity, model.tokens.capacity) == (50, 40000)
@@ -0,0 +1,129 @@
+import pytest
+from unittest import mock
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import TimeoutException
+from automation.suno import reports
+from automation.suno.report_index import ReportIndex
+
+PAGES = [["c0", "c1"], ["c2", "c3"], ["c4", "c5"]]
+
+class FeedDriver:
+    """
+    A feed that loads the next page of cards each time its container is scrolled to the bottom.
+    """
+    def __init__(self, pages=PAGES):
+        self.pages = pages
+        self.loaded = 1
+        self.scrolls = 0
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script, *args):
+        if script == reports._CARD_IDS_JS:
+            return [card_id for page in self.pages[:self.loaded] for card_id in page]
+        if script.startswith("arguments[0].scrollTop"):
+            self.scrolls += 1
+            self.loaded = min(self.loaded + 1, len(self.pages))
+            return None
+        if "scrollHeight" in script:
+            return self.loaded * 1000
+        raise AssertionError(script)
+
+class ImmediateWait:
+    """
+    WebDriverWait that checks its condition once instead of polling for 20 seconds.
+    """
+    def __init__(self, driver, timeout):
+        self.driver = driver
+
+    def until(self, condition):
+        result = condition(self.driver)
+        if not result:
+            raise TimeoutException()
+        return result
+
+@pytest.fixture
+def feed_waits():
+    with mock.patch.object(reports, "WebDriverWait", ImmediateWait), \
+         mock.patch.object(reports, "wait_for_selector", return_value="container"), \
+         mock.patch.object(reports, "wait_for_page_stable"):
+        yield
+
+@pytest.fixture
+def index(tmp_path):
+    return ReportIndex(str(tmp_path / "relatorios.sqlite"))
+
+def test_feed_scrolls_until_nothing_new_loads(feed_waits):
+    driver = FeedDriver()
+    assert reports._load_report_feed(driver) == ["c0", "c1", "c2", "c3", "c4", "c5"]
+    # The last scroll loaded nothing, which ends the loop
+    assert driver.scrolls == 3
+
+def test_feed_stops_at_a_page_of_known_reports(feed_waits, index):
+    index.add("c2")
+    index.add("c3")
+    driver = FeedDriver()
+    assert reports._load_report_feed(driver, index) == ["c0", "c1", "c2", "c3"]
+    assert driver.scrolls == 1
+
+def test_feed_keeps_scrolling_past_a_partly_known_page(feed_waits, index):
+    index.add("c2")
+    driver = FeedDriver()
+    assert len(reports._load_report_feed(driver, index)) == 6
+
+def test_feed_does_not_scroll_when_the_first_page_is_known(feed_waits, index):
+    index.add("c0")
+    index.add("c1")
+    driver = FeedDriver()
+    assert reports._load_report_feed(driver, index) == ["c0", "c1"]
+    assert driver.scrolls == 0
+
+class Card:
+    def __init__(self, read):
+        self.read = read
+        self.clicked = False
+
+    def get_attribute(self, name):
+        return '<div style="opacity: 0.6">' if self.read else "<div>"
+
+    def click(self):
+        self.clicked = True
+
+def test_cards_already_read_are_indexed_and_stop_the_next_scroll(feed_waits, index):
+    cards = [Card(read=False), Card(read=False), Card(read=True), Card(read=True)]
+    driver = mock.Mock()
+    driver.find_elements.return_value = cards
+    # Only the read cards are on the list, so nothing is opened
+    reports._download_reports_at(driver, [2, 3], "unused", ["c0", "c1", "c2", "c3"], index)
+
+    assert not any(card.clicked for card in cards)
+    assert index.known(["c0", "c1", "c2", "c3"]) == {"c2", "c3"}
+    feed = FeedDriver()
+    assert reports._load_report_feed(feed, index) == ["c0", "c1", "c2", "c3"]
+    assert feed.scrolls == 1
+
+def test_http_backend_indexes_read_cards(index):
+    driver = mock.Mock()
+    driver.execute_script.return_value = [["u0", True], ["u1", False], [None, True]]
+    with mock.patch.object(reports, "session_from_driver"), mock.patch.object(reports, "fetch_many", return_value={}):
+        remaining = reports._download_reports_http(driver, "unused", 2, [0, 1, 2], ["c0", "c1", "c2"], index)
+
+    # c1 failed over HTTP and goes to Selenium; the read cards are done
+    assert remaining == [1]
+    assert index.known(["c0", "c1", "c2"]) == {"c0", "c2"}
+
+def test_pool_indexes_read_cards_it_does_not_open(tmp_path):
+    primary = mock.Mock(name="primary")
+    primary.execute_script.return_value = [["u0", False], ["u1", True]]
+    index_path = str(tmp_path / "relatorios.sqlite")
+    with mock.patch.object(reports, "set_download_path"), \
+         mock.patch.object(reports, "_load_report_feed", return_value=["c0", "c1"]), \
+         mock.patch.object(reports, "create_driver_pool", return_value=[]), \
+         mock.patch.object(reports, "close_driver_pool"), \
+         mock.patch.object(reports, "_download_reports_at"), \
+         mock.patch.object(reports, "_download_report_urls"):
+        reports.download_suno_reports(primary, str(tmp_path), workers=2, index_path=index_path)
+    assert ReportIndex(index_path).known(["c0", "c1"]) == {"c1"}
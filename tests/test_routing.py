@@ -0,0 +1,128 @@
+import os
+import pytest
+from automation.analysis import processors
+from automation.analysis.routing import TIER_LARGE, TIER_SMALL, Route, classify_report, report_text, small_model
+
+@pytest.mark.parametrize("text,signal", [
+    ("Recomendação: COMPRA até R$ 35,00.", "COMPRA"),
+    ("Mantemos VENDA para o papel.", "VENDA"),
+    ("O preço-teto subiu para R$ 40,00.", "preço-teto"),
+    ("Preço teto revisado.", "Preço teto"),
+    ("preco-teto mantido", "preco-teto"),
+    ("Recomendamos compra das ações.", "Recomendamos compra"),
+    ("Nossa recomendação de venda segue.", "recomendação de venda"),
+    ("recomendacao a compra", "recomendacao a compra"),
+    ("Vamos aumentar a posição em ITUB4.", "aumentar a posição"),
+    ("Decidimos reduzir nossa posição.", "reduzir nossa posição"),
+    ("É hora de zerar posicao.", "zerar posicao"),
+    ("Vamos iniciar posição no setor elétrico.", "iniciar posição"),
+    ("Fizemos um ajuste na carteira.", "ajuste na carteira"),
+    ("Ajuste de carteira de maio.", "Ajuste de carteira"),
+    ("TAEE11 entra na carteira.", "entra na carteira"),
+    ("BBAS3 sai da carteira.", "sai da carteira"),
+])
+def test_recommendation_signals_go_to_the_large_model(text, signal):
+    assert classify_report(f"<p>{text}</p>") == Route(TIER_LARGE, signal)
+
+@pytest.mark.parametrize("text", [
+    # COMPRA/VENDA in lower case are everyday words
+    "A compra da empresa foi concluída.",
+    "A receita de vendas cresceu 10%.",
+    "Compradores e vendedores se equilibraram.",
+    # Near misses of the other signals
+    "O preço da ação subiu.",
+    "A recomendação do conselho foi aprovada.",
+    "A posição de caixa da empresa é confortável.",
+    "A carteira de crédito do banco cresceu.",
+    "Ele entra na empresa em junho.",
+    "Teto de gastos do governo.",
+    "",
+])
+def test_reports_without_signals_stay_on_the_small_model(text):
+    assert classify_report(f"<p>{text}</p>").tier == TIER_SMALL
+
+@pytest.mark.parametrize("file_name", ["radar-fii-2024-05-02", "Radar_FII", "relatorio-radar fii"])
+def test_radar_fii_is_always_summary_only(file_name):
+    assert classify_report("<p>COMPRA de HGLG11, preço-teto R$ 180,00</p>", file_name).tier == TIER_SMALL
+
+def test_radar_fii_only_matches_the_file_name():
+    assert classify_report("<p>Radar FII: COMPRA</p>", "relatorio-2024-05-02").tier == TIER_LARGE
+
+def test_signals_are_read_from_the_visible_text():
+    # Entities are decoded, and tags never split or fake a signal
+    assert classify_report("<p>Novo pre&ccedil;o-teto</p>").tier == TIER_LARGE
+    assert classify_report('<a class="COMPRA" href="/venda">link</a>').tier == TIER_SMALL
+    assert report_text("<p>a</p><p>b</p>").split() == ["a", "b"]
+
+def test_small_model_per_provider():
+    assert small_model("claude").startswith("claude")
+    assert small_model("openai") == small_model("qualquer") == "gpt-4.1-mini"
+
+class ScriptedClient:
+    """
+    Answers analyze_report by model: the small model gets small_answer, the large one a fixed verdict.
+    Records the (model, template name) of every call.
+    """
+    def __init__(self, small_answer):
+        self.small_answer = small_answer
+        self.calls = []
+
+    def analyze_report(self, prompt, model=None, **kwargs):
+        self.calls.append((model, getattr(prompt, "template", "").split("@")[0]))
+        if model == small_model("openai"):
+            return self.small_answer
+        return {"fileNamePrefix": "com-recomendacao", "result": "## Recomendações"}
+
+    def analyze_report_batch(self, prompts, model=None, **kwargs):
+        return {key: self.analyze_report(prompt, model=model) for key, prompt in prompts.items()}
+
+LARGE = processors._default_model("openai")
+SMALL = small_model("openai")
+
+@pytest.fixture
+def report(tmp_path):
+    folder = tmp_path / "html"
+    folder.mkdir()
+    path = folder / "relatorio-trimestral.html"
+    path.write_text("<p>Resultado do trimestre dentro do esperado.</p>", encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("small_answer,calls,prefix", [
+    ({"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"}, [(SMALL, "relatorio-resumo")], "sem-recomendacao"),
+    # The small model found a recommendation the keywords missed
+    ({"fileNamePrefix": "com-recomendacao", "result": "## Compra"}, [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")], "com-recomendacao"),
+    # Bad shapes: unparsed text, missing result, unknown prefix
+    ("não é JSON", [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")], "com-recomendacao"),
+    ({"fileNamePrefix": "sem-recomendacao"}, [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")], "com-recomendacao"),
+    ({"fileNamePrefix": "talvez", "result": "## ?"}, [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")], "com-recomendacao"),
+])
+def test_small_model_escalates_on_recommendation_or_bad_shape(report, tmp_path, small_answer, calls, prefix):
+    client = ScriptedClient(small_answer)
+    (tmp_path / "resumos").mkdir()
+    output = processors.process_report_file(client, report, str(tmp_path / "resumos"))
+    assert client.calls == calls
+    assert os.path.basename(output).startswith(prefix)
+
+@pytest.mark.parametrize("small_answer,calls", [
+    ({"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"}, [(SMALL, "relatorio-resumo")]),
+    ({"fileNamePrefix": "com-recomendacao", "result": "## Compra"}, [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")]),
+    ("não é JSON", [(SMALL, "relatorio-resumo"), (LARGE, "relatorio")]),
+])
+def test_batch_path_escalates_the_same_way(report, tmp_path, small_answer, calls):
+    client = ScriptedClient(small_answer)
+    processors.process_reports(os.path.dirname(report), str(tmp_path / "resumos"), client=client, batch=True, poll_interval=0)
+    assert client.calls == calls
+
+def test_signals_skip_the_small_model(report, tmp_path):
+    with open(report, "w", encoding="utf-8") as f:
+        f.write("<p>Recomendação: COMPRA até R$ 35,00.</p>")
+    client = ScriptedClient({"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"})
+    (tmp_path / "resumos").mkdir()
+    processors.process_report_file(client, report, str(tmp_path / "resumos"))
+    assert client.calls == [(LARGE, "relatorio")]
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_route_false_sends_everything_to_the_large_model(report, tmp_path, batch):
+    client = ScriptedClient({"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"})
+    processors.process_reports(os.path.dirname(report), str(tmp_path / "resumos"), client=client, batch=batch, poll_interval=0, route=False)
+    assert client.calls == [(LARGE, "relatorio")]
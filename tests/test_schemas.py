@@ -0,0 +1,151 @@
+import csv
+import io
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from automation.analysis import processors
+from automation.analysis.schemas import (REPORT_VERDICT_SCHEMA, WALLET_COLUMNS, WALLET_ROWS_SCHEMA, ReportVerdict, WalletRow,
+                                         wallet_rows_from_response, wallet_rows_to_csv)
+
+@pytest.mark.parametrize("response,expected", [
+    ({"fileNamePrefix": "com-recomendacao", "result": "## Compra"}, ReportVerdict("com-recomendacao", "## Compra")),
+    ({"fileNamePrefix": "sem-recomendacao", "result": ""}, ReportVerdict("sem-recomendacao", "")),
+    # Unknown or missing prefixes still keep the summary
+    ({"fileNamePrefix": "talvez", "result": "## ?"}, ReportVerdict("nd", "## ?")),
+    ({"result": "## ?"}, ReportVerdict("nd", "## ?")),
+    ({"fileNamePrefix": "com-recomendacao"}, None),
+    ({"fileNamePrefix": "com-recomendacao", "result": ["lista"]}, None),
+    ("texto sem JSON", None),
+    (None, None),
+])
+def test_report_verdict_from_response(response, expected):
+    assert ReportVerdict.from_response(response) == expected
+
+def test_wallet_row_coerces_numbers_and_text():
+    row = WalletRow.from_dict({
+        "posicao": "3", "ticker": " ITUB4 ", "empresa": "  Itaú   Unibanco ", "setor": "",
+        "preco_entrada": "R$ 1.234,56", "preco_atual": "10.5", "preco_teto": 35, "peso": "2,5%",
+        "rentabilidade": "-12,3%", "dividend_yield": "n/d", "recomendacao": None,
+    })
+    assert row == WalletRow(
+        ticker="ITUB4", posicao=3, empresa="Itaú Unibanco", setor=None, preco_entrada=1234.56, preco_atual=10.5,
+        preco_teto=35.0, peso=2.5, rentabilidade=-12.3,
+    )
+    assert isinstance(row.posicao, int) and isinstance(row.preco_teto, float)
+
+@pytest.mark.parametrize("item", [{}, {"ticker": ""}, {"ticker": None, "empresa": "Itaú"}, {"ticker": "   "}])
+def test_wallet_row_needs_a_ticker(item):
+    assert WalletRow.from_dict(item) is None
+
+@pytest.mark.parametrize("response,tickers", [
+    ({"rows": [{"ticker": "ITUB4"}, {"ticker": ""}, "linha solta", {"ticker": "TAEE11"}]}, ["ITUB4", "TAEE11"]),
+    ({"rows": []}, []),
+    ({"rows": "ITUB4"}, []),
+    ({"linhas": [{"ticker": "ITUB4"}]}, []),
+    ("texto", []),
+])
+def test_wallet_rows_from_response(response, tickers):
+    assert [row.ticker for row in wallet_rows_from_response(response)] == tickers
+
+def test_wallet_rows_to_csv_uses_the_standard_columns():
+    rows = [WalletRow("ITUB4", posicao=1, preco_teto=35.0, peso=2.5), WalletRow("TAEE11", empresa="Taesa; Transmissora")]
+    lines = list(csv.reader(io.StringIO(wallet_rows_to_csv(rows)), delimiter=";"))
+    assert lines[0] == [column for _, column, _ in WALLET_COLUMNS]
+    assert dict(zip(lines[0], lines[1])) == {**dict.fromkeys(lines[0], ""), "Posição": "1", "Ticker": "ITUB4",
+                                              "Preço Teto (R$)": "35", "Peso na Carteira (%)": "2.5"}
+    # Delimiters inside values are quoted, not split
+    assert lines[2][2] == "Taesa; Transmissora"
+
+def test_wallet_schema_is_strict():
+    item = WALLET_ROWS_SCHEMA["schema"]["properties"]["rows"]["items"]
+    assert item["required"] == [name for name, _, _ in WALLET_COLUMNS]
+    assert item["additionalProperties"] is False
+    assert item["properties"]["ticker"]["type"] == "string"
+    assert item["properties"]["peso"]["type"] == ["number", "null"]
+
+def claude_message(*blocks):
+    usage = SimpleNamespace(input_tokens=10, output_tokens=5, cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    return SimpleNamespace(content=list(blocks), usage=usage)
+
+def text_block(text):
+    return SimpleNamespace(type="text", text=text)
+
+@pytest.fixture
+def claude(monkeypatch):
+    pytest.importorskip("anthropic")
+    from automation.analysis.claude_client import ClaudeClient
+    client = ClaudeClient()
+    client.sent = []
+    def create(params):
+        client.sent.append(params)
+        return client.answer
+    monkeypatch.setattr(client, "_create", create)
+    return client
+
+def test_claude_forces_the_schema_tool(claude):
+    claude.answer = claude_message(SimpleNamespace(type="tool_use", input={"fileNamePrefix": "sem-recomendacao", "result": "ok"}))
+    assert claude.analyze_report("relatório") == {"fileNamePrefix": "sem-recomendacao", "result": "ok"}
+    assert claude.sent[0]["tool_choice"] == {"type": "tool", "name": REPORT_VERDICT_SCHEMA["name"]}
+
+@pytest.mark.parametrize("blocks,expected", [
+    # Cut by max_tokens before the tool call: the JSON in the text is sliced out between the outer braces
+    ([text_block('Segue a resposta: {"fileNamePrefix": "com-recomendacao", "result": "## Compra"} fim.')],
+     {"fileNamePrefix": "com-recomendacao", "result": "## Compra"}),
+    ([text_block('{"rows": ['), text_block('{"ticker": "ITUB4"}]}')], {"rows": [{"ticker": "ITUB4"}]}),
+    ([text_block("Sem JSON aqui.")], "Sem JSON aqui."),
+    ([text_block('{"result": "cortado')], '{"result": "cortado'),
+])
+def test_claude_answer_without_tool_call_falls_back_to_the_text(claude, blocks, expected):
+    claude.answer = claude_message(*blocks)
+    assert claude.generate_structured("carteira", WALLET_ROWS_SCHEMA) == expected
+
+def test_claude_text_fallback_feeds_the_verdict(claude):
+    claude.answer = claude_message(text_block('```json\n{"fileNamePrefix": "sem-recomendacao", "result": "## Resumo"}\n```'))
+    assert ReportVerdict.from_response(claude.analyze_report("relatório")) == ReportVerdict("sem-recomendacao", "## Resumo")
+
+class RowsClient:
+    """
+    Answers generate_structured with the given rows response and records the schema of each call.
+    """
+    def __init__(self, response):
+        self.response = response
+        self.schemas = []
+
+    def generate_structured(self, prompt, schema, **kwargs):
+        self.schemas.append(schema["name"])
+        return self.response
+
+    def generate_structured_batch(self, prompts, schema, **kwargs):
+        return {key: self.generate_structured(prompt, schema) for key, prompt in prompts.items()}
+
+@pytest.fixture
+def md_folder(tmp_path):
+    folder = tmp_path / "md"
+    folder.mkdir()
+    (folder / f"carteira-dividendos-{date.today():%Y-%m-%d}.md").write_text("| Ticker | Peso |\n| ITUB4 | 10% |", encoding="utf-8")
+    return folder
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_step2_structured_writes_the_csv_from_typed_rows(monkeypatch, md_folder, tmp_path, batch):
+    client = RowsClient({"rows": [
+        {"posicao": 1, "ticker": "ITUB4", "empresa": "Itaú", "preco_teto": "R$ 35,00", "peso": "10%"},
+        {"ticker": "", "empresa": "linha sem ticker"},
+    ]})
+    monkeypatch.setattr(processors, "get_client", lambda provider="openai": client)
+    output = tmp_path / "csv"
+    processors.process_suno_wallets_step2_md_to_csv(str(md_folder), str(output), batch=batch, poll_interval=0)
+
+    assert client.schemas == ["wallet_rows"]
+    [csv_file] = output.iterdir()
+    assert csv_file.name == f"carteira-dividendos-{date.today():%Y-%m-%d}.csv"
+    header, row = csv_file.read_text(encoding="utf-8").splitlines()
+    assert header.split(";")[:2] == ["Posição", "Ticker"]
+    assert row == "1;ITUB4;Itaú;;;;35;10;;;;"
+
+@pytest.mark.parametrize("batch", [False, True])
+@pytest.mark.parametrize("response", [{"rows": []}, {"rows": [{"ticker": ""}]}, "texto sem JSON"])
+def test_step2_structured_writes_nothing_without_rows(monkeypatch, md_folder, tmp_path, batch, response):
+    monkeypatch.setattr(processors, "get_client", lambda provider="openai": RowsClient(response))
+    output = tmp_path / "csv"
+    processors.process_suno_wallets_step2_md_to_csv(str(md_folder), str(output), batch=batch, poll_interval=0)
+    assert list(output.iterdir()) == []
@@ -0,0 +1,146 @@
+import json
+import os
+import stat
+import time
+import pytest
+from unittest import mock
+from automation import sessions
+from automation.sessions import SiteSession
+
+PROBE_URL = "https://investidor.exemplo.com.br/carteiras"
+
+def cookie(name, value, domain=".exemplo.com.br", **fields):
+    return {"name": name, "value": value, "domain": domain, "path": "/", "secure": True, "httpOnly": True,
+            "sameSite": "Lax", "expires": -1, "size": 10, "session": True, **fields}
+
+class Browser:
+    """
+    Cookie jar behind Network.getAllCookies/setCookies. Pages redirect to /login unless the jar has a
+    valid "sessao" cookie.
+    """
+    def __init__(self, cookies=()):
+        self.cookies = list(cookies)
+        self.current_url = None
+        self.visits = []
+        self.set_calls = []
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Network.getAllCookies":
+            return {"cookies": [dict(c) for c in self.cookies]}
+        if command == "Network.setCookies":
+            self.set_calls.append(params["cookies"])
+            names = {c["name"] for c in params["cookies"]}
+            self.cookies = [c for c in self.cookies if c["name"] not in names] + params["cookies"]
+            return {}
+        raise AssertionError(command)
+
+    def get(self, url):
+        self.visits.append(url)
+        logged_in = any(c["name"] == "sessao" and c["value"] == "valida" for c in self.cookies)
+        self.current_url = url if logged_in else "https://investidor.exemplo.com.br/login"
+
+class FormLogin:
+    def __init__(self, works=True):
+        self.works = works
+        self.calls = 0
+
+    def __call__(self, driver):
+        self.calls += 1
+        if self.works:
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": [cookie("sessao", "valida")]})
+
+@pytest.fixture(autouse=True)
+def no_waits():
+    with mock.patch.object(sessions, "wait_for_page_stable"):
+        yield
+
+@pytest.fixture
+def login():
+    return FormLogin()
+
+@pytest.fixture
+def session(tmp_path, login):
+    return SiteSession("exemplo", "exemplo.com.br", PROBE_URL, login, folder=str(tmp_path / "sessoes"))
+
+def save_cookies(session, cookies):
+    os.makedirs(os.path.dirname(session.cookie_path), exist_ok=True)
+    with open(session.cookie_path, "w", encoding="utf-8") as f:
+        json.dump(cookies, f)
+
+def test_live_probe_skips_the_login(session, login):
+    browser = Browser([cookie("sessao", "valida")])
+    assert session.ensure(browser) == "ativa"
+    assert login.calls == 0
+    assert browser.visits == [PROBE_URL]
+
+def test_fresh_profile_is_not_probed_before_restoring(session, login):
+    browser = Browser()
+    assert session.ensure(browser) == "login"
+    # No cookies to probe, nothing saved to restore: the only visit confirms the form login
+    assert browser.visits == [PROBE_URL]
+    assert login.calls == 1
+
+def test_dead_probe_restores_the_saved_cookies(session, login):
+    save_cookies(session, [
+        cookie("sessao", "valida"),
+        cookie("antigo", "x", expires=time.time() - 60),
+        cookie("lembrar", "1", expires=time.time() + 3600),
+    ])
+    browser = Browser([cookie("sessao", "expirada")])
+    assert session.ensure(browser) == "cookies"
+    assert login.calls == 0
+
+    [restored] = browser.set_calls
+    assert [c["name"] for c in restored] == ["sessao", "lembrar"]
+    # Only the fields setCookies accepts; browser-session cookies go without expires
+    assert set(restored[0]) == {"name", "value", "domain", "path", "secure", "httpOnly", "sameSite"}
+    assert restored[1]["expires"] > time.time()
+
+def test_dead_restored_cookies_fall_back_to_the_form(session, login):
+    save_cookies(session, [cookie("sessao", "revogada")])
+    browser = Browser([cookie("sessao", "expirada")])
+    assert session.ensure(browser) == "login"
+    assert login.calls == 1
+    assert browser.visits == [PROBE_URL] * 3
+
+@pytest.mark.parametrize("saved", ["não é JSON", json.dumps([cookie("antigo", "x", expires=time.time() - 60)])])
+def test_unusable_saved_cookies_fall_back_to_the_form(session, login, saved):
+    os.makedirs(os.path.dirname(session.cookie_path))
+    with open(session.cookie_path, "w", encoding="utf-8") as f:
+        f.write(saved)
+    assert session.ensure(Browser([cookie("sessao", "expirada")])) == "login"
+    assert login.calls == 1
+
+def test_failed_login_keeps_the_old_cookie_file(session):
+    session.login = FormLogin(works=False)
+    save_cookies(session, [cookie("sessao", "revogada")])
+    assert session.ensure(Browser()) == "falhou"
+    with open(session.cookie_path, encoding="utf-8") as f:
+        assert json.load(f)[0]["value"] == "revogada"
+
+def test_only_the_site_cookies_are_saved(session):
+    browser = Browser([cookie("sessao", "valida"), cookie("outro", "y", domain="terceiro.com")])
+    session.ensure(browser)
+    with open(session.cookie_path, encoding="utf-8") as f:
+        assert [c["name"] for c in json.load(f)] == ["sessao"]
+
+@pytest.mark.skipif(os.name != "posix", reason="permissões POSIX")
+def test_cookie_files_are_owner_only(session):
+    # An older file with looser permissions is replaced, not rewritten in place
+    save_cookies(session, [])
+    os.chmod(session.cookie_path, 0o644)
+    session.ensure(Browser([cookie("sessao", "valida")]))
+
+    assert stat.S_IMODE(os.stat(session.cookie_path).st_mode) == 0o600
+    assert os.listdir(os.path.dirname(session.cookie_path)) == ["exemplo.json"]
+
+def test_forget_drops_the_cookie_file(session):
+    session.ensure(Browser([cookie("sessao", "valida")]))
+    session.forget()
+    assert not os.path.exists(session.cookie_path)
+    session.forget()
+
+def test_without_a_folder_nothing_is_written(login):
+    session = SiteSession("exemplo", "exemplo.com.br", PROBE_URL, login, folder=None)
+    assert session.ensure(Browser()) == "login"
+    assert session.cookie_path is None
@@ -0,0 +1,90 @@
+from datetime import date
+import pytest
+from automation.manifest import STAGE_WALLET_CSV
+from automation.snapshots import SnapshotStore, read_wallet_csv, diff_rows, load_wallet_snapshots, diff_wallet_snapshots
+
+DAY1 = """Posição;Ticker;Empresa;Preço Teto (R$);Peso na Carteira (%);Observação
+1;BBAS3;Banco do Brasil;R$ 30,00;10,5%;nota
+2;TAEE11;Taesa;R$ 40,00;8%;
+3;SAPR11;Sanepar;R$ 25,00;5%;
+"""
+
+DAY2 = """Posição,Ticker,Empresa,Preço Teto (R$),Peso na Carteira (%)
+1,BBAS3,Banco do Brasil,"R$ 32,00",10.5
+2,TAEE11,Taesa,40,6
+4,ITSA4,Itaúsa,12,7
+"""
+
+@pytest.fixture
+def store(tmp_path):
+    pytest.importorskip("pyarrow")
+    return SnapshotStore(str(tmp_path / "parquet"))
+
+def write_csv(folder, name, text):
+    path = folder / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_read_wallet_csv_maps_headers_and_keeps_extra_columns():
+    rows = read_wallet_csv(DAY1)
+    assert [row.ticker for row, _ in rows] == ["BBAS3", "TAEE11", "SAPR11"]
+    first, extra = rows[0]
+    assert (first.posicao, first.preco_teto, first.peso) == (1, 30.0, 10.5)
+    assert extra == {"Observação": "nota"}
+
+def test_bare_carteira_column_is_not_the_weight():
+    rows = read_wallet_csv("Ticker;Carteira;Peso\nBBAS3;Dividendos;10\n")
+    row, extra = rows[0]
+    assert row.peso == 10.0
+    assert extra == {"Carteira": "Dividendos"}
+
+def test_load_csv_writes_one_partition_per_snapshot(store, tmp_path):
+    path = store.load_csv(write_csv(tmp_path, "carteira-2024-05-02-dividendos-2024-05-02.csv", DAY1))
+    assert path == store.partition_path("carteira-dividendos", date(2024, 5, 2))
+
+    rows = store.snapshot("carteira-dividendos", date(2024, 5, 2))
+    assert [row["ticker"] for row in rows] == ["BBAS3", "TAEE11", "SAPR11"]
+    assert rows[0]["source"] == "suno"
+
+    # Loading the same day again replaces the partition instead of duplicating rows
+    store.load_csv(write_csv(tmp_path, "carteira-dividendos-2024-05-02.csv", DAY2))
+    assert len(store.snapshot("carteira-dividendos", date(2024, 5, 2))) == 3
+    assert store.wallets(date(2024, 5, 2)) == ["carteira-dividendos"]
+
+def test_load_csv_rejects_names_without_date(store, tmp_path):
+    assert store.load_csv(write_csv(tmp_path, "carteira.csv", DAY1)) is None
+
+def test_diff_rows():
+    previous = [
+        {"ticker": "BBAS3", "peso": 10.5, "preco_teto": 30.0},
+        {"ticker": "TAEE11", "peso": 8.0, "preco_teto": 40.0},
+        {"ticker": "SAPR11", "peso": 5.0, "preco_teto": 25.0},
+    ]
+    current = [
+        {"ticker": "BBAS3", "peso": 10.505, "preco_teto": 32.0},
+        {"ticker": "TAEE11", "peso": 6.0, "preco_teto": 40.0},
+        {"ticker": "ITSA4", "peso": 7.0, "preco_teto": 12.0},
+    ]
+    assert diff_rows(previous, current) == [
+        {"tipo": "preço teto", "ticker": "BBAS3", "anterior": 30.0, "atual": 32.0},
+        {"tipo": "peso", "ticker": "TAEE11", "anterior": 8.0, "atual": 6.0},
+        {"tipo": "entrada", "ticker": "ITSA4", "anterior": None, "atual": 7.0},
+        {"tipo": "saída", "ticker": "SAPR11", "anterior": 5.0, "atual": None},
+    ]
+
+def test_load_and_diff_stages(store, tmp_path, isolated_manifest):
+    csv_folder = tmp_path / "csv"
+    csv_folder.mkdir()
+    first = write_csv(csv_folder, "carteira-dividendos-2024-05-02.csv", DAY1)
+    second = write_csv(csv_folder, "carteira-dividendos-2024-05-03.csv", DAY2)
+    isolated_manifest.enqueue(STAGE_WALLET_CSV, first)
+    isolated_manifest.enqueue(STAGE_WALLET_CSV, second)
+
+    assert load_wallet_snapshots(None, store=store, use_manifest=True) == [first, second]
+    assert isolated_manifest.counts(STAGE_WALLET_CSV) == {"done": 2}
+    # Already loaded and unchanged: the folder scan skips them
+    assert load_wallet_snapshots(str(csv_folder), store=store) == []
+
+    results = diff_wallet_snapshots(str(tmp_path / "mudancas"), date(2024, 5, 3), store=store)
+    assert len(results["carteira-dividendos"]) == 4
+    assert (tmp_path / "mudancas" / "mudancas-carteira-dividendos-2024-05-03.csv").exists()
@@ -0,0 +1,146 @@
+import pytest
+from automation.analysis import processors
+from automation.analysis.tables import (parse_br_number, normalize_cell, extract_tables, is_valid_table, is_wallet_table,
+                                        wallet_html_to_markdown, spreadsheet_html_to_csv)
+from benchmarks.mock_llm import MockLLMClient
+
+@pytest.mark.parametrize("value,expected", [
+    ("1.234,56", 1234.56),
+    ("1.234.567,8", 1234567.8),
+    ("1.234", 1234.0),
+    ("12,5", 12.5),
+    ("0,05", 0.05),
+    ("42", 42.0),
+    ("R$ 1.234,56", 1234.56),
+    ("US$ 10,50", 10.5),
+    ("12,5%", 12.5),
+    ("12,5 %", 12.5),
+    ("-12,3%", -12.3),
+    ("- 12,3%", -12.3),
+    ("R$ -5,00", -5.0),
+    ("-R$ 5,00", -5.0),
+    ("+3,1%", 3.1),
+    ("  1.000,00\n", 1000.0),
+])
+def test_parse_br_number(value, expected):
+    assert parse_br_number(value) == pytest.approx(expected)
+
+@pytest.mark.parametrize("value", [
+    "",
+    "   ",
+    "-",
+    "ABCD3",
+    "COMPRA",
+    # Not Brazilian thousands groups: a dot must be followed by exactly three digits
+    "12.34",
+    "1.23,4",
+    "1,234.56",
+    "12,5%%",
+    "R$",
+])
+def test_parse_br_number_rejects_non_numbers(value):
+    assert parse_br_number(value) is None
+
+@pytest.mark.parametrize("value,expected", [
+    ("R$ 1.234,56", "1234.56"),
+    ("10,00", "10"),
+    ("-2,5%", "-2.5"),
+    ("  Itaú   Unibanco ", "Itaú Unibanco"),
+    ("", ""),
+])
+def test_normalize_cell(value, expected):
+    assert normalize_cell(value) == expected
+
+def table(header, rows):
+    return {"title": "", "header": header, "rows": rows}
+
+@pytest.mark.parametrize("candidate,valid,wallet", [
+    (table(["Ticker", "Peso"], [["ABCD3", "5"], ["EFGH4", "3"]]), True, True),
+    (table(["Ativo", "Preço Teto"], [["ABCD3", "12"]]), True, True),
+    (table(["Código", "Setor"], [["ABCD3", "Bancos"]]), True, True),
+    (table(["FUNDO", "DY"], [["ABCD11", "9"]]), True, True),
+    # Inconsistent widths: a row shorter or longer than the header
+    (table(["Ticker", "Peso"], [["ABCD3", "5"], ["EFGH4"]]), False, False),
+    (table(["Ticker", "Peso"], [["ABCD3", "5", "extra"]]), False, False),
+    # No column naming the assets
+    (table(["Data", "Valor"], [["01/05", "10"]]), True, False),
+    (table(["Setor", "Peso"], [["Bancos", "5"]]), True, False),
+    # Too small to be a table
+    (table(["Ticker"], [["ABCD3"]]), False, False),
+    (table(["Ticker", "Peso"], []), False, False),
+    (table([], []), False, False),
+])
+def test_table_checks(candidate, valid, wallet):
+    assert is_valid_table(candidate) == valid
+    assert is_wallet_table(candidate) == wallet
+
+WALLET_HTML = """
+<h2>Carteira Dividendos</h2>
+<table>
+  <tr><th>Ativo</th><th>Ticker</th><th>Preço Teto</th><th>Peso</th><th>Vazia</th></tr>
+  <tr><td>Itaú</td><td>ITUB4</td><td>R$ 35,00</td><td>10,5%</td><td></td></tr>
+  <tr><td>Taesa</td><td>TAEE11</td><td>R$ 1.234,56</td><td>-2,0%</td><td></td></tr>
+</table>
+"""
+
+def test_extract_tables_reads_title_header_and_normalized_rows():
+    [extracted] = extract_tables(WALLET_HTML)
+    assert extracted["title"] == "Carteira Dividendos"
+    assert extracted["header"] == ["Ativo", "Ticker", "Preço Teto", "Peso", "Vazia"]
+    assert extracted["rows"][1] == ["Taesa", "TAEE11", "1234.56", "-2", ""]
+
+def test_wallet_markdown_drops_ativo_and_empty_columns():
+    markdown = wallet_html_to_markdown(WALLET_HTML)
+    assert markdown == "## Carteira Dividendos\n\n```csv\nTicker,Preço Teto,Peso\nITUB4,35,10.5\nTAEE11,1234.56,-2\n```\n"
+
+def test_wallet_markdown_keeps_ativo_when_it_is_the_only_asset_column():
+    html = "<table><tr><th>Ativo</th><th>Peso</th></tr><tr><td>ITUB4</td><td>10</td></tr></table>"
+    assert "Ativo,Peso\nITUB4,10" in wallet_html_to_markdown(html)
+
+@pytest.mark.parametrize("html", [
+    "<p>Sem tabela</p>",
+    "<table><tr><th>Data</th><th>Valor</th></tr><tr><td>01/05</td><td>10</td></tr></table>",
+    "<table><tr><th>Ticker</th><th>Peso</th></tr><tr><td>ITUB4</td></tr></table>",
+])
+def test_local_parsers_give_up_without_a_wallet_table(html):
+    assert wallet_html_to_markdown(html) is None
+    assert spreadsheet_html_to_csv(html) is None
+
+def test_spreadsheet_csv_uses_semicolons_and_title():
+    csv_output = spreadsheet_html_to_csv(WALLET_HTML)
+    assert csv_output.splitlines()[:2] == ["Carteira Dividendos", "Ativo;Ticker;Preço Teto;Peso;Vazia"]
+
+@pytest.fixture
+def llm(monkeypatch):
+    client = MockLLMClient()
+    monkeypatch.setattr(processors, "get_client", lambda provider="openai": client)
+    return client
+
+@pytest.mark.parametrize("html,llm_calls", [
+    (WALLET_HTML, 0),
+    ("<table><tr><th>Data</th><th>Valor</th></tr><tr><td>01/05</td><td>10</td></tr></table>", 1),
+    ("<p>Carteira renderizada sem tabela</p>", 1),
+])
+def test_wallet_step1_falls_back_to_the_llm_only_without_a_wallet_table(tmp_path, llm, html, llm_calls):
+    html_folder = tmp_path / "html"
+    html_folder.mkdir()
+    (html_folder / "carteira-dividendos.html").write_text(html, encoding="utf-8")
+    output = tmp_path / "md"
+    processors.process_suno_wallets_step1_html_to_md(str(html_folder), str(output))
+
+    assert llm.calls == llm_calls
+    [md_file] = output.iterdir()
+    expected = MockLLMClient().convert_spreadsheet("") if llm_calls else wallet_html_to_markdown(html)
+    assert md_file.read_text(encoding="utf-8") == expected
+
+@pytest.mark.parametrize("html,llm_calls", [
+    (WALLET_HTML, 0),
+    ("<table><tr><th>Data</th><th>Valor</th></tr><tr><td>01/05</td><td>10</td></tr></table>", 1),
+])
+def test_meus_dividendos_falls_back_to_the_llm_only_without_a_wallet_table(tmp_path, llm, html, llm_calls):
+    html_file = tmp_path / "carteira-meus-dividendos-2024-05-02.htm"
+    html_file.write_text(html, encoding="utf-8")
+    output = processors.process_meus_dividendos_to_csv(str(html_file), str(tmp_path / "csv"))
+
+    assert llm.calls == llm_calls
+    assert output.endswith("carteira-meus-dividendos-2024-05-02.csv")
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from automation import telemetry
+from automation.telemetry import Tracer
+from automation.utils import clean_html
+
+def run_spans(tracer, names):
+    for name in names:
+        with tracer.span(name, input_tokens=1):
+            pass
+
+def test_default_tracer_writes_no_file(tmp_path, monkeypatch):
+    (tmp_path / "cwd").mkdir()
+    monkeypatch.chdir(tmp_path / "cwd")
+    tracer = Tracer()
+    run_spans(tracer, ["a"])
+    assert tracer.path is None
+    assert os.listdir(".") == []
+
+def test_telemetry_dir_is_unset_by_default():
+    env = {key: value for key, value in os.environ.items() if key != "TELEMETRY_DIR"}
+    code = "from automation.telemetry import TRACER; print(TRACER.directory)"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "None"
+
+def test_directory_opts_into_the_jsonl_file(tmp_path):
+    tracer = Tracer(str(tmp_path / "telemetria"))
+    run_spans(tracer, ["a", "b"])
+    lines = [json.loads(line) for line in open(tracer.path, encoding="utf-8")]
+    assert [record["name"] for record in lines] == ["a", "b"]
+
+def test_spans_are_capped_but_run_totals_stay_exact():
+    tracer = Tracer(max_spans=3)
+    run_spans(tracer, ["a"] * 5 + ["b"] * 5)
+    assert len(tracer.spans) == 3
+    summary = tracer.summary()
+    assert (summary["a"]["count"], summary["b"]["count"]) == (5, 5)
+    assert summary["a"]["input_tokens"] == 5
+
+def test_summary_since_mark():
+    tracer = Tracer(max_spans=100)
+    run_spans(tracer, ["a", "a"])
+    mark = tracer.mark()
+    run_spans(tracer, ["b"])
+    assert list(tracer.summary(mark)) == ["b"]
+    assert tracer.summary(mark)["b"]["count"] == 1
+
+def test_summary_since_mark_after_the_cap_dropped_spans():
+    tracer = Tracer(max_spans=2)
+    run_spans(tracer, ["a"])
+    mark = tracer.mark()
+    run_spans(tracer, ["b", "c", "d"])
+    # "b" is no longer in memory; what is left after the mark is still reported
+    assert set(tracer.summary(mark)) == {"c", "d"}
+    assert tracer.summary(tracer.mark()) == {}
+
+def test_summary_is_a_copy_of_the_totals():
+    tracer = Tracer()
+    run_spans(tracer, ["a"])
+    tracer.summary()["a"]["count"] = 99
+    assert tracer.summary()["a"]["count"] == 1
+
+def test_clean_html_opens_no_span(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(telemetry, "TRACER", tracer)
+    clean_html("<html><body><script>x</script><p>texto</p></body></html>")
+    assert tracer.mark() == 0
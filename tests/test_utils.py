@@ -0,0 +1,51 @@
+import pytest
+from automation.utils import clean_html, clean_html_soup, wallet_name, content_hash
+from benchmarks.fixtures import raw_pages
+
+PAGES = raw_pages()
+
+@pytest.mark.parametrize("kind, name, html", PAGES, ids=[name for _, name, _ in PAGES])
+def test_clean_html_matches_soup_on_corpus(kind, name, html):
+    assert clean_html(html) == clean_html_soup(html)
+
+@pytest.mark.parametrize("html", [
+    "<div style='x' onclick='y' class='c' id='i' data-x='1' href='/a'>texto</div>",
+    "<p>a<!-- comentário --><script>var x = '<p>';</script><style>p {}</style>b</p>",
+    "<ul><li>um<li>dois</ul><br><img src='a.png'/>",
+    "<p>&amp; &lt;tag&gt; &nbsp; R$ 1.234,56</p>",
+    "<!DOCTYPE html><html><head><meta charset='utf-8'><title>t</title></head><body><svg><path d='M0'/></svg>ok</body></html>",
+    "<p>sem fechamento <b>negrito",
+    "",
+])
+def test_clean_html_matches_soup_on_edge_cases(html):
+    assert clean_html(html) == clean_html_soup(html)
+
+def test_wallet_name_drops_dates():
+    assert wallet_name("carteira-2024-05-02-x_y-2024-05-02.md") == "carteira-x_y"
+    assert wallet_name("/tmp/carteira-x_y-2024-05-03.csv") == "carteira-x_y"
+
+def test_content_hash_ignores_update_time():
+    before = "<p>Atualizado em 18/10/2024 às 10:32</p><p>PETR4</p>"
+    after = "<p>Atualizado em 19/10/2024 às 08:01</p><p>PETR4</p>"
+    assert content_hash(before) == content_hash(after)
+    assert content_hash(before) != content_hash(before.replace("PETR4", "VALE3"))
+
+@pytest.mark.parametrize("before, after", [
+    ("<p>Atualizado em 18/10/2024</p><p>PETR4</p>", "<p>Atualizado em 21/10/2024</p><p>PETR4</p>"),
+    ("<p>Publicado às 10:32</p>", "<p>Publicado às 11:05</p>"),
+    ("<p>Fechamento 17:30h</p>", "<p>Fechamento 18:00h</p>"),
+    ("<p>há 5 minutos</p>", "<p>há 2 horas</p>"),
+    ("<script src='/app.js?v=1.2.3'>", "<script src='/app.js?v=1.2.4'>"),
+])
+def test_content_hash_masks_volatile_fragments(before, after):
+    assert content_hash(before) == content_hash(after)
+
+@pytest.mark.parametrize("before, after", [
+    ("Preço-teto atualizado em R$ 35,00 para PETR4", "Preço-teto atualizado em R$ 42,00 para PETR4"),
+    ("Carteira atualizada em março: entra BBAS3", "Carteira atualizada em março: entra ITSA4"),
+    ("Desdobramento na proporção 1:10", "Desdobramento na proporção 1:20"),
+    ("Grupamento 10:1 aprovado", "Grupamento 20:1 aprovado"),
+    ("Preço-teto: R$ 35,00", "Preço-teto: R$ 36,00"),
+])
+def test_content_hash_keeps_real_changes(before, after):
+    assert content_hash(before) != content_hash(after)
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import NoSuchElementException
+from automation import waits
+from automation.waits import ReadinessTimer, wait_for_content
+
+class Page:
+    """
+    A page whose content appears after `appears_after` lookups and is quiet from then on.
+    """
+    def __init__(self, appears_after=0):
+        self.appears_after = appears_after
+        self.lookups = 0
+
+    def find_element(self, by, value):
+        self.lookups += 1
+        if self.lookups <= self.appears_after:
+            raise NoSuchElementException(value)
+        return value
+
+    def execute_script(self, script, *args):
+        return ["complete", 60000, 1]
+
+@pytest.fixture
+def timings(monkeypatch):
+    timer = ReadinessTimer()
+    monkeypatch.setattr(waits, "TIMINGS", timer)
+    return timer
+
+def test_wait_for_content_returns_the_element_and_stays_in_budget(timings):
+    assert wait_for_content(Page(), "#main-content table", "carteiras: página", budget=4, quiet_period=0) == "#main-content table"
+    # Selector and stability waits share one budget
+    assert sum(record["budget"] for record in timings.records) == pytest.approx(4, abs=0.1)
+    assert timings.seconds_saved() > 3.5
+
+def test_wait_for_content_gives_up_at_the_budget_without_raising(timings):
+    assert wait_for_content(Page(appears_after=10 ** 6), "#main-content table", "carteiras: página", budget=0.2) is None
+    [record] = timings.records
+    assert record["budget"] == 0.2
+    assert record["elapsed"] >= 0.2